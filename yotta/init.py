@@ -113,6 +113,8 @@ def execCommand(args, following_args):
         logging.error('A module description exists but could not be loaded:')
         logging.error(c.error)
         return 1
+    # (the description is modified below)
+    c.detachDescription()
 
     if args.interactive:
         return initInteractive(args, c)
@@ -319,11 +319,42 @@ def satisfyVersionFromSearchPaths(name, version_required, search_paths, update=F
         )
     return None
 
-def satisfyVersionByInstalling(name, version_required, working_directory, type='module', inherit_shrinkwrap=None):
+def prefetchVersion(name, version_required, type='module'):
+    ''' Resolve the latest suitable version of a module or target from the
+        registry, and download it into the cache without installing it.
+
+        Returns the RemoteVersion object that was resolved (which can be
+        passed to satisfyVersionByInstalling), or None if the version could
+        not be prefetched. Only registry sources are prefetched: other
+        sources are resolved when they are installed.
+    '''
+    try:
+        vs = sourceparse.parseSourceURL(version_required)
+    except ValueError as e:
+        return None
+    if vs.source_type != 'registry':
+        return None
+    try:
+        v = latestSuitableVersion(
+            name, version_required, registry=_registryNamespaceForType(type), quiet=True
+        )
+        v.prefetch()
+    except Exception as e:
+        # prefetching is only an optimisation: any error here will be
+        # encountered (and reported) again when the version is installed
+        logger.debug('failed to prefetch %s@%s: %s', name, version_required, e)
+        return None
+    return v
+
+def satisfyVersionByInstalling(name, version_required, working_directory, type='module', inherit_shrinkwrap=None, remote_version=None):
     ''' installs and returns a Component/Target for the specified name+version
         requirement, into a subdirectory of `working_directory'
+
+        If remote_version is specified (for example as returned by
+        prefetchVersion), it is installed instead of looking up the latest
+        suitable version.
     '''
-    v = latestSuitableVersion(name, version_required, _registryNamespaceForType(type))
+    v = remote_version or latestSuitableVersion(name, version_required, _registryNamespaceForType(type))
     install_into = os.path.join(working_directory, name)
     return _satisfyVersionByInstallingVersion(
         name, version_required, install_into, v, type=type, inherit_shrinkwrap = inherit_shrinkwrap
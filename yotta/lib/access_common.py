@@ -10,8 +10,6 @@ import os
 import hashlib
 import tempfile
 import shutil
-import functools
-import random
 import errno
 
 # version, , represent versions and specifications, internal
@@ -24,6 +22,8 @@ from yotta.lib import folders
 from yotta.lib import ordered_json
 # settings, , load and save settings, internal
 from yotta.lib import settings
+# cache_index, , index of the download cache, internal
+from yotta.lib import cache_index
 
 logger = logging.getLogger('access')
 cache_logger = logging.getLogger('cache')
@@ -40,6 +40,12 @@ class TargetUnavailable(Unavailable):
     pass
 
 
+class Offline(Unavailable):
+    ''' Raised when something would have to be fetched from the network,
+        but yotta is offline. '''
+    pass
+
+
 class SpecificationNotMet(AccessException):
     pass
 
@@ -58,6 +64,22 @@ class RemoteVersion(version.Version):
     def unpackInto(self, directory):
         raise NotImplementedError
 
+    def prefetch(self):
+        ''' Fetch this version into the local download cache without
+            installing it, so that a later unpackInto() is served from the
+            cache. The default is to do nothing, for sources that can't be
+            cached.
+        '''
+        pass
+
+    def getDescription(self):
+        ''' Return the description (the parsed module.json or target.json)
+            of this version if it can be found without installing it, or
+            None. The default is None, for sources where the only way to
+            find the description is to install the version.
+        '''
+        return None
+
     def __repr__(self):
         return u'%s@%s from %s' % (self.name, self.friendly_version, self.friendly_source)
     def __str__(self):
@@ -90,6 +112,19 @@ class RemoteComponent(object):
     def remoteType(cls):
         raise NotImplementedError
 
+def isOffline():
+    ''' Return True if yotta must not access the network at all, because the
+        --offline option was given or the offline setting is set.
+    '''
+    # globalconf, share global arguments between modules, internal
+    from yotta.lib import globalconf
+    try:
+        if globalconf.get('offline'):
+            return True
+    except KeyError:
+        pass
+    return str(settings.get('offline')).lower() in ('true', '1', 'yes')
+
 _max_cached_modules = None
 def getMaxCachedModules():
     global _max_cached_modules
@@ -109,46 +144,182 @@ def _encodeCacheKey(cache_key):
         return cache_key.encode('ascii')
     return cache_key
 
+_max_cache_size = None
+def getMaxCacheSize():
+    ''' Return the maximum total size in bytes of the download cache (the
+        downloaded tarballs, and the trees extracted from them in the
+        extracted-tree cache), or None if the size is not limited. '''
+    global _max_cache_size
+    if _max_cache_size is None:
+        _max_cache_size = settings.get('maxCacheSize')
+        if _max_cache_size is not None:
+            try:
+                _max_cache_size = int(_max_cache_size)
+            except ValueError:
+                logger.warning('invalid maxCacheSize setting "%s" ignored', _max_cache_size)
+                _max_cache_size = None
+    return _max_cache_size
+
 def pruneCache():
-    ''' Prune the cache '''
-    cache_dir = folders.cacheDirectory()
-    def fullpath(f):
-        return os.path.join(cache_dir, f)
-    def getMTimeSafe(f):
-        # it's possible that another process removed the file before we stat
-        # it, handle this gracefully
-        try:
-            return os.stat(f).st_mtime
-        except FileNotFoundError:
-            import time
-            return time.clock()
-    # ensure cache exists
-    fsutils.mkDirP(cache_dir)
+    ''' Prune the cache: evict the least recently used files (and their
+        extracted trees) until the cache contains at most maxCachedModules
+        files, and (if set) at most maxCacheSize bytes, including the
+        extracted trees.
+    '''
     max_cached_modules = getMaxCachedModules()
-    for f in sorted(
-            [f for f in os.listdir(cache_dir) if
-                os.path.isfile(fullpath(f)) and not f.endswith('.json') and not f.endswith('.locked')
-            ],
-            key = lambda f: getMTimeSafe(fullpath(f)),
-            reverse = True
-        )[max_cached_modules:]:
+    max_cache_size = getMaxCacheSize()
+    evict = cache_index.evictionCandidates(max_cached_modules, max_cache_size)
+    for f in evict:
         cache_logger.debug('cleaning up cache file %s', f)
         removeFromCache(f)
-    cache_logger.debug('cache pruned to %s items', max_cached_modules)
-
-def sometimesPruneCache(p):
-    ''' return decorator to prune cache after calling fn with a probability of p'''
-    def decorator(fn):
-        @functools.wraps(fn)
-        def wrapped(*args, **kwargs):
-            r = fn(*args, **kwargs)
-            if random.random() < p:
-                pruneCache()
-            return r
-        return wrapped
-    return decorator
-
-def unpackFrom(tar_file_path, to_directory):
+    cache_logger.debug(
+        'cache pruned to %s items (%s bytes), %d evicted', max_cached_modules, max_cache_size, len(evict)
+    )
+
+def extractedCacheDirectory():
+    # extracted trees are kept in a subdirectory, so that they're never
+    # mistaken for cached tarballs (by this or older versions of yotta)
+    return os.path.join(folders.cacheDirectory(), 'extracted')
+
+_extracted_cache_links = None
+def getExtractedCacheLinks():
+    ''' Return how modules are materialised from the extracted-tree cache:
+
+          'reflink':  copy-on-write clones where the filesystem supports
+                      them, otherwise plain copies (the default)
+          'hardlink': as 'reflink', but fall back to hard links before
+                      plain copies. Editing a file in an installed module
+                      in place would then also modify the cached copy, so
+                      this must be explicitly enabled.
+          'copy':     always use plain copies
+          'off':      don't cache extracted trees at all
+    '''
+    global _extracted_cache_links
+    if _extracted_cache_links is None:
+        _extracted_cache_links = settings.get('extractedCacheLinks') or 'reflink'
+        if _extracted_cache_links not in ('reflink', 'hardlink', 'copy', 'off'):
+            logger.warning('invalid extractedCacheLinks setting "%s" ignored', _extracted_cache_links)
+            _extracted_cache_links = 'reflink'
+    return _extracted_cache_links
+
+def _cloneIntoPlace(source, to_directory):
+    ''' Clone the tree at source into a sibling directory of to_directory,
+        and then move it into place (replacing anything already there).
+    '''
+    links = getExtractedCacheLinks()
+    into_parent_dir = os.path.dirname(to_directory)
+    fsutils.mkDirP(into_parent_dir)
+    temp_directory = tempfile.mkdtemp(dir=into_parent_dir)
+    try:
+        clone_directory = os.path.join(temp_directory, 'tree')
+        if links == 'copy':
+            shutil.copytree(source, clone_directory, symlinks=True)
+            method = 'copy'
+        else:
+            method = fsutils.cloneTree(source, clone_directory, allow_hardlinks=(links == 'hardlink'))
+        fsutils.rmRf(to_directory)
+        shutil.move(clone_directory, to_directory)
+        return method
+    finally:
+        fsutils.rmRf(temp_directory)
+
+def _storeExtracted(extracted_cache_key, from_directory):
+    ''' Store a clone of the freshly extracted tree from_directory in the
+        extracted-tree cache. Failing to do so is never fatal.
+    '''
+    cache_dir = extractedCacheDirectory()
+    path = os.path.join(cache_dir, extracted_cache_key)
+    if os.path.isdir(path):
+        return
+    try:
+        fsutils.mkDirP(cache_dir)
+        temp_directory = tempfile.mkdtemp(dir=cache_dir, suffix='.locked')
+        try:
+            fsutils.cloneTree(
+                from_directory, os.path.join(temp_directory, 'tree'),
+                allow_hardlinks=(getExtractedCacheLinks() == 'hardlink')
+            )
+            # (if another process got there first, this fails, and the tree
+            # we made is just removed)
+            os.rename(os.path.join(temp_directory, 'tree'), path)
+            cache_logger.debug('stored extracted tree %s', extracted_cache_key)
+            # the extracted tree counts towards the size of the cache entry:
+            cache_index.addSize(extracted_cache_key, fsutils.treeSize(path))
+        finally:
+            fsutils.rmRf(temp_directory)
+    except (OSError, IOError) as e:
+        cache_logger.debug('failed to store extracted tree %s: %s', extracted_cache_key, e)
+
+def _unpackFromExtractedCache(cache_key, to_directory):
+    ''' Materialise the extracted tree for cache_key into to_directory,
+        returns True if successful, or False if there is no usable extracted
+        tree (in which case the tarball should be unpacked instead).
+    '''
+    if getExtractedCacheLinks() == 'off':
+        return False
+    path = os.path.join(extractedCacheDirectory(), cache_key)
+    if not os.path.isdir(path):
+        return False
+    try:
+        method = _cloneIntoPlace(path, to_directory)
+    except (OSError, IOError, shutil.Error) as e:
+        # the tree may have been evicted by another process while we were
+        # using it, fall back to unpacking the tarball:
+        cache_logger.debug('failed to use extracted tree %s: %s', cache_key, e)
+        return False
+    cache_logger.debug('materialised %s from extracted cache into %s (%s)', cache_key, to_directory, method)
+    return True
+
+def _isWithin(path, directory):
+    path = os.path.realpath(path)
+    directory = os.path.realpath(directory)
+    return path == directory or path.startswith(os.path.join(directory, ''))
+
+def _extractMembers(tf, to_directory):
+    ''' Extract the members of the open tarfile tf into to_directory,
+        stripping the single top-level directory that they must all be in.
+        Members are processed in order, so tf may be a stream.
+
+        Only files, directories, and symlinks to paths inside to_directory
+        are extracted: the archive may not yet have been verified, so
+        nothing in it is allowed to write outside to_directory.
+    '''
+    strip_dirname = ''
+    # get the extraction directory name from the first part of the
+    # extraction paths: it should be the same for all members of
+    # the archive
+    for m in tf:
+        split_path = fsutils.fullySplitPath(m.name)
+        logger.debug('process member: %s %s', m.name, split_path)
+        if os.path.isabs(m.name) or '..' in split_path:
+            raise ValueError('archive uses invalid paths')
+        if not strip_dirname:
+            if len(split_path) != 1 or not len(split_path[0]):
+                raise ValueError('archive does not appear to contain a single module')
+            strip_dirname = split_path[0]
+            continue
+        else:
+            if split_path[0] != strip_dirname:
+                raise ValueError('archive does not appear to contain a single module')
+        m.name = os.path.join(*split_path[1:])
+        if not (m.isfile() or m.isdir() or m.issym()):
+            raise ValueError('archive member %s is not a file, directory or symlink' % m.name)
+        destination = os.path.join(to_directory, m.name)
+        # symlinks extracted earlier must not lead outside to_directory:
+        if not _isWithin(os.path.dirname(destination), to_directory):
+            raise ValueError('archive member %s is outside the module' % m.name)
+        if m.issym() and (
+            os.path.isabs(m.linkname) or
+            not _isWithin(os.path.join(os.path.dirname(destination), m.linkname), to_directory)
+        ):
+            raise ValueError('archive member %s links to outside the module' % m.name)
+        tf.extract(m, path=to_directory)
+
+def unpackFrom(tar_file_path, to_directory, extracted_cache_key=None):
+    ''' Unpack the tarball at tar_file_path into to_directory. If
+        extracted_cache_key is specified, then a clone of the extracted tree
+        is also stored at that key in the extracted-tree cache.
+    '''
     # first unpack into a sibling directory of the specified directory, and
     # then move it into place.
 
@@ -160,25 +331,9 @@ def unpackFrom(tar_file_path, to_directory):
     temp_directory = tempfile.mkdtemp(dir=into_parent_dir)
     try:
         with tarfile.open(tar_file_path) as tf:
-            strip_dirname = ''
-            # get the extraction directory name from the first part of the
-            # extraction paths: it should be the same for all members of
-            # the archive
-            for m in tf.getmembers():
-                split_path = fsutils.fullySplitPath(m.name)
-                logger.debug('process member: %s %s', m.name, split_path)
-                if os.path.isabs(m.name) or '..' in split_path:
-                    raise ValueError('archive uses invalid paths')
-                if not strip_dirname:
-                    if len(split_path) != 1 or not len(split_path[0]):
-                        raise ValueError('archive does not appear to contain a single module')
-                    strip_dirname = split_path[0]
-                    continue
-                else:
-                    if split_path[0] != strip_dirname:
-                        raise ValueError('archive does not appear to contain a single module')
-                m.name = os.path.join(*split_path[1:])
-                tf.extract(m, path=temp_directory)
+            _extractMembers(tf, temp_directory)
+        if extracted_cache_key is not None:
+            _storeExtracted(extracted_cache_key, temp_directory)
         # make sure the destination directory doesn't exist:
         fsutils.rmRf(to_directory)
         shutil.move(temp_directory, to_directory)
@@ -200,14 +355,51 @@ def removeFromCache(cache_key):
         fsutils.rmF(f)
         # remove any metadata too, if it exists
         fsutils.rmF(f + '.json')
+        cache_index.remove(cache_key)
+        fsutils.rmRf(os.path.join(extractedCacheDirectory(), cache_key))
     except OSError as e:
         # if we failed to remove either file, then it might be because another
         # instance of yotta is using it, so just skip it this time.
         pass
 
-def unpackFromCache(cache_key, to_directory):
+def isInCache(cache_key):
+    ''' Return True if there is a file stored at the specified cache key '''
+    if cache_key is None:
+        return False
+    return os.path.isfile(os.path.join(folders.cacheDirectory(), _encodeCacheKey(cache_key)))
+
+def readFromCache(cache_key, filename):
+    ''' Return the contents (as text) of filename, relative to the root of
+        the module, from the tarball stored at the specified cache key,
+        without unpacking the rest of it. Returns None if the tarball doesn't
+        contain the file, and raises NotInCache if the tarball isn't cached.
+    '''
+    if cache_key is None:
+        raise NotInCache('"None" is never in cache')
+    cache_key = _encodeCacheKey(cache_key)
+    path = os.path.join(folders.cacheDirectory(), cache_key)
+    if not os.path.isfile(path):
+        raise NotInCache('not in cache')
+    try:
+        with open(os.path.join(extractedCacheDirectory(), cache_key, filename), 'rb') as f:
+            return f.read().decode('utf-8')
+    except IOError:
+        pass
+    want_path = fsutils.fullySplitPath(filename)
+    with tarfile.open(path) as tf:
+        for m in tf:
+            # (tarballs contain a single top-level directory)
+            if m.isfile() and fsutils.fullySplitPath(m.name)[1:] == want_path:
+                return tf.extractfile(m).read().decode('utf-8')
+    return None
+
+def unpackFromCache(cache_key, to_directory, store_extracted=True):
     ''' If the specified cache key exists, unpack the tarball into the
         specified directory, otherwise raise NotInCache (a KeyError subclass).
+
+        If the tarball has been unpacked before then its extracted tree is
+        cloned from the extracted-tree cache instead, otherwise (if
+        store_extracted is True) the extracted tree is added to that cache.
     '''
     if cache_key is None:
         raise NotInCache('"None" is never in cache')
@@ -219,7 +411,9 @@ def unpackFromCache(cache_key, to_directory):
     path = os.path.join(cache_dir, cache_key)
     logger.debug('attempt to unpack from cache %s -> %s', path, to_directory)
     try:
-        unpackFrom(path, to_directory)
+        if not (os.path.isfile(path) and _unpackFromExtractedCache(cache_key, to_directory)):
+            store = store_extracted and getExtractedCacheLinks() != 'off'
+            unpackFrom(path, to_directory, extracted_cache_key=(cache_key if store else None))
         try:
             shutil.copy(path + '.json', os.path.join(to_directory, '.yotta_origin.json'))
         except IOError as e:
@@ -228,6 +422,7 @@ def unpackFromCache(cache_key, to_directory):
             else:
                 raise
         cache_logger.debug('unpacked %s from cache into %s', cache_key, to_directory)
+        cache_index.touch(cache_key)
         return
     except IOError as e:
         if e.errno == errno.ENOENT:
@@ -239,28 +434,46 @@ def unpackFromCache(cache_key, to_directory):
         else:
             raise
 
-def _downloadToCache(stream, hashinfo={}, origin_info=dict()):
-    ''' Download the specified stream to a temporary cache directory, and
-        returns a cache key that can be used to access/remove the file.
-        You should use either removeFromCache(cache_key) or _moveCachedFile to
-        move the downloaded file to a known key after downloading.
+def _hasherFor(hashinfo):
+    ''' Return (hash name, expected hash value, hash object) for the
+        preferred hash type in hashinfo, or (None, None, None).
     '''
-    hash_name  = None
-    hash_value = None
-    m = None
-
     if len(hashinfo):
         # check for hashes in preferred order. Currently this is just sha256
         # (which the registry uses). Initial investigations suggest that github
         # doesn't return a header with the hash of the file being downloaded.
         for h in ('sha256',):
             if h in hashinfo:
-                hash_name  = h
-                hash_value = hashinfo[h]
-                m = getattr(hashlib, h)()
-                break
-        if not hash_name:
-            logger.warning('could not find supported hash type in %s', hashinfo)
+                return (h, hashinfo[h], getattr(hashlib, h)())
+        logger.warning('could not find supported hash type in %s', hashinfo)
+    return (None, None, None)
+
+def _verifyHash(hash_name, hash_value, m):
+    if hash_name:
+        calculated_hash = m.hexdigest()
+        logger.debug(
+            'calculated %s hash: %s check against: %s' % (
+                hash_name, calculated_hash, hash_value
+            )
+        )
+        if hash_value and (hash_value != calculated_hash):
+            raise Exception('Hash verification failed.')
+
+def _originInfo(hashinfo, file_size, origin_info):
+    extended_origin_info = {
+        'hash': hashinfo,
+        'size': file_size
+    }
+    extended_origin_info.update(origin_info)
+    return extended_origin_info
+
+def _downloadToCache(stream, hashinfo={}, origin_info=dict()):
+    ''' Download the specified stream to a temporary cache directory, and
+        returns a cache key that can be used to access/remove the file.
+        You should use either removeFromCache(cache_key) or _moveCachedFile to
+        move the downloaded file to a known key after downloading.
+    '''
+    hash_name, hash_value, m = _hasherFor(hashinfo)
 
     cache_dir = folders.cacheDirectory()
     fsutils.mkDirP(cache_dir)
@@ -275,27 +488,50 @@ def _downloadToCache(stream, hashinfo={}, origin_info=dict()):
             if hash_name:
                 m.update(chunk)
 
-        if hash_name:
-            calculated_hash = m.hexdigest()
-            logger.debug(
-                'calculated %s hash: %s check against: %s' % (
-                    hash_name, calculated_hash, hash_value
-                )
-            )
-            if hash_value and (hash_value != calculated_hash):
-                raise Exception('Hash verification failed.')
+        _verifyHash(hash_name, hash_value, m)
         file_size = f.tell()
         logger.debug('wrote tarfile of size: %s to %s', file_size, download_fname)
         f.truncate()
 
-    extended_origin_info = {
-        'hash': hashinfo,
-        'size': file_size
-    }
-    extended_origin_info.update(origin_info)
-    ordered_json.dump(download_fname + '.json', extended_origin_info)
+    ordered_json.dump(download_fname + '.json', _originInfo(hashinfo, file_size, origin_info))
     return os.path.basename(download_fname)
 
+class _TeeStream(object):
+    ''' File-like object for reading a response stream, which also writes
+        everything that is read to a file, and adds it to a hash, so that a
+        download can be unpacked, cached and verified in a single pass.
+    '''
+    def __init__(self, stream, f, m=None):
+        self.chunks = stream.iter_content(4096)
+        self.f = f
+        self.m = m
+        self.buffered = b''
+
+    def _readChunk(self):
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            return None
+        self.f.write(chunk)
+        if self.m is not None:
+            self.m.update(chunk)
+        return chunk
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffered) < size:
+            chunk = self._readChunk()
+            if chunk is None:
+                break
+            self.buffered += chunk
+        if size < 0:
+            size = len(self.buffered)
+        r, self.buffered = self.buffered[:size], self.buffered[size:]
+        return r
+
+    def drain(self):
+        ''' Read (and write and hash) the rest of the stream. '''
+        while self._readChunk() is not None:
+            pass
+
 def _moveCachedFile(from_key, to_key):
     ''' Move a file atomically within the cache: used to make cached files
         available at known keys, so they can be used by other processes.
@@ -308,6 +544,7 @@ def _moveCachedFile(from_key, to_key):
         # if moving the actual file was successful, then try to move the
         # metadata:
         os.rename(from_path+'.json', to_path+'.json')
+        cache_index.add(to_key, os.path.getsize(to_path))
     except Exception as e:
         # if the source doesn't exist, or the destination doesn't exist, remove
         # the file instead.
@@ -320,12 +557,16 @@ def _moveCachedFile(from_key, to_key):
         else:
             raise
 
-@sometimesPruneCache(0.05)
 def unpackTarballStream(stream, into_directory, hash={}, cache_key=None, origin_info=dict()):
     ''' Unpack a responses stream that contains a tarball into a directory. If
         a hash is provided, then it will be used as a cache key (for future
         requests you can try to retrieve the key value from the cache first,
         before making the request)
+
+        The stream is unpacked as it is downloaded, while also being written
+        to the cache and hashed. Nothing is moved into into_directory, or
+        made available in the cache, until the whole download has been
+        verified.
     '''
     cache_key = _encodeCacheKey(cache_key)
 
@@ -335,14 +576,76 @@ def unpackTarballStream(stream, into_directory, hash={}, cache_key=None, origin_
     if getMaxCachedModules() == 0:
         cache_key = None
 
-    new_cache_key = _downloadToCache(stream, hash, origin_info)
-    unpackFromCache(new_cache_key, into_directory)
+    hash_name, hash_value, m = _hasherFor(hash)
 
-    if cache_key is None:
-        # if we didn't provide a cache key, there's no point in storing the cache
+    cache_dir = folders.cacheDirectory()
+    fsutils.mkDirP(cache_dir)
+    (download_file, download_fname) = tempfile.mkstemp(dir=cache_dir, suffix='.locked')
+    new_cache_key = os.path.basename(download_fname)
+
+    # unpack into a sibling directory of the specified directory, and then
+    # move it into place once everything has been verified
+    into_parent_dir = os.path.dirname(into_directory)
+    fsutils.mkDirP(into_parent_dir)
+    temp_directory = tempfile.mkdtemp(dir=into_parent_dir)
+    try:
+        with os.fdopen(download_file, 'wb') as f:
+            tee = _TeeStream(stream, f, m)
+            extract_error = None
+            try:
+                with tarfile.open(fileobj=tee, mode='r|*') as tf:
+                    _extractMembers(tf, temp_directory)
+            except (tarfile.TarError, ValueError) as e:
+                # if the download is corrupt, then report that instead
+                extract_error = e
+            # read anything after the end of the archive, so that the whole
+            # download is hashed and cached:
+            tee.drain()
+            file_size = f.tell()
+            logger.debug('wrote tarfile of size: %s to %s', file_size, download_fname)
+
+        _verifyHash(hash_name, hash_value, m)
+        if extract_error is not None:
+            raise extract_error
+
+        extended_origin_info = _originInfo(hash, file_size, origin_info)
+        if cache_key is not None:
+            # make this file available at the known cache key
+            ordered_json.dump(download_fname + '.json', extended_origin_info)
+            _moveCachedFile(new_cache_key, cache_key)
+            if getExtractedCacheLinks() != 'off':
+                _storeExtracted(cache_key, temp_directory)
+        ordered_json.dump(os.path.join(temp_directory, '.yotta_origin.json'), extended_origin_info)
+
+        # make sure the destination directory doesn't exist:
+        fsutils.rmRf(into_directory)
+        shutil.move(temp_directory, into_directory)
+        temp_directory = None
+        logger.debug('extraction complete %s', into_directory)
+    finally:
+        if temp_directory is not None:
+            # if anything has failed, cleanup
+            fsutils.rmRf(temp_directory)
+        # if we didn't provide a cache key (or anything failed) there's no
+        # point in storing the cache
         removeFromCache(new_cache_key)
-    else:
-        # otherwise make this file available at the known cache key
-        _moveCachedFile(new_cache_key, cache_key)
 
+    if cache_key is not None:
+        pruneCache()
+
+def downloadTarballStreamToCache(stream, hash={}, cache_key=None, origin_info=dict()):
+    ''' Download a response stream that contains a tarball into the cache at
+        the specified cache key, without unpacking it. This is used to fetch
+        tarballs ahead of time, so that a later unpackTarballStream or
+        unpackFromCache call for the same key doesn't need to wait for the
+        network.
 
+        If the cache is disabled, or no cache key is provided, nothing is
+        downloaded.
+    '''
+    cache_key = _encodeCacheKey(cache_key)
+    if cache_key is None or getMaxCachedModules() == 0:
+        return
+    new_cache_key = _downloadToCache(stream, hash, origin_info)
+    _moveCachedFile(new_cache_key, cache_key)
+    pruneCache()
@@ -0,0 +1,192 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# Index of the files in the download cache, recording the size, last use time
+# and number of uses of each cached file, so that the cache can be pruned to
+# a maximum number of entries and total size by evicting the least recently
+# used files, without listing and stat-ing everything in the cache directory.
+# The size of each entry includes the size of its extracted tree (if any),
+# which is evicted along with it.
+
+# standard library modules, , ,
+import os
+import time
+import sqlite3
+import logging
+
+# fsutils, , misc filesystem utils, internal
+from yotta.lib import fsutils
+# folders, , where yotta stores things, internal
+from yotta.lib import folders
+
+cache_logger = logging.getLogger('cache')
+
+Index_Fname = 'downloads.sqlite'
+
+_Schema = '''
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (id, entries, bytes) VALUES (0, 0, 0);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE totals SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE totals SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_update_size AFTER UPDATE OF size ON entries BEGIN
+    UPDATE totals SET bytes = bytes - OLD.size + NEW.size WHERE id = 0;
+END;
+'''
+
+def indexDirectory():
+    # the index is kept in a subdirectory, so that it's never mistaken for a
+    # cached file (by this or older versions of yotta)
+    return os.path.join(folders.cacheDirectory(), 'index')
+
+def _isCacheFile(cache_dir, f):
+    return not f.endswith('.json') and not f.endswith('.locked') and \
+           os.path.isfile(os.path.join(cache_dir, f))
+
+def _connect():
+    ''' Open the index, creating it (from the current contents of the cache
+        directory) if it doesn't exist yet. Connections must only be used by
+        the thread that opened them.
+    '''
+    fsutils.mkDirP(indexDirectory())
+    path = os.path.join(indexDirectory(), Index_Fname)
+    is_new = not os.path.exists(path)
+    connection = sqlite3.connect(path, timeout=30)
+    try:
+        with connection:
+            connection.executescript(_Schema)
+        if is_new:
+            _populateFromDirectory(connection)
+    except Exception:
+        connection.close()
+        raise
+    return connection
+
+def _populateFromDirectory(connection):
+    ''' Index any files already in the cache directory (e.g. downloaded by an
+        older version of yotta), this is only done once, when the index is
+        created.
+    '''
+    cache_dir = folders.cacheDirectory()
+    entries = []
+    for f in os.listdir(cache_dir):
+        if not _isCacheFile(cache_dir, f):
+            continue
+        try:
+            st = os.stat(os.path.join(cache_dir, f))
+        except OSError:
+            # removed by another process
+            continue
+        # (see access_common.extractedCacheDirectory)
+        extracted_size = fsutils.treeSize(os.path.join(cache_dir, 'extracted', f))
+        entries.append((f, st.st_size + extracted_size, st.st_mtime))
+    cache_logger.debug('indexing %d existing cache files', len(entries))
+    with connection:
+        connection.executemany(
+            'INSERT OR IGNORE INTO entries (key, size, last_used) VALUES (?, ?, ?)', entries
+        )
+
+def _withIndex(fn):
+    ''' Run fn(connection) with a connection to the index. The index is only
+        used to make cache management faster, so if it can't be used then
+        errors are logged and None is returned.
+    '''
+    try:
+        connection = _connect()
+    except (sqlite3.Error, OSError) as e:
+        cache_logger.warning('could not open download cache index: %s', e)
+        return None
+    try:
+        with connection:
+            return fn(connection)
+    except sqlite3.Error as e:
+        cache_logger.warning('download cache index error: %s', e)
+        return None
+    finally:
+        connection.close()
+
+# public API
+
+def add(cache_key, size):
+    ''' Record that a file of the specified size has been stored in the cache
+        at cache_key. '''
+    def update(c):
+        # (delete then insert rather than INSERT OR REPLACE, as replacing
+        # doesn't fire the delete trigger that maintains the totals)
+        c.execute('DELETE FROM entries WHERE key = ?', (cache_key,))
+        c.execute(
+            'INSERT INTO entries (key, size, last_used) VALUES (?, ?, ?)',
+            (cache_key, size, time.time())
+        )
+    _withIndex(update)
+
+def addSize(cache_key, size):
+    ''' Record that size more bytes (e.g. an extracted tree) are stored in the
+        cache for the file at cache_key. '''
+    _withIndex(lambda c: c.execute(
+        'UPDATE entries SET size = size + ? WHERE key = ?', (size, cache_key)
+    ))
+
+def touch(cache_key):
+    ''' Record a use of the file at cache_key. '''
+    _withIndex(lambda c: c.execute(
+        'UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?',
+        (time.time(), cache_key)
+    ))
+
+def remove(cache_key):
+    ''' Record that the file at cache_key has been removed from the cache. '''
+    _withIndex(lambda c: c.execute('DELETE FROM entries WHERE key = ?', (cache_key,)))
+
+def get(cache_key):
+    ''' Return {'size', 'last_used', 'hits'} for the cache_key, or None. '''
+    def query(c):
+        row = c.execute(
+            'SELECT size, last_used, hits FROM entries WHERE key = ?', (cache_key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'size': row[0], 'last_used': row[1], 'hits': row[2]}
+    return _withIndex(query)
+
+def totals():
+    ''' Return (number of entries, total bytes) of everything in the cache. '''
+    return _withIndex(lambda c: tuple(c.execute('SELECT entries, bytes FROM totals WHERE id = 0').fetchone()))
+
+def evictionCandidates(max_entries=None, max_bytes=None):
+    ''' Return a list of the least recently used cache keys that must be
+        removed for the cache to contain at most max_entries files, totalling
+        at most max_bytes (either limit may be None for no limit). Only the
+        entries to be evicted are read from the index.
+    '''
+    def query(c):
+        entries, total_bytes = c.execute('SELECT entries, bytes FROM totals WHERE id = 0').fetchone()
+        r = []
+        if (max_entries is None or entries <= max_entries) and \
+           (max_bytes is None or total_bytes <= max_bytes):
+            return r
+        for key, size in c.execute('SELECT key, size FROM entries ORDER BY last_used ASC, rowid ASC'):
+            if (max_entries is None or entries <= max_entries) and \
+               (max_bytes is None or total_bytes <= max_bytes):
+                break
+            r.append(key)
+            entries -= 1
+            total_bytes -= size
+        return r
+    return _withIndex(query) or []
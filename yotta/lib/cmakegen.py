@@ -8,6 +8,7 @@ import os
 import logging
 import re
 import itertools
+import hashlib
 from collections import defaultdict
 from collections import OrderedDict
 
@@ -16,6 +17,10 @@ from jinja2 import Environment, FileSystemLoader
 
 # fsutils, , misc filesystem utils, internal
 from yotta.lib import fsutils
+# Ordered JSON, , read & write json, internal
+from yotta.lib import ordered_json
+# sourcetree, , index of the files in components, internal
+from yotta.lib import sourcetree
 
 Template_Dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'templates')
 
@@ -23,6 +28,10 @@ logger = logging.getLogger('cmakegen')
 
 Ignore_Subdirs = set(('build','yotta_modules', 'yotta_targets', 'CMake'))
 
+# records the fingerprints of the components that build files were generated
+# for, so that they can be skipped if nothing has changed:
+Generation_Manifest_Fname = '.yotta_generated.json'
+
 jinja_environment = Environment(loader=FileSystemLoader(Template_Dir), trim_blocks=True, lstrip_blocks=True)
 
 def replaceBackslashes(s):
@@ -37,6 +46,25 @@ jinja_environment.filters['sanitizePreprocessorSymbol'] = sanitizePreprocessorSy
 jinja_environment.globals['list'] = list
 jinja_environment.globals['pathJoin'] = os.path.join
 
+_templates_signature = None
+def _templatesSignature():
+    ''' Hash of the templates and of the yotta version, which changes
+        whenever a new version of yotta might generate different files. '''
+    global _templates_signature
+    if _templates_signature is None:
+        h = hashlib.sha1()
+        version_file = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'version.txt')
+        for path in [version_file] + [os.path.join(Template_Dir, f) for f in sorted(os.listdir(Template_Dir))]:
+            h.update(os.path.basename(path).encode('utf-8'))
+            with open(path, 'rb') as f:
+                h.update(f.read())
+        _templates_signature = h.hexdigest()
+    return _templates_signature
+
+def _skipTopLevel(name):
+    # top-level files and directories that are never used when generating
+    return name in Ignore_Subdirs or name.startswith('.') or name.startswith('_')
+
 class SourceFile(object):
     def __init__(self, fullpath, relpath, lang):
         super(SourceFile, self).__init__()
@@ -57,6 +85,19 @@ class CMakeGen(object):
         self.config_json_file = None
         self.build_info_include_file = None
         self.build_uuid = None
+        self.source_indexes = {}
+        self.generation_signature = None
+        # the fingerprints recorded the last time build files were generated
+        # in this build directory, and those of this generation:
+        self.previous_fingerprints = None
+        self.fingerprints = OrderedDict()
+
+    def _sourceIndex(self, component):
+        # the files in each component are only listed once per generation,
+        # however many times they're needed
+        if component.path not in self.source_indexes:
+            self.source_indexes[component.path] = sourcetree.SourceTreeIndex(component)
+        return self.source_indexes[component.path]
 
     def _writeFile(self, path, contents):
         dirname = os.path.dirname(path)
@@ -120,6 +161,8 @@ class CMakeGen(object):
             yield 'Target "%s" is not a valid build target' % self.target
 
         toplevel = not len(processed_components)
+        if toplevel:
+            self._loadManifest()
 
         logger.debug('generate build files: %s (target=%s)' % (component, self.target))
         # because of the way c-family language includes work we need to put the
@@ -152,7 +195,14 @@ class CMakeGen(object):
         # itself
         processed_components[component.getName()] = component
         new_dependencies = OrderedDict([(name,c) for name,c in dependencies.items() if c and not name in processed_components])
-        self.generate(builddir, modbuilddir, component, new_dependencies, dependencies, recursive_deps, application, toplevel)
+        fingerprint = self._fingerprint(builddir, modbuilddir, component, new_dependencies, dependencies, recursive_deps, application, toplevel)
+        # the top level is always generated, as it includes the build info
+        # definitions, which are different for every build:
+        if toplevel or not self._isUpToDate(builddir, fingerprint):
+            self.generate(builddir, modbuilddir, component, new_dependencies, dependencies, recursive_deps, application, toplevel)
+        else:
+            logger.debug('build files for %s are up to date', component)
+        self.fingerprints[self._manifestKey(builddir)] = fingerprint
 
         logger.debug('recursive deps of %s:' % component)
         for d in recursive_deps.values():
@@ -165,6 +215,73 @@ class CMakeGen(object):
             ):
                 yield error
 
+        if toplevel:
+            self._saveManifest()
+
+    def _manifestPath(self):
+        return os.path.join(self.buildroot, Generation_Manifest_Fname)
+
+    def _manifestKey(self, builddir):
+        return replaceBackslashes(os.path.relpath(builddir, self.buildroot))
+
+    def _loadManifest(self):
+        try:
+            self.previous_fingerprints = ordered_json.load(self._manifestPath()).get('components', {})
+        except (IOError, ValueError, AttributeError):
+            self.previous_fingerprints = {}
+        # remove the manifest while generating, so that if generation is
+        # interrupted everything is regenerated next time
+        fsutils.rmF(self._manifestPath())
+
+    def _saveManifest(self):
+        self._writeFile(self._manifestPath(), ordered_json.dumps(OrderedDict([
+            ('components', self.fingerprints)
+        ])))
+
+    def _isUpToDate(self, builddir, fingerprint):
+        return self.previous_fingerprints is not None and \
+               self.previous_fingerprints.get(self._manifestKey(builddir), None) == fingerprint and \
+               os.path.isfile(os.path.join(builddir, 'CMakeLists.txt'))
+
+    def _generationSignature(self):
+        ''' Hash of everything that affects the generated files of all
+            components. '''
+        if self.generation_signature is None:
+            self.generation_signature = hashlib.sha1(ordered_json.dumps([
+                _templatesSignature(),
+                self.target.getName(),
+                self.target.getMergedConfig(),
+                list(self.target.getToolchainFiles()),
+                list(self.target.getAdditionalIncludes()),
+                self.config_include_file
+            ]).encode('utf-8')).hexdigest()
+        return self.generation_signature
+
+    def _fingerprint(self, builddir, modbuilddir, component, active_dependencies, immediate_dependencies, all_dependencies, application, toplevel):
+        ''' Return a hash of everything that the files generated for component
+            depend on: its description, ignore patterns and the names of its
+            files, its dependencies, and where things are generated.
+        '''
+        index = self._sourceIndex(component)
+        return hashlib.sha1(ordered_json.dumps([
+            self._generationSignature(),
+            builddir,
+            modbuilddir,
+            toplevel,
+            application.path if application is not None else None,
+            component.path,
+            component.isTestDependency(),
+            component.description,
+            component.ignore_patterns,
+            index.listingSignature(_skipTopLevel),
+            list(active_dependencies.keys()),
+            [(name, bool(c), c.isTestDependency()) for name, c in immediate_dependencies.items()],
+            [
+                (name, c.path, c.isTestDependency(), c.getExtraIncludes(), c.getExtraSysIncludes())
+                for name, c in all_dependencies.items()
+            ]
+        ]).encode('utf-8')).hexdigest()
+
     def checkStandardSourceDir(self, dirname, component):
         # validate, , validate various things, internal
         from yotta.lib import validate
@@ -181,17 +298,18 @@ class CMakeGen(object):
         '''
         lib_subdirs = component.getLibs(explicit_only=True)
         bin_subdirs = component.getBinaries()
+        index = self._sourceIndex(component)
 
         ok = True
         for d in lib_subdirs:
-            if not os.path.exists(os.path.join(component.path, d)):
+            if not index.exists(d):
                 logger.warning(
                     "lib directory \"%s\" doesn't exist but is listed in the module.json file of %s", d, component
                 )
                 ok = False
 
         for d in bin_subdirs:
-            if not os.path.exists(os.path.join(component.path, d)):
+            if not index.exists(d):
                 logger.warning(
                     "bin directory \"%s\" doesn't exist but is listed in the module.json file of %s", d, component
                 )
@@ -220,11 +338,12 @@ class CMakeGen(object):
         # they'll be acumulated into a single array (top_sources below).
         top_sources = []
         start_on_top = "." in [os.path.normpath(x) for x in list(lib_subdirs.keys()) + list(bin_subdirs.keys())]
-        for f in sorted(os.listdir(component.path)):
-            if f in Ignore_Subdirs or f.startswith('.') or f.startswith('_'):
+        index = self._sourceIndex(component)
+        for f in sorted(index.listDir()):
+            if _skipTopLevel(f):
                 continue
             check_cmakefile_path = os.path.join(f, 'CMakeLists.txt')
-            if os.path.isfile(os.path.join(component.path, check_cmakefile_path)) and not \
+            if index.isFile(check_cmakefile_path) and not \
                     component.ignores(check_cmakefile_path):
                 self.checkStandardSourceDir(f, component)
                 # if the subdirectory has a CMakeLists.txt in it (and it isn't
@@ -234,7 +353,7 @@ class CMakeGen(object):
                 if f in ('test',):
                     test_subdirs.append(f)
             else:
-                if os.path.isfile(os.path.join(component.path, f)):
+                if index.isFile(f):
                     # top level source: check if it should be included
                     if not component.ignores(f) and start_on_top:
                         sf = self.createSourceFile(f, os.path.join(component.path, f), ".")
@@ -426,7 +545,8 @@ class CMakeGen(object):
             commit_id = None
             repotype = vcs_instance.__class__.__name__
             try:
-                commit_id = vcs_instance.getCommitId()
+                vcs_state = vcs_instance.state()
+                commit_id = vcs_state.getCommitId()
             except vcs.VCSNotInstalled as e:
                 logger.warning('%s is not installed, VCS status build info is not available', repotype)
                 commit_id = None
@@ -438,8 +558,8 @@ class CMakeGen(object):
                     repotype
                 )
             if commit_id is not None:
-                clean_state = int(vcs_instance.isClean())
-                description = vcs_instance.getDescription()
+                clean_state = int(vcs_state.isClean())
+                description = vcs_state.getDescription()
                 definitions += [
                     ('YOTTA_BUILD_VCS_ID',    commit_id,   'git or mercurial hash'),
                     ('YOTTA_BUILD_VCS_CLEAN', clean_state, 'evaluates true if the version control system was clean, otherwise false'),
@@ -500,7 +620,8 @@ class CMakeGen(object):
         delegate_build_dir = None
 
         module_is_empty = False
-        if os.path.isfile(os.path.join(component.path, 'CMakeLists.txt')) and not component.ignores('CMakeLists.txt'):
+        index = self._sourceIndex(component)
+        if index.isFile('CMakeLists.txt') and not component.ignores('CMakeLists.txt'):
             # adding custom CMake is a promise to generate a library: so the
             # module is never empty in this case.
             delegate_to_existing = component.path
@@ -524,7 +645,7 @@ class CMakeGen(object):
 
             add_own_subdirs = []
             for f in manual_subdirs:
-                if os.path.isfile(os.path.join(component.path, f, 'CMakeLists.txt')):
+                if index.isFile(os.path.join(f, 'CMakeLists.txt')):
                     # if this module is a test dependency, then don't recurse
                     # to building its own tests.
                     if f in test_subdirs and component.isTestDependency():
@@ -642,14 +763,7 @@ class CMakeGen(object):
         dummy_cfile_name = 'dummy.c'
         logger.debug("create dummy lib: %s, %s, %s" % (safe_name, dummy_dirname, dummy_cfile_name))
 
-        cmake_files = []
-        source_dir = os.path.join(component.path, 'source')
-        if os.path.exists(source_dir):
-            for root, dires, files in os.walk(os.path.join(component.path, 'source')):
-                for f in files:
-                    name, ext = os.path.splitext(f)
-                    if ext.lower() == '.cmake' and not component.ignores(os.path.relpath(os.path.join(root, f), component.path)):
-                        cmake_files.append(os.path.join(root, f))
+        cmake_files = self._findCMakeFiles(component, 'source')
 
         dummy_template = jinja_environment.get_template('dummy_CMakeLists.txt')
 
@@ -712,12 +826,7 @@ class CMakeGen(object):
             link_dependencies.append(component.getName())
 
         # Find cmake files
-        cmake_files = []
-        for root, dires, files in os.walk(os.path.join(component.path, dirname)):
-            for f in files:
-                name, ext = os.path.splitext(f)
-                if ext.lower() == '.cmake' and not component.ignores(os.path.relpath(os.path.join(root, f), component.path)):
-                    cmake_files.append(os.path.join(root, f))
+        cmake_files = self._findCMakeFiles(component, dirname)
 
         test_template = jinja_environment.get_template('test_CMakeLists.txt')
 
@@ -758,12 +867,7 @@ class CMakeGen(object):
                         resource_files.append(os.path.join(root, f))
 
         # Find cmake files
-        cmake_files = []
-        for root, dires, files in os.walk(os.path.join(component.path, dirname)):
-            for f in files:
-                name, ext = os.path.splitext(f)
-                if ext.lower() == '.cmake' and not component.ignores(os.path.relpath(os.path.join(root, f), component.path)):
-                    cmake_files.append(os.path.join(root, f))
+        cmake_files = self._findCMakeFiles(component, dirname)
 
         subdir_template = jinja_environment.get_template('subdir_CMakeLists.txt')
 
@@ -803,14 +907,23 @@ class CMakeGen(object):
         else:
             return None
 
+    def _findCMakeFiles(self, component, dirname):
+        cmake_files = []
+        for root, relroot, files in self._sourceIndex(component).walk(dirname):
+            for f in files:
+                name, ext = os.path.splitext(f)
+                if ext.lower() == '.cmake':
+                    cmake_files.append(os.path.join(root, f))
+        return cmake_files
+
     def containsSourceFiles(self, directory, component):
         sources = []
-        for root, dires, files in os.walk(directory):
+        # (ignored files and directories are not included in the walk)
+        index = self._sourceIndex(component)
+        for root, relroot, files in index.walk(os.path.relpath(directory, component.path)):
             for f in sorted(files):
                 fullpath = os.path.join(root, f)
-                relpath  = os.path.relpath(fullpath, component.path)
-                if component.ignores(relpath):
-                    continue
+                relpath  = os.path.join(relroot, f)
                 sf = self.createSourceFile(f, fullpath, relpath)
                 if sf is not None:
                     sources.append(sf)
@@ -11,8 +11,6 @@ from collections import OrderedDict
 # access, , get components, internal
 from yotta.lib import access
 from yotta.lib import access_common
-# pool, , shared thread pool, internal
-#from pool import pool
 # vcs, , represent version controlled directories, internal
 from yotta.lib import vcs
 # fsutils, , misc filesystem utils, internal
@@ -64,6 +62,65 @@ def _truthyConfValue(v):
         # everything else is truthy!
         return True
 
+def dependencySpecsFromDescription(description, module_name, shrinkwrap, target=None):
+    ''' Returns [DependencySpec] for the dependencies listed in a module
+        description (the contents of its module.json), which need not be
+        installed. shrinkwrap is the name:version mapping of the shrinkwrap
+        that applies to the module.
+
+        See Component.getDependencySpecs
+    '''
+    deps = []
+
+    def specForDependency(name, version_spec, istest):
+        shrinkwrap_version_req = None
+        if name in shrinkwrap:
+            # exact version, and pull from registry:
+            shrinkwrap_version_req = shrinkwrap[name]
+            logger.debug(
+                'respecting %s shrinkwrap version %s for %s', module_name, shrinkwrap_version_req, name
+            )
+        return pack.DependencySpec(
+                                     name,
+                                     version_spec,
+                                     istest,
+            shrinkwrap_version_req = shrinkwrap_version_req,
+                 specifying_module = module_name
+        )
+
+    deps += [specForDependency(x[0], x[1], False) for x in description.get('dependencies', {}).items()]
+    target_deps = description.get('targetDependencies', {})
+    if target is not None:
+        for conf_key, target_conf_deps in target_deps.items():
+            if _truthyConfValue(target.getConfigValue(conf_key)) or conf_key in target.getSimilarTo_Deprecated():
+                logger.debug(
+                    'Adding target-dependent dependency specs for target config %s to component %s' %
+                    (conf_key, module_name)
+                )
+                deps += [specForDependency(x[0], x[1], False) for x in target_conf_deps.items()]
+
+
+    deps += [specForDependency(x[0], x[1], True) for x in description.get('testDependencies', {}).items()]
+    target_deps = description.get('testTargetDependencies', {})
+    if target is not None:
+        for conf_key, target_conf_deps in target_deps.items():
+            if _truthyConfValue(target.getConfigValue(conf_key)) or conf_key in target.getSimilarTo_Deprecated():
+                logger.debug(
+                    'Adding test-target-dependent dependency specs for target config %s to component %s' %
+                    (conf_key, module_name)
+                )
+                deps += [specForDependency(x[0], x[1], True) for x in target_conf_deps.items()]
+
+    # remove duplicates (use the first occurrence)
+    seen = set()
+    r = []
+    for dep in deps:
+        if not dep.name in seen:
+            r.append(dep)
+            seen.add(dep.name)
+
+    return r
+
 # API
 class Component(pack.Pack):
     def __init__(
@@ -151,57 +208,9 @@ class Component(pack.Pack):
             component description file: this is so that dependency resolution
             proceeds in a predictable way.
         '''
-        deps = []
-
-        def specForDependency(name, version_spec, istest):
-            shrinkwrap = self.getShrinkwrapMapping()
-            shrinkwrap_version_req = None
-            if name in shrinkwrap:
-                # exact version, and pull from registry:
-                shrinkwrap_version_req = shrinkwrap[name]
-                logger.debug(
-                    'respecting %s shrinkwrap version %s for %s', self.getName(), shrinkwrap_version_req, name
-                )
-            return pack.DependencySpec(
-                                         name,
-                                         version_spec,
-                                         istest,
-                shrinkwrap_version_req = shrinkwrap_version_req,
-                     specifying_module = self.getName()
-            )
-
-        deps += [specForDependency(x[0], x[1], False) for x in self.description.get('dependencies', {}).items()]
-        target_deps = self.description.get('targetDependencies', {})
-        if target is not None:
-            for conf_key, target_conf_deps in target_deps.items():
-                if _truthyConfValue(target.getConfigValue(conf_key)) or conf_key in target.getSimilarTo_Deprecated():
-                    logger.debug(
-                        'Adding target-dependent dependency specs for target config %s to component %s' %
-                        (conf_key, self.getName())
-                    )
-                    deps += [specForDependency(x[0], x[1], False) for x in target_conf_deps.items()]
-
-
-        deps += [specForDependency(x[0], x[1], True) for x in self.description.get('testDependencies', {}).items()]
-        target_deps = self.description.get('testTargetDependencies', {})
-        if target is not None:
-            for conf_key, target_conf_deps in target_deps.items():
-                if _truthyConfValue(target.getConfigValue(conf_key)) or conf_key in target.getSimilarTo_Deprecated():
-                    logger.debug(
-                        'Adding test-target-dependent dependency specs for target config %s to component %s' %
-                        (conf_key, self.getName())
-                    )
-                    deps += [specForDependency(x[0], x[1], True) for x in target_conf_deps.items()]
-
-        # remove duplicates (use the first occurrence)
-        seen = set()
-        r = []
-        for dep in deps:
-            if not dep.name in seen:
-                r.append(dep)
-                seen.add(dep.name)
-
-        return r
+        return dependencySpecsFromDescription(
+            self.description, self.getName(), self.getShrinkwrapMapping(), target=target
+        )
 
     def hasDependency(self, name, target=None, test_dependencies=False):
         ''' Check if this module has any dependencies with the specified name
@@ -321,11 +330,7 @@ class Component(pack.Pack):
             except vcs.VCSError as e:
                 errors.append(e)
                 self.dependencies_failed = True
-        specs = self.getDependencySpecs(target=target)
-        if not test:
-            # filter out things that aren't test dependencies if necessary:
-            specs = [x for x in specs if not x.is_test_dependency]
-        #dependencies = pool.map(
+        specs = self.__dependencySpecsForTest(target, test)
         dependencies = map(
             satisfyDep, specs
         )
@@ -333,6 +338,13 @@ class Component(pack.Pack):
         # stable order is important!
         return (OrderedDict([((d and d.getName()) or specs[i].name, d) for i, d in enumerate(dependencies)]), errors)
 
+    def __dependencySpecsForTest(self, target, test):
+        specs = self.getDependencySpecs(target=target)
+        if not test:
+            # filter out things that aren't test dependencies if necessary:
+            specs = [x for x in specs if not x.is_test_dependency]
+        return specs
+
 
     def __getDependenciesRecursiveWithProvider(self,
                                available_components = None,
@@ -341,6 +353,7 @@ class Component(pack.Pack):
                                      traverse_links = False,
                                    update_installed = False,
                                            provider = None,
+                                         prefetcher = None,
                                                test = False,
                                          _processed = None
     ):
@@ -395,6 +408,20 @@ class Component(pack.Pack):
                             working_directory,
                             update_if_installed
                           )
+                prefetcher: None (default) or function:
+                          prefetcher(
+                            dependency_specs,
+                            available_components,
+                            search_dirs
+                          )
+                    If specified, this is called with all of the dependency
+                    specifications that are about to be passed to the
+                    provider (including those of all the dependencies that
+                    will be recursed into next), so that it can fetch
+                    anything that the provider will need concurrently. The
+                    provider is still called for each dependency in order, so
+                    that resolution is deterministic.
+
                 test:
                     True, False, 'toplevel': should test-only dependencies be
                     included (yes, no, or only at this level, not recursively)
@@ -421,6 +448,10 @@ class Component(pack.Pack):
         if self.isTestDependency():
             logger.debug("won't provide test dependencies recursively for test dependency %s", self.getName())
             test = False
+        if prefetcher is not None and not _processed:
+            # when recursing, the dependencies of each component have already
+            # been passed to the prefetcher by its parent
+            prefetcher(self.__dependencySpecsForTest(target, test), available_components, search_dirs)
         components, errors = self.__getDependenciesWithProvider(
             available_components = available_components,
                      search_dirs = search_dirs,
@@ -437,6 +468,17 @@ class Component(pack.Pack):
         logger.debug('processed %s\nneed recursion: %s\navailable:%s\nsearch dirs:%s' % (self.getName(), need_recursion, available_components, search_dirs))
         if test == 'toplevel':
             test = False
+        if prefetcher is not None:
+            # the whole next level of the dependency graph can be fetched at
+            # once, even though it is resolved one component at a time below
+            prefetcher(
+                [
+                    spec for c in need_recursion
+                         for spec in c.__dependencySpecsForTest(target, test and not c.isTestDependency())
+                ],
+                available_components,
+                search_dirs
+            )
         # NB: can't perform this step in parallel, since the available
         # components list must be updated in order
         for c in need_recursion:
@@ -447,6 +489,7 @@ class Component(pack.Pack):
                       traverse_links = traverse_links,
                     update_installed = update_installed,
                             provider = provider,
+                          prefetcher = prefetcher,
                                 test = test,
                           _processed = _processed
             )
@@ -515,18 +558,34 @@ class Component(pack.Pack):
             satisfyDependenciesRecursive()
 
             Returns {component_name:component}
+
+            When the dependencies of this component for a target are
+            resolved (with only this component available to start with),
+            the result is saved in the target's build directory, and re-used
+            by later calls until anything is installed or modified.
         '''
-        components, errors = self.__getDependenciesRecursiveWithProvider(
-           available_components = available_components,
-                    search_dirs = search_dirs,
-                         target = target,
-                 traverse_links = True,
-               update_installed = False,
-                       provider = self.provideInstalled,
-                           test = test
-        )
-        for error in errors:
-            logger.error(error)
+        # resolved_graph, , saved resolved dependencies, internal
+        from yotta.lib import resolved_graph
+        use_resolved_graph = target is not None and search_dirs is None and \
+            isinstance(available_components, (list, tuple)) and \
+            list(available_components) == [(self.getName(), self)]
+        components = None
+        if use_resolved_graph:
+            components = resolved_graph.load(self, target, test)
+        if components is None:
+            components, errors = self.__getDependenciesRecursiveWithProvider(
+               available_components = available_components,
+                        search_dirs = search_dirs,
+                             target = target,
+                     traverse_links = True,
+                   update_installed = False,
+                           provider = self.provideInstalled,
+                               test = test
+            )
+            for error in errors:
+                logger.error(error)
+            if use_resolved_graph and not errors:
+                resolved_graph.save(self, target, test, components)
         if available_only:
             components = OrderedDict((k, v) for k, v in components.items() if v)
         return components
@@ -595,7 +654,67 @@ class Component(pack.Pack):
                     installed? (yes, no, or only for this module, not its
                     dependencies).
 
+            Before anything is installed, the versions of all the
+            dependencies are solved for at once (see solver.py), so that if
+            there is no set of versions that meets every requirement the
+            reason is returned as an error, and nothing is installed.
         '''
+        # solver, , choose consistent versions of dependencies, internal
+        from yotta.lib import solver
+        # pool, , shared thread pool, internal
+        from yotta.lib.pool import pool
+        try:
+            solution = solver.solve(
+                                self,
+                              target = target,
+                                test = test,
+                available_components = self.ensureOrderedDict(available_components),
+                         search_dirs = list(search_dirs or []),
+                    update_installed = update_installed
+            )
+        except solver.SolveFailure as e:
+            return (OrderedDict(), [e])
+        # versions chosen by the solver that need to be installed, replacing
+        # any other version that is installed:
+        to_install = OrderedDict(
+            (name, c.remote_version) for name, c in solution.items() if c.remote_version is not None
+        )
+        def prefetchSolved(v):
+            try:
+                v.prefetch()
+            except Exception as e:
+                # the error is reported when installing
+                logger.debug('failed to prefetch %s: %s', v, e)
+        pool.map(prefetchSolved, to_install.values())
+
+        # remote versions that have been resolved, and downloaded into the
+        # cache, ahead of being installed: {name: (version_required, version)}
+        prefetched = {}
+        def prefetcher(dspecs, available_components, search_dirs):
+            # pool, , shared thread pool, internal
+            from yotta.lib.pool import pool
+            to_fetch = OrderedDict()
+            for dspec in dspecs:
+                if dspec.name in to_fetch or dspec.name in prefetched or \
+                   dspec.name in solution or available_components.get(dspec.name):
+                    continue
+                # anything already on disk is satisfied (or updated) by the
+                # provider itself, only things that are definitely going to
+                # be installed are fetched early:
+                if any(os.path.exists(os.path.join(d, dspec.name)) for d in search_dirs + [self.modulesPath()]):
+                    continue
+                to_fetch[dspec.name] = dspec
+            if not to_fetch:
+                return
+            logger.debug('prefetch %s', list(to_fetch.keys()))
+            versions = pool.map(
+                lambda dspec: access.prefetchVersion(dspec.name, dspec.versionReq()),
+                to_fetch.values()
+            )
+            for dspec, v in zip(to_fetch.values(), versions):
+                if v is not None:
+                    prefetched[dspec.name] = (dspec.versionReq(), v)
+
         def provider(
             dspec,
             available_components,
@@ -610,8 +729,26 @@ class Component(pack.Pack):
                     logger.debug('test dependency subsequently occurred as real dependency: %s', r.getName())
                     r.setTestDependency(False)
                 return r
+            default_path = os.path.join(self.modulesPath(), dspec.name)
+            if dspec.name in to_install:
+                # the solver chose a version that isn't installed
+                if not fsutils.isLink(default_path):
+                    fsutils.rmRf(default_path)
+                r = access.satisfyVersionByInstalling(
+                    dspec.name,
+                    dspec.versionReq(),
+                    self.modulesPath(),
+                    inherit_shrinkwrap = dep_of.getShrinkwrap(),
+                        remote_version = to_install[dspec.name]
+                )
+                r.setTestDependency(dspec.is_test_dependency)
+                return r
+            # (if the solver chose the installed version, it has already
+            # considered any newer ones)
             update_if_installed = False
-            if update_installed is True:
+            if dspec.name in solution:
+                pass
+            elif update_installed is True:
                 update_if_installed = True
             elif update_installed:
                 update_if_installed = dspec.name in update_installed
@@ -629,7 +766,6 @@ class Component(pack.Pack):
             # existing linked module (which wasn't picked up because it didn't
             # match the version specification) - if we do, then we shouldn't
             # try to install, but should return that anyway:
-            default_path = os.path.join(self.modulesPath(), dspec.name)
             if fsutils.isLink(default_path):
                 r = Component(
                                        default_path,
@@ -644,11 +780,15 @@ class Component(pack.Pack):
                     logger.error('linked module %s is invalid: %s', dspec.name, r.getError())
                     return r
 
+            remote_version = None
+            if dspec.name in prefetched and prefetched[dspec.name][0] == dspec.versionReq():
+                remote_version = prefetched[dspec.name][1]
             r = access.satisfyVersionByInstalling(
                 dspec.name,
                 dspec.versionReq(),
                 self.modulesPath(),
-                inherit_shrinkwrap = dep_of.getShrinkwrap()
+                inherit_shrinkwrap = dep_of.getShrinkwrap(),
+                    remote_version = remote_version
             )
             if not r:
                 logger.error('could not install %s' % dspec.name)
@@ -663,6 +803,7 @@ class Component(pack.Pack):
                  traverse_links = traverse_links,
                update_installed = update_installed,
                        provider = provider,
+                     prefetcher = prefetcher,
                            test = test
         )
 
@@ -830,6 +971,7 @@ class Component(pack.Pack):
         return spec
 
     def saveDependency(self, component, spec=None):
+        self.detachDescription()
         if not 'dependencies' in self.description:
             self.description['dependencies'] = OrderedDict()
         if spec is None:
@@ -841,6 +983,7 @@ class Component(pack.Pack):
         if not component in self.description.get('dependencies', {}):
             logger.error('%s is not listed as a dependency', component)
             return False
+        self.detachDescription()
         del self.description['dependencies'][component]
         return True
 
@@ -8,6 +8,7 @@ import os
 import errno
 import shutil
 import stat
+import tempfile
 
 def mkDirP(path):
     try:
@@ -70,6 +71,38 @@ def rmRf(path):
             # in all other cases, raise the exception
             raise
 
+def writeFileAtomically(path, write_fn):
+    ''' Call write_fn(temp_path) to write a temporary file alongside path, and
+        then move it into place, so that concurrent readers of path never see
+        a partially written file. Creates the directory containing path if
+        necessary.
+    '''
+    mkDirP(os.path.dirname(path))
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.locked')
+    os.close(fd)
+    try:
+        write_fn(temp_path)
+        try:
+            os.rename(temp_path, path)
+        except OSError:
+            # on windows rename won't replace an existing file
+            rmF(path)
+            os.rename(temp_path, path)
+    finally:
+        rmF(temp_path)
+
+def treeSize(path):
+    ''' Return the total size in bytes of the files in the directory tree at
+        path (not following symlinks). '''
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.lstat(os.path.join(root, f)).st_size
+            except OSError:
+                # removed while we were walking the tree
+                pass
+    return total
 
 def fullySplitPath(path):
     components = []
@@ -101,6 +134,7 @@ realpath      = _platform_fsutils.realpath
 dropRootPrivs = _platform_fsutils.dropRootPrivs
 rmLink        = _platform_fsutils.rmLink
 which         = _platform_fsutils.which
+reflink       = _platform_fsutils.reflink
 
 # !!! FIXME: the logic in the "except" block below probably doesn't work in Windows
 def symlink(source, link_name):
@@ -111,3 +145,55 @@ def symlink(source, link_name):
     except OSError as exception:
         if exception.errno != errno.EEXIST and (tryReadLink(link_name) != source):
             raise
+
+def cloneTree(source, dest, allow_hardlinks=False):
+    ''' Recursively copy the directory tree source to dest (which must not
+        exist), using copy-on-write clones of files if the filesystem
+        supports them, otherwise hard links (if allow_hardlinks is True), and
+        otherwise plain copies. Symlinks are copied as symlinks.
+
+        Returns the method that was used for files: 'reflink', 'hardlink' or
+        'copy'.
+    '''
+    methods = ['reflink', 'hardlink', 'copy']
+    if not allow_hardlinks:
+        methods.remove('hardlink')
+    def cloneFile(src, dst):
+        while True:
+            method = methods[0]
+            if method == 'reflink':
+                if reflink(src, dst):
+                    shutil.copymode(src, dst)
+                    return
+            elif method == 'hardlink':
+                try:
+                    os.link(src, dst)
+                    return
+                except OSError as e:
+                    if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                        raise
+            else:
+                shutil.copy2(src, dst)
+                return
+            # this method isn't supported, don't try it again:
+            methods.pop(0)
+
+    os.makedirs(dest)
+    for root, dirs, files in os.walk(source):
+        dest_root = os.path.join(dest, os.path.relpath(root, source))
+        for d in dirs:
+            src = os.path.join(root, d)
+            dst = os.path.join(dest_root, d)
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), dst)
+            else:
+                os.mkdir(dst)
+                shutil.copymode(src, dst)
+        for f in files:
+            src = os.path.join(root, f)
+            dst = os.path.join(dest_root, f)
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), dst)
+            else:
+                cloneFile(src, dst)
+    return methods[0]
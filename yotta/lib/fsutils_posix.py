@@ -10,6 +10,7 @@ import multiprocessing
 import logging
 import sys
 import traceback
+import errno
 
 def _getNobodyPidGid():
     entry = pwd.getpwnam('nobody')
@@ -109,4 +110,36 @@ def which(program):
     # not found
     return None
 
-
+def reflink(source, dest):
+    ''' Create dest as a copy-on-write clone of the file source, if the
+        platform and filesystem support it. Returns True if successful, or
+        False if reflinks are not supported (in which case dest is not
+        created).
+    '''
+    if sys.platform.startswith('linux'):
+        import fcntl
+        # FICLONE from linux/fs.h
+        FICLONE = 0x40049409
+        with open(source, 'rb') as src_f:
+            with open(dest, 'wb') as dst_f:
+                try:
+                    fcntl.ioctl(dst_f.fileno(), FICLONE, src_f.fileno())
+                    return True
+                except (IOError, OSError) as e:
+                    if e.errno not in (errno.EOPNOTSUPP, errno.EXDEV, errno.EINVAL, errno.ENOTTY, errno.EPERM):
+                        raise
+        os.unlink(dest)
+        return False
+    elif sys.platform == 'darwin':
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        if not hasattr(libc, 'clonefile'):
+            return False
+        if libc.clonefile(source.encode('utf-8'), dest.encode('utf-8'), 0) == 0:
+            return True
+        e = ctypes.get_errno()
+        if e in (errno.ENOTSUP, errno.EXDEV):
+            return False
+        raise OSError(e, os.strerror(e), dest)
+    return False
@@ -72,4 +72,7 @@ def which(program):
     # not found
     return None
 
-
+def reflink(source, dest):
+    ''' Copy-on-write clones are not supported on windows: always returns
+        False. '''
+    return False
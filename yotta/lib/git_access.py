@@ -31,18 +31,28 @@ class GitCloneVersion(version.Version):
         logger.debug('unpack version %s from git repo %s to %s' % (self.version, self.working_copy.directory, directory))
         tag = self.tag
         fsutils.rmRf(directory)
-        vcs.Git.cloneToDirectory(self.working_copy.directory, directory, tag)
+        # cloning from a local repository hard-links its objects, rather than
+        # copying them:
+        r = vcs.Git.cloneToDirectory(self.working_copy.directory, directory, tag)
+        if self.working_copy.remote is not None:
+            r.setRemote(self.working_copy.remote)
 
         # remove temporary files created by the GitWorkingCopy clone
         self.working_copy.remove()
 
 class GitWorkingCopy(object):
-    def __init__(self, vcs):
+    def __init__(self, vcs, remote=None):
+        ''' vcs is a temporary clone, or the cached mirror of the repository
+            at the URL remote.
+        '''
         self.vcs = vcs
+        self.remote = remote
         self.directory = vcs.workingDirectory()
 
     def remove(self):
-        self.vcs.remove()
+        # mirrors are kept for next time
+        if self.remote is None:
+            self.vcs.remove()
         self.directory = None
 
     def availableVersions(self):
@@ -112,18 +122,21 @@ class GitComponent(access_common.RemoteComponent):
     def tagOrBranchSpec(self):
         return self.tag_or_branch
 
-    # clone the remote repository: this is necessary to find out what tagged
+    # mirror the remote repository: this is necessary to find out what tagged
     # versions are available.
-    # The clone is created in /tmp, and is not automatically deleted, but the
-    # returned version object maintains a handle to it, so that when a specific
-    # version is requested it can be retrieved from the temporary clone,
-    # instead of from the remote origin.
+    # The mirror is kept in the yotta cache directory, and only updated with a
+    # fetch the next time it's needed. The returned version object maintains
+    # a handle to it, so that when a specific version is requested it can be
+    # retrieved from the mirror, instead of from the remote origin.
     def clone(self):
         # vcs, , represent version controlled directories, internal
         from yotta.lib import vcs
-        clone = vcs.Git.cloneToTemporaryDir(self.url)
-        clone.fetchAllBranches()
-        return GitWorkingCopy(clone)
+        if access_common.isOffline():
+            try:
+                return GitWorkingCopy(vcs.Git.mirror(self.url, update=False), self.url)
+            except vcs.VCSError as e:
+                raise access_common.Offline('yotta is offline, and %s has not been fetched before' % self.url)
+        return GitWorkingCopy(vcs.Git.mirror(self.url), self.url)
 
     @classmethod
     def remoteType(cls):
@@ -7,6 +7,9 @@
 import logging
 import re
 import functools
+import threading
+import time
+import json
 
 # requests, apache2
 import requests
@@ -22,9 +25,15 @@ from yotta.lib import access_common
 from yotta.lib import auth
 # globalconf, share global arguments between modules, internal
 from yotta.lib import globalconf
+# metadata_cache, , cache of registry metadata, internal
+from yotta.lib import metadata_cache
+# sessions, , shared HTTP sessions, internal
+from yotta.lib import sessions
 
 # Constants
 _github_url = 'https://api.github.com'
+_Page_Size = 100
+_Request_Timeout = 30
 
 logger = logging.getLogger('access')
 
@@ -34,6 +43,12 @@ logger = logging.getLogger('access')
 ## parallel, so they must not share resources that are stateful and do not
 ## maintain their state in a threadsafe way
 
+# the most recent X-RateLimit-Remaining and X-RateLimit-Reset returned by the
+# API, and the URLs that have already been revalidated by this process:
+_rate_limit = {'remaining': None, 'reset': None}
+_revalidated = set()
+_rate_limit_lock = threading.Lock()
+
 # Internal functions
 
 def _userAuthedWithGithub():
@@ -48,6 +63,79 @@ def _ensureDomainPrefixed(url):
     else:
         return url
 
+def _updateRateLimit(response):
+    try:
+        remaining = int(response.headers['X-RateLimit-Remaining'])
+        reset = float(response.headers['X-RateLimit-Reset'])
+    except (KeyError, ValueError):
+        return
+    with _rate_limit_lock:
+        _rate_limit['remaining'] = remaining
+        _rate_limit['reset'] = reset
+    logger.debug('github rate limit: %s requests remaining', remaining)
+
+def _rateLimitExhausted():
+    with _rate_limit_lock:
+        return (
+            _rate_limit['remaining'] is not None and _rate_limit['remaining'] <= 0 and
+            _rate_limit['reset'] > time.time()
+        )
+
+def _cachedAPIGet(url):
+    ''' GET a github API url, via the metadata cache. Cached responses are
+        revalidated with their ETag (which github doesn't count against the
+        rate limit), at most once per process. If the rate limit has been
+        used up then cached responses are used without revalidating them at
+        all, so that the requests that remain are for things not in the
+        cache.
+    '''
+    entry = metadata_cache.get(url)
+    if entry is not None:
+        with _rate_limit_lock:
+            revalidated = url in _revalidated
+        if revalidated:
+            return entry['content']
+        if _rateLimitExhausted():
+            logger.debug('github rate limit exhausted, using cached %s', url)
+            return entry['content']
+    headers = {'Accept': 'application/vnd.github.v3+json'}
+    tok = settings.getProperty('github', 'authtoken')
+    if tok is not None:
+        headers['Authorization'] = 'token ' + str(tok)
+    response = metadata_cache.cachedGet(
+        sessions.forRegistry(_github_url), url, headers=headers, timeout=_Request_Timeout
+    )
+    if not getattr(response, 'from_cache', False):
+        _updateRateLimit(response)
+        if response.status_code == 403 and entry is not None and _rateLimitExhausted():
+            logger.warning('github rate limit exceeded, using cached %s', url)
+            return entry['content']
+        if response.status_code == 404:
+            # raise the same exception as PyGithub, so that it's handled the
+            # same way as for the other API requests
+            raise github.UnknownObjectException(404, response.text)
+        response.raise_for_status()
+    with _rate_limit_lock:
+        _revalidated.add(url)
+    return response.text
+
+def _getPaginated(path):
+    ''' Return the list of all items from a paginated API endpoint. '''
+    r = []
+    page = 1
+    while True:
+        items = json.loads(_cachedAPIGet(
+            _ensureDomainPrefixed(path) + '?per_page=%d&page=%d' % (_Page_Size, page)
+        ))
+        r += items
+        if len(items) < _Page_Size:
+            return r
+        page += 1
+
+def _checkOnline(repo):
+    if access_common.isOffline():
+        raise access_common.Offline('yotta is offline, so github repository %s is not available' % repo)
+
 def _handleAuth(fn):
     ''' Decorator to re-try API calls after asking the user for authentication. '''
     @functools.wraps(fn)
@@ -113,30 +201,27 @@ def _handleAuth(fn):
 def _getTags(repo):
     ''' return a dictionary of {tag: tarball_url}'''
     logger.debug('get tags for %s', repo)
-    g = Github(settings.getProperty('github', 'authtoken'))
-    repo = g.get_repo(repo)
-    tags = repo.get_tags()
-    logger.debug('tags for %s: %s', repo, [t.name for t in tags])
-    return {t.name: _ensureDomainPrefixed(t.tarball_url) for t in tags}
+    tags = _getPaginated('/repos/%s/tags' % repo)
+    logger.debug('tags for %s: %s', repo, [t['name'] for t in tags])
+    return {t['name']: _ensureDomainPrefixed(t['tarball_url']) for t in tags}
 
 def _tarballUrlForBranch(repo, branchname=None):
-    r = _ensureDomainPrefixed(repo.url) + u'/tarball'
+    r = _ensureDomainPrefixed('/repos/%s' % repo) + u'/tarball'
     if branchname:
         r += '/' + branchname
     return r
 
 @_handleAuth
 def _getBranchHeads(repo):
-    g = Github(settings.getProperty('github', 'authtoken'))
-    repo = g.get_repo(repo)
-    branches = repo.get_branches()
+    branches = _getPaginated('/repos/%s/branches' % repo)
 
-    return {b.name:_tarballUrlForBranch(repo, b.name) for b in branches}
+    return {b['name']:_tarballUrlForBranch(repo, b['name']) for b in branches}
 
 
 @_handleAuth
 def _getTipArchiveURL(repo):
     ''' return a string containing a tarball url '''
+    _checkOnline(repo)
     g = Github(settings.getProperty('github', 'authtoken'))
     repo = g.get_repo(repo)
     return repo.get_archive_link('tarball')
@@ -144,6 +229,7 @@ def _getTipArchiveURL(repo):
 @_handleAuth
 def _getCommitArchiveURL(repo, commit):
     ''' return a string containing a tarball url '''
+    _checkOnline(repo)
     g = Github(settings.getProperty('github', 'authtoken'))
     repo = g.get_repo(repo)
     return repo.get_archive_link('tarball', commit)
@@ -155,6 +241,8 @@ def _getTarball(url, into_directory, cache_key, origin_info=None):
     try:
         access_common.unpackFromCache(cache_key, into_directory)
     except KeyError as e:
+        if access_common.isOffline():
+            raise access_common.Offline('yotta is offline, and %s is not cached' % url)
         tok = settings.getProperty('github', 'authtoken')
         headers = {}
         if tok is not None:
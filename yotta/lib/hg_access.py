@@ -34,19 +34,27 @@ class HGCloneVersion(version.Version):
         else:
             tag = self.tag
         fsutils.rmRf(directory)
-        vcs.HG.cloneToDirectory(self.working_copy.directory, directory, tag)
+        r = vcs.HG.cloneToDirectory(self.working_copy.directory, directory, tag)
+        if self.working_copy.remote is not None:
+            r.setRemote(self.working_copy.remote)
 
         # remove temporary files created by the HGWorkingCopy clone
         self.working_copy.remove()
 
 
 class HGWorkingCopy(object):
-    def __init__(self, vcs):
+    def __init__(self, vcs, remote=None):
+        ''' vcs is a temporary clone, or the cached mirror of the repository
+            at the URL remote.
+        '''
         self.vcs = vcs
+        self.remote = remote
         self.directory = vcs.workingDirectory()
 
     def remove(self):
-        self.vcs.remove()
+        # mirrors are kept for next time
+        if self.remote is None:
+            self.vcs.remove()
         self.directory = None
 
     def availableVersions(self):
@@ -90,15 +98,15 @@ class HGComponent(access_common.RemoteComponent):
     def versionSpec(self):
         return self.spec
 
-    # clone the remote repository: this is necessary to find out what tagged
-    # versions are available.
-    # The clone is created in /tmp, and is not automatically deleted, but the
-    # returned version object maintains a handle to it, so that when a specific
-    # version is requested it can be retrieved from the temporary clone,
-    # instead of from the remote origin.
+    # mirror the remote repository: this is necessary to find out what tagged
+    # versions are available (see GitComponent.clone)
     def clone(self):
-        clone = vcs.HG.cloneToTemporaryDir(self.url)
-        return HGWorkingCopy(clone)
+        if access_common.isOffline():
+            try:
+                return HGWorkingCopy(vcs.HG.mirror(self.url, update=False), self.url)
+            except vcs.VCSError as e:
+                raise access_common.Offline('yotta is offline, and %s has not been fetched before' % self.url)
+        return HGWorkingCopy(vcs.HG.mirror(self.url), self.url)
 
     @classmethod
     def remoteType(cls):
@@ -0,0 +1,151 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# Matching of paths against the glob patterns in .yotta_ignore files.
+#
+# Patterns have the same meaning as for pathlib's PurePath.match, applied to
+# a path (relative to the root of the module) and to each of its parent
+# directories: patterns starting with / must match the whole path, other
+# patterns match the end of it, and * ? and [...] never match across path
+# separators. Instead of trying each pattern against each parent for every
+# query, all the patterns are compiled into a single regular expression, and
+# the result for each directory is remembered, so that everything in an
+# ignored directory is ignored without any further matching.
+
+# standard library modules, , ,
+import os
+import re
+import fnmatch
+import logging
+
+logger = logging.getLogger('components')
+
+if os.name == 'nt':
+    _Separators = ('\\', '/')
+    _Root = '\\'
+    _Re_Flags = re.IGNORECASE
+else:
+    _Separators = ('/',)
+    _Root = '/'
+    _Re_Flags = 0
+
+def _splitPath(path):
+    ''' Split a path or pattern into (is_absolute, [parts]), discarding empty
+        and '.' parts in the same way as pathlib. '''
+    for sep in _Separators[1:]:
+        path = path.replace(sep, _Separators[0])
+    is_absolute = path.startswith(_Separators[0])
+    return (is_absolute, [p for p in path.split(_Separators[0]) if p not in ('', '.')])
+
+def _translatePart(pattern):
+    ''' Translate a single path part of a glob pattern into a regular
+        expression that never matches '/'. '''
+    i, n = 0, len(pattern)
+    r = []
+    while i < n:
+        c = pattern[i]
+        i += 1
+        if c == '*':
+            r.append('[^/]*')
+        elif c == '?':
+            r.append('[^/]')
+        elif c == '[':
+            j = i
+            if j < n and pattern[j] == '!':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            while j < n and pattern[j] != ']':
+                j += 1
+            if j >= n:
+                r.append('\\[')
+            else:
+                stuff = pattern[i:j].replace('\\', '\\\\')
+                stuff = re.sub(r'([&~|\[])', r'\\\1', stuff)
+                i = j + 1
+                if stuff[0] == '!':
+                    stuff = '^' + stuff[1:]
+                elif stuff[0] == '^':
+                    stuff = '\\' + stuff
+                r.append('(?!/)[%s]' % stuff)
+        else:
+            r.append(re.escape(c))
+    return ''.join(r)
+
+def _translate(pattern):
+    ''' Translate a pattern into a regular expression that matches the paths
+        (in the form '/a/b/c') that the pattern matches itself (not
+        considering their parent directories). Returns None if the pattern
+        matches the root directory, and therefore everything.
+    '''
+    is_absolute, parts = _splitPath(pattern)
+    if not parts:
+        raise ValueError('empty ignore pattern')
+    translated = ''.join('/' + _translatePart(p) for p in parts) + r'\Z'
+    if is_absolute:
+        return r'\A' + translated
+    # relative patterns are matched against all the parts of a path, which
+    # (as it's always made absolute) includes the root, so a first part that
+    # matches the root makes the rest of the pattern match from the start:
+    if fnmatch.fnmatchcase(_Root, parts[0]):
+        if len(parts) == 1:
+            return None
+        return '(?:%s|\\A%s)' % (
+            translated, ''.join('/' + _translatePart(p) for p in parts[1:]) + r'\Z'
+        )
+    return translated
+
+
+class IgnoreMatcher(object):
+    ''' Test paths against a list of ignore patterns. '''
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.ignores_everything = False
+        expressions = []
+        for p in self.patterns:
+            e = _translate(p)
+            if e is None:
+                self.ignores_everything = True
+            else:
+                expressions.append(e)
+        if expressions:
+            self.regex = re.compile('|'.join('(?:%s)' % e for e in expressions), _Re_Flags)
+        else:
+            self.regex = None
+        # directory parts tuple: whether the directory is ignored
+        self.ignored_dirs = {}
+
+    def _matches(self, parts):
+        if self.regex is None:
+            return False
+        test_path = '/' + '/'.join(parts)
+        if self.regex.search(test_path) is None:
+            return False
+        if logger.isEnabledFor(logging.DEBUG):
+            for p in self.patterns:
+                e = _translate(p)
+                if e is not None and re.search(e, test_path, _Re_Flags):
+                    logger.debug('"%s" ignored (matched "%s")', test_path, p)
+                    break
+        return True
+
+    def _ignoresDirectory(self, parts):
+        r = self.ignored_dirs.get(parts, None)
+        if r is None:
+            r = bool(parts) and (self._ignoresDirectory(parts[:-1]) or self._matches(parts))
+            self.ignored_dirs[parts] = r
+        return r
+
+    def ignores(self, path):
+        ''' Test if the patterns ignore "path", which must be relative to the
+            root that the patterns are relative to. Paths within an ignored
+            directory are also ignored.
+        '''
+        if self.ignores_everything:
+            return True
+        parts = tuple(_splitPath(path)[1])
+        if not parts:
+            return False
+        return self._ignoresDirectory(parts[:-1]) or self._matches(parts)
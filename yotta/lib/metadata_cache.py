@@ -0,0 +1,151 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# Cache of metadata (such as the lists of available versions of modules)
+# fetched from registries and other servers. Each entry is stored with the
+# ETag and Last-Modified validators that the server returned, so that it can
+# be revalidated with a conditional request (which the server answers with an
+# empty 304 response if nothing has changed), instead of being re-downloaded.
+
+# standard library modules, , ,
+import os
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+
+# fsutils, , misc filesystem utils, internal
+from yotta.lib import fsutils
+# folders, , where yotta stores things, internal
+from yotta.lib import folders
+# Ordered JSON, , read & write json, internal
+from yotta.lib import ordered_json
+# settings, , load and save settings, internal
+from yotta.lib import settings
+
+cache_logger = logging.getLogger('cache')
+
+def cacheDirectory():
+    return os.path.join(folders.cacheDirectory(), 'metadata')
+
+_max_age = None
+def getMaxAge():
+    ''' Return the age in seconds for which cached metadata is used without
+        revalidating it with the server at all. This is zero (always
+        revalidate) unless the metadataCacheMaxAge setting is set.
+    '''
+    global _max_age
+    if _max_age is None:
+        _max_age = settings.get('metadataCacheMaxAge')
+        try:
+            _max_age = float(_max_age or 0)
+        except ValueError:
+            cache_logger.warning('invalid metadataCacheMaxAge setting "%s" ignored', _max_age)
+            _max_age = 0
+    return _max_age
+
+def _pathForKey(key):
+    return os.path.join(cacheDirectory(), hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+def get(key):
+    ''' Return the cached entry for key, or None if there is no (readable)
+        entry. Entries are dictionaries with the properties:
+
+          content:       the cached response body
+          etag:          the ETag of the response (or None)
+          last_modified: the Last-Modified date of the response (or None)
+          time:          the time at which the entry was last validated
+    '''
+    try:
+        entry = ordered_json.load(_pathForKey(key))
+    except IOError:
+        return None
+    except ValueError:
+        # corrupt entry (e.g. written by an interrupted process), ignore it
+        cache_logger.debug('ignoring corrupt metadata cache entry for %s', key)
+        return None
+    if entry.get('key', None) != key or 'content' not in entry:
+        return None
+    return entry
+
+def put(key, content, etag=None, last_modified=None):
+    ''' Store content in the cache, returns the new entry. '''
+    entry = OrderedDict([
+        ('key', key),
+        ('etag', etag),
+        ('last_modified', last_modified),
+        ('time', time.time()),
+        ('content', content)
+    ])
+    _write(key, entry)
+    return entry
+
+def touch(key, entry):
+    ''' Record that entry was just revalidated. '''
+    entry['time'] = time.time()
+    _write(key, entry)
+
+def isFresh(entry):
+    return (time.time() - entry['time']) < getMaxAge()
+
+def _write(key, entry):
+    try:
+        fsutils.writeFileAtomically(_pathForKey(key), lambda path: ordered_json.dump(path, entry))
+    except (OSError, IOError) as e:
+        # failing to cache things is never fatal
+        cache_logger.debug('failed to write metadata cache entry for %s: %s', key, e)
+
+
+class CachedResponse(object):
+    ''' Stands in for a requests Response object when a response is served
+        from the cache. '''
+    def __init__(self, url, entry):
+        self.url = url
+        self.status_code = 200
+        self.text = entry['content']
+        self.from_cache = True
+
+    def raise_for_status(self):
+        pass
+
+def cachedGet(session, url, headers=None, **kwargs):
+    ''' GET url using session, via the metadata cache: the response is either
+        a CachedResponse (if a fresh cached entry existed, or the server
+        confirmed that the cached entry was still valid), or the response
+        from the server (which is cached if it was successful).
+
+        When yotta is offline cached entries are always used, and
+        access_common.Offline is raised if there is no cached entry.
+    '''
+    # access_common, , things shared between different component access modules, internal
+    from yotta.lib import access_common
+    entry = get(url)
+    if access_common.isOffline():
+        if entry is None:
+            raise access_common.Offline('yotta is offline, and %s is not cached' % url)
+        cache_logger.debug('%s served from metadata cache (offline)', url)
+        return CachedResponse(url, entry)
+    if entry is not None:
+        if isFresh(entry):
+            cache_logger.debug('%s served from metadata cache', url)
+            return CachedResponse(url, entry)
+        headers = dict(headers or {})
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+    response = session.get(url, headers=headers, **kwargs)
+    if entry is not None and response.status_code == 304:
+        cache_logger.debug('%s not modified, using metadata cache', url)
+        touch(url, entry)
+        return CachedResponse(url, entry)
+    if response.status_code == 200:
+        put(
+            url,
+            response.text,
+            etag = response.headers.get('ETag', None),
+            last_modified = response.headers.get('Last-Modified', None)
+        )
+    return response
@@ -4,7 +4,6 @@
 # See LICENSE file for details.
 
 # standard library modules, , ,
-import json
 import os
 from collections import OrderedDict
 import tarfile
@@ -14,19 +13,16 @@ import errno
 import copy
 import hashlib
 
-# PyPi/standard library > 3.4
-# it has to be PurePath
-from pathlib import PurePath
-
-# JSON Schema, pip install jsonschema, Verify JSON Schemas, MIT
-import jsonschema
-
 # Ordered JSON, , read & write json, internal
 from yotta.lib import ordered_json
 # fsutils, , misc filesystem utils, internal
 from yotta.lib import fsutils
 # Registry Access, , access packages in the registry, internal
 from yotta.lib import registry_access
+# ignores, , match .yotta_ignore patterns, internal
+from yotta.lib import ignores
+# schema_validation, , validate descriptions against schemas, internal
+from yotta.lib import schema_validation
 
 # These patterns are used in addition to any glob expressions defined by the
 # .yotta_ignore file
@@ -133,78 +129,76 @@ class DependencySpec(object):
 def tryReadJSON(filename, schemaname):
     r = None
     try:
-        with open(filename, 'r') as jsonfile:
-            r = ordered_json.load(filename)
-            if schemaname is not None:
-                with open(schemaname, 'r') as schema_file:
-                    schema = json.load(schema_file)
-                    validator = jsonschema.Draft4Validator(schema)
-                    for error in validator.iter_errors(r):
-                        logger.error(
-                            '%s is not valid under the schema: %s value %s',
-                            filename,
-                            u'.'.join([str(x) for x in error.path]),
-                            error.message
-                        )
+        with open(filename, 'rb') as jsonfile:
+            text = jsonfile.read()
+        r = ordered_json.loads(text.decode('utf-8'))
+        if schemaname is not None:
+            for path, message in schema_validation.validationErrors(r, schemaname, text):
+                logger.error(
+                    '%s is not valid under the schema: %s value %s',
+                    filename,
+                    path,
+                    message
+                )
     except IOError as e:
         if e.errno != errno.ENOENT:
             raise
     return r
 
-# Pack represents the common parts of Target and Component objects (versions,
-# VCS, etc.)
-
-class Pack(object):
-    schema_errors_displayed = set()
+def _fileSignature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size, st.st_ino)
+
+def _parseIgnoreFile(f):
+    r = []
+    for l in f:
+        l = l.rstrip('\n\r')
+        if not l.startswith('#') and len(l):
+            r.append(l)
+    return r
 
-    def __init__(
-            self,
-            path,
-            description_filename,
-            installed_linked,
-            schema_filename = None,
-            latest_suitable_version = None,
-            inherit_shrinkwrap = None
-        ):
+class _LoadedState(object):
+    ''' Everything that is read from the directory of a Pack when it's
+        created. This is shared by all the Pack objects created for the same
+        directory (until any of the files it was read from are modified), so
+        it must never be modified.
+    '''
+    def __init__(self, path, realpath, description_filename, schema_filename):
         # version, , represent versions and specifications, internal
         from yotta.lib import version
-        # vcs, , represent version controlled directories, internal
-        from yotta.lib import vcs
-
-        # resolve links at creation time, to minimise path lengths:
-        self.unresolved_path = path
-        self.path = fsutils.realpath(path)
-        self.installed_linked = installed_linked
-        self.vcs = None
         self.error = None
-        self.latest_suitable_version = latest_suitable_version
-        self.version = None
-        self.description_filename = description_filename
-        self.ignore_list_fname = Ignore_List_Fname
+        self.invalid = False
         self.ignore_patterns = copy.copy(Default_Publish_Ignore)
-        self.origin_info = None
+        self.ignore_matcher = None
         description_file = os.path.join(path, description_filename)
+        description_text = None
         if os.path.isfile(description_file):
             try:
-                self.description = ordered_json.load(description_file)
+                with open(description_file, 'rb') as f:
+                    description_text = f.read()
+                self.description = ordered_json.loads(description_text.decode('utf-8'))
                 if self.description:
                     if not 'name' in self.description:
                         raise Exception('missing "name"')
                     if 'version' in self.description:
-                        self.version = version.Version(self.description['version'])
+                        version.Version(self.description['version'])
                     else:
                         raise Exception('missing "version"')
             except Exception as e:
                 self.description = OrderedDict()
                 self.error = "Description invalid %s: %s" % (description_file, e);
+                self.invalid = True
                 logger.debug(self.error)
-                raise InvalidDescription(self.error)
+                return
         else:
             self.error = "No %s file." % description_filename
             self.description = OrderedDict()
         try:
-            with open(os.path.join(path, self.ignore_list_fname), 'r') as ignorefile:
-                self.ignore_patterns += self._parseIgnoreFile(ignorefile)
+            with open(os.path.join(path, Ignore_List_Fname), 'r') as ignorefile:
+                self.ignore_patterns += _parseIgnoreFile(ignorefile)
         except IOError as e:
             if e.errno != errno.ENOENT:
                 raise
@@ -230,41 +224,134 @@ class Pack(object):
                     str(yotta_version)
                 )
 
-        if self.description and schema_filename and not self.path in self.schema_errors_displayed:
-            self.schema_errors_displayed.add(self.path)
+        if self.description and schema_filename and not realpath in Pack.schema_errors_displayed:
+            Pack.schema_errors_displayed.add(realpath)
             have_errors = False
-            with open(schema_filename, 'r') as schema_file:
-                schema = json.load(schema_file)
-                validator = jsonschema.Draft4Validator(schema)
-                for error in validator.iter_errors(self.description):
-                    if not have_errors:
-                        logger.warning(u'%s has invalid %s:' % (
-                            os.path.split(self.path.rstrip('/'))[1],
-                            description_filename
-                        ))
-                        have_errors = True
-                    logger.warning(u"  %s value %s" % (u'.'.join([str(x) for x in error.path]), error.message))
+            for error_path, message in schema_validation.validationErrors(
+                    self.description, schema_filename, description_text
+                ):
+                if not have_errors:
+                    logger.warning(u'%s has invalid %s:' % (
+                        os.path.split(realpath.rstrip('/'))[1],
+                        description_filename
+                    ))
+                    have_errors = True
+                logger.warning(u"  %s value %s" % (error_path, message))
             # for now schema validation errors aren't fatal... will be soon
             # though!
             #if have_errors:
             #    raise InvalidDescription('Invalid %s' % description_filename)
-        self.inherited_shrinkwrap = None
         self.shrinkwrap = None
         # we can only apply shrinkwraps to instances with valid descriptions:
         # instances do not become valid after being invalid so this is safe
         # (but it means you cannot trust the shrinkwrap of an invalid
         # component)
-        # (note that it is unsafe to use the __bool__ operator on self here as
-        # we are not fully constructed)
         if self.description:
-            self.inherited_shrinkwrap = inherit_shrinkwrap
             self.shrinkwrap = tryReadJSON(os.path.join(path, Shrinkwrap_Fname), Shrinkwrap_Schema)
             if self.shrinkwrap:
-                logger.warning('dependencies of %s are pegged by yotta-shrinkwrap.json', self.getName())
-                if self.inherited_shrinkwrap:
-                    logger.warning('shrinkwrap in %s overrides inherited shrinkwrap', self.getName())
+                logger.warning('dependencies of %s are pegged by yotta-shrinkwrap.json', self.description['name'])
+
+    def ignoreMatcher(self):
+        if self.ignore_matcher is None:
+            self.ignore_matcher = ignores.IgnoreMatcher(self.ignore_patterns)
+        return self.ignore_matcher
+
+# the state loaded from each directory that a Pack has been created for:
+# (realpath, description filename, schema filename): (signature, _LoadedState)
+_Loaded_States = {}
+
+def _loadState(path, realpath, description_filename, schema_filename):
+    ''' Return the _LoadedState for the Pack at path, re-using the state
+        previously loaded from the same directory if none of the files that
+        it was read from have been modified since.
+    '''
+    signature = tuple(_fileSignature(os.path.join(realpath, f)) for f in (
+        description_filename, Ignore_List_Fname, Shrinkwrap_Fname
+    ))
+    key = (realpath, description_filename, schema_filename)
+    loaded = _Loaded_States.get(key, None)
+    if loaded is not None and loaded[0] == signature and signature[0] is not None:
+        return loaded[1]
+    state = _LoadedState(path, realpath, description_filename, schema_filename)
+    _Loaded_States[key] = (signature, state)
+    return state
+
+# Pack represents the common parts of Target and Component objects (versions,
+# VCS, etc.)
+
+class Pack(object):
+    schema_errors_displayed = set()
+
+    def __init__(
+            self,
+            path,
+            description_filename,
+            installed_linked,
+            schema_filename = None,
+            latest_suitable_version = None,
+            inherit_shrinkwrap = None
+        ):
+        ''' The files in the directory are only read (and validated) the
+            first time a Pack is created for it: other Packs for the same
+            directory share what was read, and only add their own state
+            (whether they are linked, their inherited shrinkwrap, errors, and
+            so on).
+        '''
+        # version, , represent versions and specifications, internal
+        from yotta.lib import version
+
+        # resolve links at creation time, to minimise path lengths:
+        self.unresolved_path = path
+        self.path = fsutils.realpath(path)
+        self.installed_linked = installed_linked
+        self._vcs = None
+        self._vcs_probed = False
+        self.latest_suitable_version = latest_suitable_version
+        self.version = None
+        self.description_filename = description_filename
+        self.ignore_list_fname = Ignore_List_Fname
+        self.origin_info = None
+        self.loaded_state = _loadState(path, self.path, description_filename, schema_filename)
+        self.description = self.loaded_state.description
+        self.error = self.loaded_state.error
+        self.ignore_patterns = list(self.loaded_state.ignore_patterns)
+        self.ignore_matcher = None
+        if self.loaded_state.invalid:
+            raise InvalidDescription(self.error)
+        if self.description:
+            # (each instance has its own version object, as versions can be
+            # modified)
+            self.version = version.Version(self.description['version'])
+        self.inherited_shrinkwrap = None
+        self.shrinkwrap = None
+        if self.description:
+            self.inherited_shrinkwrap = inherit_shrinkwrap
+            self.shrinkwrap = self.loaded_state.shrinkwrap
+            if self.shrinkwrap and self.inherited_shrinkwrap:
+                logger.warning('shrinkwrap in %s overrides inherited shrinkwrap', self.getName())
         #logger.info('%s created with inherited_shrinkwrap %s', self.getName(), self.inherited_shrinkwrap)
-        self.vcs = vcs.getVCS(path)
+
+    @property
+    def vcs(self):
+        ''' The version control system of this module's directory (or None if
+            it isn't version controlled). This is only determined the first
+            time it's needed, as most modules are never asked.
+        '''
+        if not self._vcs_probed:
+            # vcs, , represent version controlled directories, internal
+            from yotta.lib import vcs
+            self._vcs = vcs.getVCS(self.unresolved_path)
+            self._vcs_probed = True
+        return self._vcs
+
+    def detachDescription(self):
+        ''' Give this instance its own copy of the description, so that it
+            can be modified without affecting other instances for the same
+            directory. The methods that modify the description call this
+            first.
+        '''
+        if self.description is self.loaded_state.description:
+            self.description = copy.deepcopy(self.description)
 
     def getShrinkwrap(self):
         return self.shrinkwrap or self.inherited_shrinkwrap
@@ -367,14 +454,6 @@ class Pack(object):
         else:
             return []
 
-    def _parseIgnoreFile(self, f):
-        r = []
-        for l in f:
-            l = l.rstrip('\n\r')
-            if not l.startswith('#') and len(l):
-                r.append(l)
-        return r
-
     def ignores(self, path):
         ''' Test if this module ignores the file at "path", which must be a
             path relative to the root of the module.
@@ -382,24 +461,20 @@ class Pack(object):
             If a file is within a directory that is ignored, the file is also
             ignored.
         '''
-        test_path = PurePath('/', path)
-
-        # also check any parent directories of this path against the ignore
-        # patterns:
-        test_paths = tuple([test_path] + list(test_path.parents))
-
-        for exp in self.ignore_patterns:
-            for tp in test_paths:
-                if tp.match(exp):
-                    logger.debug('"%s" ignored ("%s" matched "%s")', path, tp, exp)
-                    return True
-        return False
+        if self.ignore_matcher is None or self.ignore_matcher.patterns != self.ignore_patterns:
+            if self.ignore_patterns == self.loaded_state.ignore_patterns:
+                self.ignore_matcher = self.loaded_state.ignoreMatcher()
+            else:
+                self.ignore_matcher = ignores.IgnoreMatcher(self.ignore_patterns)
+        return self.ignore_matcher.ignores(path)
 
     def setVersion(self, version):
+        self.detachDescription()
         self.version = version
         self.description['version'] = str(self.version)
 
     def setName(self, name):
+        self.detachDescription()
         self.description['name'] = name
 
     def writeDescription(self):
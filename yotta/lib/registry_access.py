@@ -40,6 +40,10 @@ from yotta.lib import ordered_json
 from yotta.lib import exportkey
 # globalconf, share global arguments between modules, internal
 from yotta.lib import globalconf
+# sessions, , shared keep-alive http sessions, internal
+from yotta.lib import sessions
+# metadata_cache, , cache of registry metadata, internal
+from yotta.lib import metadata_cache
 
 Registry_Base_URL = 'https://registry.yottabuild.org'
 Website_Base_URL  = 'https://yottabuild.org'
@@ -213,6 +217,48 @@ def _getPrivateRegistryKey():
         return os.environ['YOTTA_PRIVATE_REGISTRY_API_KEY']
     return None
 
+def _registryTimeout():
+    ''' Return the timeout (in seconds) for connecting to, and waiting for
+        each response from, a registry when listing versions. Configurable
+        with the registryTimeout setting.
+    '''
+    timeout = settings.get('registryTimeout')
+    try:
+        return float(timeout or 30)
+    except ValueError:
+        logger.warning('invalid registryTimeout setting "%s" ignored', timeout)
+        return 30.0
+
+def _getConcurrently(requests_to_make):
+    ''' Perform a GET request for each (registry, url, headers) in
+        requests_to_make, concurrently. Returns a list of (response, exception)
+        in the same order as the requests.
+    '''
+    import threading
+    results = [None] * len(requests_to_make)
+    timeout = _registryTimeout()
+    def getOne(i, registry, url, headers):
+        try:
+            logger.debug("GET %s, %s", url, headers)
+            results[i] = (
+                metadata_cache.cachedGet(sessions.forRegistry(registry), url, headers=headers, timeout=timeout),
+                None
+            )
+        except (requests.exceptions.RequestException, access_common.Offline) as e:
+            results[i] = (None, e)
+    if len(requests_to_make) == 1:
+        getOne(0, *requests_to_make[0])
+        return results
+    threads = [
+        threading.Thread(target=getOne, args=(i,) + tuple(r)) for i, r in enumerate(requests_to_make)
+    ]
+    for t in threads:
+        t.daemon = True
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
 @_retryConnectionErrors
 def _listVersions(namespace, name):
     sources = _getSources()
@@ -222,20 +268,25 @@ def _listVersions(namespace, name):
     # look in the public registry last
     registry_urls.append(Registry_Base_URL)
 
+    # query all registries at once (the headers are generated first, as
+    # generating them might save new keys to the settings file), so that a
+    # slow registry only delays listings by its own response time:
+    requests_to_make = [
+        (registry, '%s/%s/%s/versions' % (registry, namespace, name), _headersForRegistry(registry))
+        for registry in registry_urls
+    ]
+    results = _getConcurrently(requests_to_make)
+
+    # versions are merged in registry order, so if the same version is
+    # available from more than one registry, the first registry wins:
     versions = []
+    seen_versions = set()
+    failures = []
 
-    for registry in registry_urls:
-        # list versions of the package:
-        url = '%s/%s/%s/versions' % (
-            registry,
-            namespace,
-            name
-        )
-
-        request_headers = _headersForRegistry(registry)
-
-        logger.debug("GET %s, %s", url, request_headers)
-        response = requests.get(url, headers=request_headers)
+    for (registry, url, headers), (response, error) in zip(requests_to_make, results):
+        if error is not None:
+            failures.append((registry, error))
+            continue
 
         if response.status_code == 404:
             continue
@@ -245,9 +296,21 @@ def _listVersions(namespace, name):
 
         for x in ordered_json.loads(response.text):
             rtv = RegistryThingVersion(x, namespace, name, registry=registry)
-            if not rtv in versions:
+            if not rtv in seen_versions:
+                seen_versions.add(rtv)
                 versions.append(rtv)
 
+    if failures:
+        # if no registries could list any versions, raise the first error,
+        # (which will be retried if it was a connection error), otherwise
+        # continue with the versions that are available:
+        if not len(versions):
+            raise failures[0][1]
+        for registry, error in failures:
+            logger.warning(
+                'failed to list versions of %s from %s: %s', name, friendlyRegistryName(registry), error
+            )
+
     if not len(versions):
         raise access_common.Unavailable(
             ('%s does not exist in the %s registry. '+
@@ -275,20 +338,13 @@ def _getTarball(url, directory, sha256):
     try:
         access_common.unpackFromCache(sha256, directory)
     except KeyError as e:
-        # figure out which registry we're fetching this tarball from (if any)
-        # and add appropriate headers
-        registry = Registry_Base_URL
-
-        for source in _getSources():
-            if ('type' in source and source['type'] == 'registry' and
-                 'url' in source and url.startswith(source['url'])):
-                registry = source['url']
-                break
-
+        if access_common.isOffline():
+            raise access_common.Offline('yotta is offline, and %s is not cached' % url)
+        registry = _registryForURL(url)
         request_headers = _headersForRegistry(registry)
 
         logger.debug('GET %s, %s', url, request_headers)
-        response = requests.get(url, headers=request_headers, allow_redirects=True, stream=True)
+        response = sessions.forRegistry(registry).get(url, headers=request_headers, allow_redirects=True, stream=True)
         response.raise_for_status()
 
         access_common.unpackTarballStream(
@@ -299,6 +355,40 @@ def _getTarball(url, directory, sha256):
                origin_info = {'url':url}
         )
 
+def _prefetchTarball(url, sha256):
+    ''' Download the tarball at url into the cache (keyed by its hash),
+        without unpacking it. Tarballs without a hash can't be looked up in
+        the cache later, so they are not prefetched.
+
+        Prefetching is speculative, so this deliberately doesn't retry or ask
+        the user to authenticate: any failure is raised, and the normal
+        (non-prefetch) download path will deal with it later.
+    '''
+    if not sha256 or access_common.isInCache(sha256):
+        return
+    registry = _registryForURL(url)
+    request_headers = _headersForRegistry(registry)
+
+    logger.debug('GET (prefetch) %s, %s', url, request_headers)
+    response = sessions.forRegistry(registry).get(url, headers=request_headers, allow_redirects=True, stream=True)
+    response.raise_for_status()
+
+    access_common.downloadTarballStreamToCache(
+               stream = response,
+                 hash = {'sha256':sha256},
+            cache_key = sha256,
+          origin_info = {'url':url}
+    )
+
+def _registryForURL(url):
+    ''' figure out which registry a tarball url belongs to (if any), so that
+        appropriate headers can be added to the request '''
+    for source in _getSources():
+        if ('type' in source and source['type'] == 'registry' and
+             'url' in source and url.startswith(source['url'])):
+            return source['url']
+    return Registry_Base_URL
+
 def _getSources():
     sources = settings.get('sources')
     if sources is None:
@@ -436,6 +526,11 @@ class RegistryThingVersion(access_common.RemoteVersion):
             self.sha256 = data['hash']['sha256']
         else:
             self.sha256 = None
+        # registries may include the description of each version in the
+        # version listing, otherwise it's read from the tarball if needed
+        self.description = data.get('description', None)
+        if not isinstance(self.description, dict):
+            self.description = None
         url = _tarballURL(self.namespace, self.name, version, registry)
         super(RegistryThingVersion, self).__init__(
             version, url, name=name, friendly_source=friendlyRegistryName(registry)
@@ -445,6 +540,26 @@ class RegistryThingVersion(access_common.RemoteVersion):
         assert(self.url)
         _getTarball(self.url, directory, self.sha256)
 
+    def prefetch(self):
+        assert(self.url)
+        _prefetchTarball(self.url, self.sha256)
+
+    def getDescription(self):
+        ''' Return the description of this version, from the version listing
+            or otherwise from its tarball, which is downloaded into the cache
+            (but not installed) if necessary.
+        '''
+        if self.description is None and self.sha256:
+            description_fname = {'modules':'module.json', 'targets':'target.json'}[self.namespace]
+            try:
+                self.prefetch()
+                text = access_common.readFromCache(self.sha256, description_fname)
+                if text is not None:
+                    self.description = ordered_json.loads(text)
+            except Exception as e:
+                logger.debug('failed to read description of %s: %s', self, e)
+        return self.description
+
 class RegistryThing(access_common.RemoteComponent):
     def __init__(self, name, version_spec, namespace):
         self.name = name
@@ -524,7 +639,7 @@ def publish(namespace, name, version, description_file, tar_file, readme_file,
 
     headers = _headersForRegistry(registry)
 
-    response = requests.put(url, headers=headers, files=body)
+    response = sessions.forRegistry(registry).put(url, headers=headers, files=body)
     response.raise_for_status()
 
     return None
@@ -547,7 +662,7 @@ def unpublish(namespace, name, version, registry=None):
     )
 
     headers = _headersForRegistry(registry)
-    response = requests.delete(url, headers=headers)
+    response = sessions.forRegistry(registry).delete(url, headers=headers)
     response.raise_for_status()
 
     return None
@@ -570,7 +685,7 @@ def listOwners(namespace, name, registry=None):
 
     request_headers = _headersForRegistry(registry)
 
-    response = requests.get(url, headers=request_headers)
+    response = sessions.forRegistry(registry).get(url, headers=request_headers)
 
     if response.status_code == 404:
         logger.error('no such %s, "%s"' % (namespace[:-1], name))
@@ -601,7 +716,7 @@ def addOwner(namespace, name, owner, registry=None):
 
     request_headers = _headersForRegistry(registry)
 
-    response = requests.put(url, headers=request_headers)
+    response = sessions.forRegistry(registry).put(url, headers=request_headers)
 
     if response.status_code == 404:
         logger.error('no such %s, "%s"' % (namespace[:-1], name))
@@ -633,7 +748,7 @@ def removeOwner(namespace, name, owner, registry=None):
 
     request_headers = _headersForRegistry(registry)
 
-    response = requests.delete(url, headers=request_headers)
+    response = sessions.forRegistry(registry).delete(url, headers=request_headers)
 
     if response.status_code == 404:
         logger.error('no such %s, "%s"' % (namespace[:-1], name))
@@ -656,7 +771,7 @@ def whoami(registry=None):
     request_headers = _headersForRegistry(registry)
 
     logger.debug('test login...')
-    response = requests.get(url, headers=request_headers)
+    response = sessions.forRegistry(registry).get(url, headers=request_headers)
     if response.status_code == 401:
         # not logged in
         return None
@@ -691,7 +806,7 @@ def search(query='', keywords=[], registry=None):
         params['keywords[]'] = keywords
 
     while True:
-        response = requests.get(url, headers=headers, params=params)
+        response = sessions.forRegistry(registry).get(url, headers=headers, params=params)
         response.raise_for_status()
         objects = ordered_json.loads(response.text)
         if len(objects):
@@ -775,7 +890,7 @@ def getAuthData(registry=None):
     logger.debug('poll for tokens... %s', request_headers)
 
     try:
-        response = requests.get(url, headers=request_headers)
+        response = sessions.forRegistry(registry).get(url, headers=request_headers)
     except requests.RequestException as e:
         logger.debug(str(e))
         return None
@@ -0,0 +1,205 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# A local pull-through mirror of a registry, which implements the parts of the
+# registry HTTP API that registry_access uses to install modules and targets
+# (listing versions, downloading tarballs, and searching). Version listings
+# and search results are kept in the metadata cache, and tarballs in the
+# download cache, so each one is only fetched from the upstream registry once
+# however many clients ask for it. In offline mode the mirror serves only what
+# is already cached, so it can be used as a stand-in registry for tests.
+
+# standard library modules, , ,
+import os
+import re
+import errno
+import shutil
+import logging
+import threading
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer #pylint: disable=import-error
+    from SocketServer import ThreadingMixIn #pylint: disable=import-error
+
+# requests, apache2
+import requests
+
+# access_common, , things shared between different component access modules, internal
+from yotta.lib import access_common
+# Registry Access, , access packages in the registry, internal
+from yotta.lib import registry_access
+# metadata_cache, , cache of registry metadata, internal
+from yotta.lib import metadata_cache
+# sessions, , shared HTTP sessions, internal
+from yotta.lib import sessions
+# cache_index, , index of the download cache, internal
+from yotta.lib import cache_index
+# folders, , where yotta stores things, internal
+from yotta.lib import folders
+# Ordered JSON, , read & write json, internal
+from yotta.lib import ordered_json
+
+logger = logging.getLogger('mirror')
+
+_Versions_Path = re.compile(r'^/(modules|targets)/([^/]+)/versions$')
+_Tarball_Path = re.compile(r'^/(modules|targets)/([^/]+)/versions/([^/]+)/tarball$')
+_Request_Timeout = 30
+
+class MirrorError(Exception):
+    def __init__(self, status, message):
+        super(MirrorError, self).__init__(message)
+        self.status = status
+
+
+class RegistryMirror(object):
+    def __init__(self, upstream=None):
+        self.upstream = (upstream or registry_access.Registry_Base_URL).rstrip('/')
+        # tarballs currently being downloaded: cache key: lock
+        self.downloads = {}
+        self.downloads_lock = threading.Lock()
+
+    def _get(self, url, **kwargs):
+        try:
+            return metadata_cache.cachedGet(
+                sessions.forRegistry(self.upstream), url, timeout=_Request_Timeout, **kwargs
+            )
+        except access_common.Offline as e:
+            raise MirrorError(404, str(e))
+        except requests.exceptions.RequestException as e:
+            raise MirrorError(502, 'upstream request failed: %s' % e)
+
+    def versions(self, namespace, name):
+        ''' Return the text of the version listing of a module or target. '''
+        response = self._get('%s/%s/%s/versions' % (self.upstream, namespace, name))
+        if response.status_code != 200:
+            raise MirrorError(response.status_code, 'upstream returned status %s' % response.status_code)
+        return response.text
+
+    def search(self, query_string):
+        ''' Return the text of the search results for a query string. '''
+        response = self._get('%s/search?%s' % (self.upstream, query_string))
+        if response.status_code != 200:
+            raise MirrorError(response.status_code, 'upstream returned status %s' % response.status_code)
+        return response.text
+
+    def _hashOf(self, namespace, name, version):
+        for v in ordered_json.loads(self.versions(namespace, name)):
+            if v.get('version', None) == version:
+                return v.get('hash', {}).get('sha256', None)
+        raise MirrorError(404, '%s %s@%s does not exist' % (namespace, name, version))
+
+    def _downloadLock(self, cache_key):
+        with self.downloads_lock:
+            if cache_key not in self.downloads:
+                self.downloads[cache_key] = threading.Lock()
+            return self.downloads[cache_key]
+
+    def tarball(self, namespace, name, version):
+        ''' Return an open file object for the tarball of a version of a
+            module or target, downloading it into the cache first if
+            necessary.
+        '''
+        sha256 = self._hashOf(namespace, name, version)
+        url = registry_access._tarballURL(namespace, name, version, self.upstream)
+        if not sha256:
+            # tarballs without a hash can't be cached
+            raise MirrorError(502, '%s has no hash, and cannot be mirrored' % url)
+        # clients that ask for the same tarball at the same time wait for a
+        # single download:
+        with self._downloadLock(sha256):
+            for attempt in range(2):
+                if not access_common.isInCache(sha256):
+                    self._download(url, sha256)
+                try:
+                    f = open(os.path.join(folders.cacheDirectory(), access_common._encodeCacheKey(sha256)), 'rb')
+                except (IOError, OSError) as e:
+                    if e.errno != errno.ENOENT:
+                        raise
+                    # evicted (by pruning in another process) since it was
+                    # checked for, so download it again:
+                    logger.debug('%s evicted from cache while serving it', url)
+                    continue
+                # serving a tarball is a use of it, so that the tarballs that
+                # are served most are the last to be evicted:
+                cache_index.touch(sha256)
+                return f
+            raise MirrorError(500, 'failed to cache %s' % url)
+
+    def _download(self, url, sha256):
+        if access_common.isOffline():
+            raise MirrorError(404, 'yotta is offline, and %s is not cached' % url)
+        logger.info('download %s', url)
+        try:
+            response = sessions.forRegistry(self.upstream).get(
+                url, allow_redirects=True, stream=True, timeout=_Request_Timeout
+            )
+            response.raise_for_status()
+            access_common.downloadTarballStreamToCache(
+                        stream = response,
+                          hash = {'sha256':sha256},
+                     cache_key = sha256,
+                   origin_info = {'url':url}
+            )
+        except requests.exceptions.RequestException as e:
+            raise MirrorError(502, 'upstream request failed: %s' % e)
+        if not access_common.isInCache(sha256):
+            raise MirrorError(500, 'failed to cache %s (is the cache disabled?)' % url)
+
+    def handle(self, path, query_string):
+        ''' Return (content type, body text or file object) for a GET
+            request, or raise MirrorError.
+        '''
+        m = _Versions_Path.match(path)
+        if m:
+            return ('application/json', self.versions(m.group(1), m.group(2)))
+        m = _Tarball_Path.match(path)
+        if m:
+            return ('application/x-gzip', self.tarball(m.group(1), m.group(2), m.group(3)))
+        if path == '/search':
+            return ('application/json', self.search(query_string))
+        raise MirrorError(404, 'not found')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path, _, query_string = self.path.partition('?')
+        try:
+            content_type, body = self.server.mirror.handle(path, query_string)
+        except MirrorError as e:
+            logger.debug('GET %s: %s', self.path, e)
+            self.send_error(e.status, str(e))
+            return
+        except Exception as e:
+            logger.error('GET %s failed: %s', self.path, e)
+            self.send_error(500, str(e))
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        if hasattr(body, 'read'):
+            with body:
+                self.send_header('Content-Length', str(os.fstat(body.fileno()).st_size))
+                self.end_headers()
+                shutil.copyfileobj(body, self.wfile)
+        else:
+            body = body.encode('utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug('%s - %s', self.address_string(), format % args)
+
+
+class MirrorServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, mirror, host='localhost', port=0):
+        HTTPServer.__init__(self, (host, port), _Handler)
+        self.mirror = mirror
+
+    def url(self):
+        return 'http://%s:%s' % self.server_address[:2]
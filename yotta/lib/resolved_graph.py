@@ -0,0 +1,139 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# Record of the resolved dependency graph of a module for a target, saved in
+# the target's build directory. Commands that run after the dependencies have
+# been installed (build, test, list, outdated, ...) load the installed
+# modules directly from the paths in the record, instead of searching for
+# and resolving each dependency again. The record is only used if none of
+# the files and directories that resolution depends on have been modified
+# since it was saved.
+
+# standard library modules, , ,
+import os
+import hashlib
+import logging
+from collections import OrderedDict
+
+# Ordered JSON, , read & write json, internal
+from yotta.lib import ordered_json
+# fsutils, , misc filesystem utils, internal
+from yotta.lib import fsutils
+# Pack, , common parts of Components/Targets, internal
+from yotta.lib import pack
+
+logger = logging.getLogger('components')
+
+Resolved_Graph_Fname = 'yotta_resolved.json'
+Format_Version = 1
+
+def _recordPath(root, target):
+    return os.path.join(root.path, 'build', target.getName(), Resolved_Graph_Fname)
+
+def _key(target, test):
+    # everything about the target that can affect which dependencies are
+    # used: its name, what it's similar to, and its config
+    return hashlib.sha1(ordered_json.dumps([
+        target.getName(),
+        list(target.getSimilarTo_Deprecated()),
+        target.getMergedConfig(),
+        test
+    ]).encode('utf-8')).hexdigest()
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+def _watchedPaths(c):
+    # the files and directories that, if modified, might change how the
+    # dependencies of c are resolved (modules directories are modified
+    # whenever anything is installed, removed or linked in them):
+    return [
+        os.path.join(c.path, 'module.json'),
+        os.path.join(c.path, 'package.json'),
+        os.path.join(c.path, pack.Shrinkwrap_Fname),
+        c.modulesPath()
+    ]
+
+def save(root, target, test, components):
+    ''' Save the resolved dependencies (name:Component dictionary, as
+        returned by root.getDependenciesRecursive) of root for target.
+        Dependencies that aren't installed (such as test dependencies of
+        other modules) are saved as missing, with the path where they would
+        be installed.
+    '''
+    for c in components.values():
+        if c is not root and c.shrinkwrap:
+            # (only shrinkwraps inherited from the root module are supported)
+            logger.debug('not saving resolved dependencies of %s: %s has a shrinkwrap', root, c)
+            return
+    path = _recordPath(root, target)
+    try:
+        fsutils.mkDirP(os.path.dirname(path))
+        watched = [root] + [c for c in components.values() if c is not root]
+        ordered_json.dump(path, OrderedDict([
+            ('format', Format_Version),
+            ('root', root.path),
+            ('key', _key(target, test)),
+            ('modules', [
+                OrderedDict([
+                    ('name', name),
+                    ('path', c.unresolved_path),
+                    ('version', str(c.getVersion()) if c else None),
+                    ('test_dependency', c.isTestDependency()),
+                    ('installed_linked', c.installedLinked()),
+                    ('error', c.getError()),
+                    ('dependencies', [
+                        [s.name, s.is_test_dependency] for s in c.getDependencySpecs(target=target)
+                    ])
+                ]) for name, c in components.items()
+            ]),
+            ('mtimes', [[p, _mtime(p)] for c in watched for p in _watchedPaths(c)])
+        ]))
+    except (OSError, IOError) as e:
+        logger.debug('failed to save resolved dependencies: %s', e)
+
+def load(root, target, test):
+    ''' Return the resolved dependencies (name:Component dictionary) of root
+        for target, if they were saved and are still valid, otherwise None.
+    '''
+    path = _recordPath(root, target)
+    try:
+        record = ordered_json.load(path)
+    except (IOError, ValueError):
+        return None
+    try:
+        if record['format'] != Format_Version or record['root'] != root.path or \
+           record['key'] != _key(target, test):
+            return None
+        for p, mtime in record['mtimes']:
+            if _mtime(p) != mtime:
+                logger.debug('resolved dependencies of %s out of date: %s modified', root, p)
+                return None
+        r = OrderedDict()
+        for m in record['modules']:
+            if m['name'] == root.getName():
+                r[m['name']] = root
+                continue
+            c = root.__class__(
+                                m['path'],
+                installed_linked = m['installed_linked'],
+                 test_dependency = m['test_dependency'],
+              inherit_shrinkwrap = root.getShrinkwrap()
+            )
+            if (m['version'] is None and c) or \
+               (m['version'] is not None and (not c or c.getName() != m['name'] or str(c.getVersion()) != m['version'])):
+                logger.debug('resolved dependencies of %s out of date: %s changed', root, m['path'])
+                return None
+            if m['error'] is not None:
+                c.setError(m['error'])
+            r[m['name']] = c
+    except (KeyError, TypeError, ValueError) as e:
+        logger.debug('ignoring invalid resolved dependencies record %s: %s', path, e)
+        return None
+    logger.debug('loaded resolved dependencies of %s from %s', root, path)
+    return r
@@ -0,0 +1,97 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# Validation of module, target and shrinkwrap descriptions against their JSON
+# schemas. Each schema is loaded and compiled into a validator at most once
+# per process, and the result of validating each description is cached (on
+# disk, keyed by the hashes of the description file and the schema), so that
+# descriptions that haven't changed since they were last validated aren't
+# validated again, and don't even need the schema to be loaded.
+
+# standard library modules, , ,
+import os
+import json
+import hashlib
+import logging
+from collections import OrderedDict
+
+# JSON Schema, pip install jsonschema, Verify JSON Schemas, MIT
+import jsonschema
+
+# fsutils, , misc filesystem utils, internal
+from yotta.lib import fsutils
+# folders, , where yotta stores things, internal
+from yotta.lib import folders
+# Ordered JSON, , read & write json, internal
+from yotta.lib import ordered_json
+
+cache_logger = logging.getLogger('cache')
+
+# schema filename: (schema hash, validator or None if not yet compiled)
+_schemas = {}
+
+def cacheDirectory():
+    return os.path.join(folders.cacheDirectory(), 'validation')
+
+def _schemaHash(schema_filename):
+    if schema_filename not in _schemas:
+        with open(schema_filename, 'rb') as f:
+            _schemas[schema_filename] = (hashlib.sha256(f.read()).hexdigest(), None)
+    return _schemas[schema_filename][0]
+
+def validator(schema_filename):
+    ''' Return the compiled validator for the schema in schema_filename. '''
+    schema_hash = _schemaHash(schema_filename)
+    compiled = _schemas[schema_filename][1]
+    if compiled is None:
+        with open(schema_filename, 'r') as schema_file:
+            compiled = jsonschema.Draft4Validator(json.load(schema_file))
+        _schemas[schema_filename] = (schema_hash, compiled)
+    return compiled
+
+def _pathForKey(key):
+    return os.path.join(cacheDirectory(), key + '.json')
+
+def _readCached(key):
+    try:
+        entry = ordered_json.load(_pathForKey(key))
+    except (IOError, ValueError):
+        return None
+    if entry.get('key', None) != key or not isinstance(entry.get('errors', None), list):
+        return None
+    return [tuple(e) for e in entry['errors']]
+
+def _writeCached(key, errors):
+    entry = OrderedDict([('key', key), ('errors', errors)])
+    try:
+        fsutils.writeFileAtomically(_pathForKey(key), lambda path: ordered_json.dump(path, entry))
+    except (OSError, IOError) as e:
+        # failing to cache things is never fatal
+        cache_logger.debug('failed to write validation cache entry %s: %s', key, e)
+
+def validationErrors(document, schema_filename, document_text=None):
+    ''' Return a list of (path, message) for each way in which document
+        doesn't satisfy the schema in schema_filename. If document_text (the
+        text from which document was parsed) is specified, the result is
+        cached, keyed by its hash.
+    '''
+    key = None
+    if document_text is not None:
+        if not isinstance(document_text, bytes):
+            document_text = document_text.encode('utf-8')
+        key = hashlib.sha256(
+            (_schemaHash(schema_filename) + ':').encode('utf-8') + document_text
+        ).hexdigest()
+        cached = _readCached(key)
+        if cached is not None:
+            cache_logger.debug('validation of %s against %s cached', key, os.path.basename(schema_filename))
+            return cached
+    errors = [
+        (u'.'.join([str(x) for x in error.path]), error.message)
+        for error in validator(schema_filename).iter_errors(document)
+    ]
+    if key is not None:
+        _writeCached(key, errors)
+    return errors
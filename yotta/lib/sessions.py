@@ -0,0 +1,149 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# Shared HTTP sessions, so that connections to each registry are kept alive
+# and re-used by all of the requests made during a single yotta command,
+# instead of paying for a new TCP and TLS handshake for every request.
+
+# standard library modules, , ,
+import logging
+import threading
+import time
+
+# requests, apache2
+import requests
+from requests.adapters import HTTPAdapter
+try:
+    from requests.packages.urllib3 import connectionpool
+except ImportError:
+    from urllib3 import connectionpool #pylint: disable=import-error
+
+logger = logging.getLogger('access')
+
+# maximum number of connections to keep alive to each host. If more requests
+# than this are made concurrently then extra connections are opened, but they
+# are closed again when the requests complete:
+Max_Connections_Per_Host = 8
+
+# private state
+_sessions = {}
+_sessions_lock = threading.Lock()
+# per-thread record of the connections opened by the request currently being
+# made on that thread:
+_request_state = threading.local()
+
+
+def _timedConnectionClass(base):
+    class TimedConnection(base):
+        def connect(self):
+            start = time.time()
+            try:
+                return super(TimedConnection, self).connect()
+            finally:
+                _request_state.connections = getattr(_request_state, 'connections', 0) + 1
+                _request_state.connect_time = getattr(_request_state, 'connect_time', 0.0) + time.time() - start
+    return TimedConnection
+
+class _TimedHTTPConnectionPool(connectionpool.HTTPConnectionPool):
+    ConnectionCls = _timedConnectionClass(connectionpool.HTTPConnectionPool.ConnectionCls)
+
+class _TimedHTTPSConnectionPool(connectionpool.HTTPSConnectionPool):
+    ConnectionCls = _timedConnectionClass(connectionpool.HTTPSConnectionPool.ConnectionCls)
+
+class _PoolingAdapter(HTTPAdapter):
+    def __init__(self):
+        super(_PoolingAdapter, self).__init__(
+            pool_connections = 4,
+                pool_maxsize = Max_Connections_Per_Host
+        )
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(_PoolingAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+             'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool
+        }
+
+class Session(requests.Session):
+    ''' A requests.Session that keeps connections alive in a bounded pool,
+        and records how much time is spent establishing connections compared
+        to making requests over them.
+
+        Sessions are shared between threads: the underlying connection pool
+        is thread-safe, and yotta doesn't rely on cookies.
+    '''
+    def __init__(self, name):
+        super(Session, self).__init__()
+        self.name = name
+        self.mount('http://', _PoolingAdapter())
+        self.mount('https://', _PoolingAdapter())
+        self.stats_lock = threading.Lock()
+        self.requests_made = 0
+        self.connections_made = 0
+        self.request_time = 0.0
+        self.connect_time = 0.0
+
+    def request(self, method, url, *args, **kwargs):
+        # access_common, , things shared between different component access modules, internal
+        from yotta.lib import access_common
+        if access_common.isOffline():
+            raise access_common.Offline('yotta is offline, so %s %s is not possible' % (method, url))
+        _request_state.connections = 0
+        _request_state.connect_time = 0.0
+        start = time.time()
+        try:
+            return super(Session, self).request(method, url, *args, **kwargs)
+        finally:
+            elapsed = time.time() - start
+            connections = _request_state.connections
+            connect_time = _request_state.connect_time
+            with self.stats_lock:
+                self.requests_made += 1
+                self.connections_made += connections
+                self.request_time += elapsed
+                self.connect_time += connect_time
+            if connections:
+                logger.debug(
+                    '%s %s took %.3fs (%.3fs to open %d connection(s))',
+                    method, url, elapsed, connect_time, connections
+                )
+            else:
+                logger.debug('%s %s took %.3fs (re-used connection)', method, url, elapsed)
+
+    def logStatistics(self):
+        with self.stats_lock:
+            if not self.requests_made:
+                return
+            logger.debug(
+                '%s: %d requests over %d connections, %.3fs total '+
+                '(%.3fs connecting, %.3fs per connection, %.3fs per request excluding connecting)',
+                self.name,
+                self.requests_made,
+                self.connections_made,
+                self.request_time,
+                self.connect_time,
+                self.connect_time / max(self.connections_made, 1),
+                (self.request_time - self.connect_time) / self.requests_made
+            )
+
+# public API
+
+def forRegistry(registry):
+    ''' Return the shared session to use for all requests to the specified
+        registry (or other server) base URL.
+    '''
+    with _sessions_lock:
+        if not registry in _sessions:
+            _sessions[registry] = Session(registry)
+        return _sessions[registry]
+
+def logStatistics():
+    ''' Log (at debug level) the time spent opening connections compared to
+        making requests, for each session that has been used.
+    '''
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+    for s in sessions:
+        s.logStatistics()
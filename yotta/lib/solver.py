@@ -0,0 +1,685 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# Version solving: choose a version of every module in the dependency graph
+# such that all of the version requirements are met at once, using only
+# version listings and module descriptions (which, for modules that are
+# already installed, come from disk), before anything is installed.
+#
+# The algorithm is PubGrub (conflict-driven clause learning, as used by the
+# dart package manager): it repeatedly chooses a version for one module, and
+# whenever the choices made so far are found to be inconsistent it derives
+# (and remembers) the root cause of the conflict and backtracks to the point
+# where that cause was introduced, so that the same dead end is never
+# explored twice. If no consistent set of versions exists, the derivation of
+# the final conflict explains why.
+#
+# Each module has a finite list of candidate versions, so sets of versions
+# are represented as sets of indexes into that list, plus _Not_Selected,
+# which stands for the module not being part of the solution at all.
+
+# standard library modules, , ,
+import os
+import logging
+from collections import OrderedDict
+
+# access, , get components, internal
+from yotta.lib import access
+# access_common, , things shared between different component access modules, internal
+from yotta.lib import access_common
+# sourceparse, , parse version source urls, internal
+from yotta.lib import sourceparse
+# fsutils, , misc filesystem utils, internal
+from yotta.lib import fsutils
+
+logger = logging.getLogger('solver')
+
+_Not_Selected = -1
+
+class SolveFailure(access_common.AccessException):
+    ''' Raised when there is no set of versions that meets all of the
+        requirements: the message explains why. '''
+    def __init__(self, incompatibility, root_name, offline_missing=()):
+        self.incompatibility = incompatibility
+        self.offline_missing = list(offline_missing)
+        message = _explain(incompatibility, root_name)
+        if self.offline_missing:
+            message += '\nyotta is offline, and the versions of these modules are not cached: %s' % (
+                ', '.join(self.offline_missing)
+            )
+        super(SolveFailure, self).__init__(message)
+
+
+class Candidate(object):
+    ''' A version that could be chosen for a module: either an installed
+        (or otherwise already available) component, or a version available
+        from the registry. '''
+    def __init__(self, version, component=None, remote_version=None):
+        self.version = version
+        self.component = component
+        self.remote_version = remote_version
+
+    def __str__(self):
+        return str(self.version)
+
+    def __repr__(self):
+        return '<Candidate %s %s>' % (self.version, 'installed' if self.component is not None else 'remote')
+
+
+class _Domain(object):
+    ''' The candidate versions of a module. '''
+    def __init__(self, candidates):
+        self.candidates = candidates
+        self.everything = frozenset(list(range(len(candidates))) + [_Not_Selected])
+
+
+class Term(object):
+    ''' The statement that the version chosen for a module is one of a set of
+        candidates (which includes _Not_Selected if the module may be left
+        out altogether).
+    '''
+    def __init__(self, name, allowed, domain, description=None):
+        self.name = name
+        self.allowed = frozenset(allowed)
+        self.domain = domain
+        # the version specification that this term came from, if any:
+        self.description = description
+
+    def isPositive(self):
+        return _Not_Selected not in self.allowed
+
+    def isEverything(self):
+        return self.allowed == self.domain.everything
+
+    def inverse(self):
+        return Term(self.name, self.domain.everything - self.allowed, self.domain)
+
+    def intersect(self, other):
+        assert(other.name == self.name)
+        return Term(self.name, self.allowed & other.allowed, self.domain)
+
+    def difference(self, other):
+        assert(other.name == self.name)
+        return Term(self.name, self.allowed - other.allowed, self.domain)
+
+
+class Incompatibility(object):
+    ''' A set of terms that must not all be true at once. cause is one of
+        'root', 'dependency', 'no versions', or 'derived', in which case
+        causes is the pair of incompatibilities it was derived from.
+    '''
+    def __init__(self, terms, cause, causes=None, dependency=None, reason=None):
+        merged = OrderedDict()
+        for t in terms:
+            if t.name in merged:
+                merged[t.name] = merged[t.name].intersect(t)
+            else:
+                merged[t.name] = t
+        # terms that are always true don't restrict anything:
+        self.terms = [t for t in merged.values() if not t.isEverything()]
+        self.cause = cause
+        self.causes = causes
+        # (depending module, its candidate, dependency name, version
+        # specification) for dependency incompatibilities
+        self.dependency = dependency
+        # why a module has no versions at all, if it doesn't
+        self.reason = reason
+
+
+class _Assignment(object):
+    def __init__(self, term, decision_level, index, cause=None):
+        self.term = term
+        self.decision_level = decision_level
+        self.index = index
+        # the incompatibility that this assignment was derived from, or None
+        # for decisions
+        self.cause = cause
+
+
+class _PartialSolution(object):
+    def __init__(self):
+        self.assignments = []
+        # name: candidate index
+        self.decisions = OrderedDict()
+        # name: [assignment]
+        self.by_name = OrderedDict()
+        # name: intersection of the terms assigned for name
+        self.accumulated = {}
+
+    def decisionLevel(self):
+        return len(self.decisions)
+
+    def _assign(self, assignment):
+        self.assignments.append(assignment)
+        name = assignment.term.name
+        self.by_name.setdefault(name, []).append(assignment)
+        if name in self.accumulated:
+            self.accumulated[name] = self.accumulated[name] & assignment.term.allowed
+        else:
+            self.accumulated[name] = assignment.term.allowed
+
+    def decide(self, name, index, domain):
+        self.decisions[name] = index
+        self._assign(_Assignment(
+            Term(name, [index], domain), self.decisionLevel(), len(self.assignments)
+        ))
+
+    def derive(self, term, cause):
+        self._assign(_Assignment(term, self.decisionLevel(), len(self.assignments), cause))
+
+    def backtrack(self, decision_level):
+        kept = [a for a in self.assignments if a.decision_level <= decision_level]
+        self.assignments = []
+        self.by_name = OrderedDict()
+        self.accumulated = {}
+        for name in list(self.decisions.keys())[decision_level:]:
+            del self.decisions[name]
+        for a in kept:
+            self._assign(a)
+
+    def satisfies(self, term):
+        allowed = self.accumulated.get(term.name, term.domain.everything)
+        return allowed <= term.allowed
+
+    def contradicts(self, term):
+        allowed = self.accumulated.get(term.name, term.domain.everything)
+        return not (allowed & term.allowed)
+
+    def satisfier(self, term):
+        ''' Return the earliest assignment after which term is satisfied. '''
+        allowed = term.domain.everything
+        for a in self.by_name.get(term.name, []):
+            allowed = allowed & a.term.allowed
+            if allowed <= term.allowed:
+                return a
+        raise AssertionError('%s is not satisfied' % term.name)
+
+    def undecided(self):
+        ''' Names of modules that must be selected, but whose version has not
+            been decided yet, in the order they were first required. '''
+        return [
+            name for name in self.by_name if name not in self.decisions and
+            _Not_Selected not in self.accumulated[name]
+        ]
+
+
+class _Conflict(object):
+    pass
+
+
+class Solver(object):
+    ''' Solve for the versions of the dependencies of a root module. source
+        provides the candidate versions and dependencies of each module:
+
+            source.versions(name): [Candidate], in order of preference
+            source.dependencies(name, candidate): [(name, spec, spec_string)]
+                where spec.match(version) tests if a version is allowed
+
+        source.versions may raise access_common.AccessException if the
+        versions of a module can't be listed.
+    '''
+    def __init__(self, root_name, root_candidate, source):
+        self.root_name = root_name
+        self.source = source
+        self.domains = {root_name: _Domain([root_candidate])}
+        self.unavailable = {}
+        # name: [Incompatibility] (those that have a term for name)
+        self.incompatibilities = {}
+        self.solution = _PartialSolution()
+
+    def solve(self):
+        ''' Returns an OrderedDict of name: Candidate, for all the modules
+            that are required (including the root module), or raises
+            SolveFailure.
+        '''
+        self._addIncompatibility(Incompatibility(
+            [Term(self.root_name, [_Not_Selected], self.domains[self.root_name])], 'root'
+        ))
+        next_name = self.root_name
+        while next_name is not None:
+            self._propagate(next_name)
+            next_name = self._choosePackageVersion()
+        return OrderedDict(
+            (name, self.domains[name].candidates[index]) for name, index in self.solution.decisions.items()
+        )
+
+    # candidate versions
+
+    def _domain(self, name):
+        if name in self.domains:
+            return self.domains[name]
+        try:
+            candidates = self.source.versions(name)
+        except access_common.AccessException as e:
+            logger.debug('no versions of %s available: %s', name, e)
+            self.unavailable[name] = str(e)
+            candidates = []
+        self.domains[name] = _Domain(candidates)
+        return self.domains[name]
+
+    def _termForSpec(self, name, spec, description):
+        ''' The term that the version of name matches spec. '''
+        domain = self._domain(name)
+        return Term(
+            name,
+            [i for i, c in enumerate(domain.candidates) if spec.match(c.version)],
+            domain,
+            description = description
+        )
+
+    # unit propagation
+
+    def _addIncompatibility(self, incompatibility):
+        for term in incompatibility.terms:
+            self.incompatibilities.setdefault(term.name, []).append(incompatibility)
+
+    def _propagate(self, name):
+        changed = [name]
+        while changed:
+            name = changed.pop()
+            for incompatibility in reversed(list(self.incompatibilities.get(name, []))):
+                result = self._propagateIncompatibility(incompatibility)
+                if result is _Conflict:
+                    root_cause = self._resolveConflict(incompatibility)
+                    # the root cause is now almost satisfied, so propagating
+                    # it always derives something new
+                    changed = [self._propagateIncompatibility(root_cause)]
+                    break
+                elif result is not None and result not in changed:
+                    changed.append(result)
+
+    def _propagateIncompatibility(self, incompatibility):
+        ''' If all but one of the terms of incompatibility are satisfied,
+            derive the inverse of the remaining term, and return its name. If
+            they're all satisfied return _Conflict. '''
+        unsatisfied = None
+        for term in incompatibility.terms:
+            if self.solution.satisfies(term):
+                continue
+            if self.solution.contradicts(term):
+                return None
+            if unsatisfied is not None:
+                return None
+            unsatisfied = term
+        if unsatisfied is None:
+            return _Conflict
+        self.solution.derive(unsatisfied.inverse(), incompatibility)
+        return unsatisfied.name
+
+    # conflict resolution
+
+    def _isFailure(self, incompatibility):
+        return (not incompatibility.terms) or (
+            len(incompatibility.terms) == 1 and
+            incompatibility.terms[0].name == self.root_name and
+            incompatibility.terms[0].isPositive()
+        )
+
+    def _resolveConflict(self, incompatibility):
+        ''' Find the root cause of incompatibility (which is satisfied by the
+            partial solution), backtrack, and return the root cause, or raise
+            SolveFailure if the root module can't be satisfied. '''
+        logger.debug('conflict: %s', _describeIncompatibility(incompatibility, self.root_name))
+        is_new = False
+        while not self._isFailure(incompatibility):
+            most_recent_term = None
+            most_recent_satisfier = None
+            difference = None
+            previous_satisfier_level = 1
+            for term in incompatibility.terms:
+                satisfier = self.solution.satisfier(term)
+                if most_recent_satisfier is None or most_recent_satisfier.index < satisfier.index:
+                    if most_recent_satisfier is not None:
+                        previous_satisfier_level = max(previous_satisfier_level, most_recent_satisfier.decision_level)
+                    most_recent_term = term
+                    most_recent_satisfier = satisfier
+                    difference = None
+                else:
+                    previous_satisfier_level = max(previous_satisfier_level, satisfier.decision_level)
+                if most_recent_term is term:
+                    # if the satisfier doesn't completely satisfy the term on
+                    # its own, then the earlier assignment that makes up the
+                    # difference must also be considered
+                    difference = most_recent_satisfier.term.difference(most_recent_term)
+                    if difference.allowed:
+                        previous_satisfier_level = max(
+                            previous_satisfier_level,
+                            self.solution.satisfier(difference.inverse()).decision_level
+                        )
+                    else:
+                        difference = None
+
+            if previous_satisfier_level < most_recent_satisfier.decision_level or \
+               most_recent_satisfier.cause is None:
+                self.solution.backtrack(previous_satisfier_level)
+                if is_new:
+                    self._addIncompatibility(incompatibility)
+                return incompatibility
+
+            # resolve the incompatibility with the cause of the most recent
+            # satisfier, to get one that is closer to the root cause:
+            terms = [t for t in incompatibility.terms if t is not most_recent_term] + \
+                    [t for t in most_recent_satisfier.cause.terms if t.name != most_recent_satisfier.term.name]
+            if difference is not None:
+                terms.append(difference.inverse())
+            incompatibility = Incompatibility(
+                terms, 'derived', causes=(incompatibility, most_recent_satisfier.cause)
+            )
+            is_new = True
+            logger.debug('derived: %s', _describeIncompatibility(incompatibility, self.root_name))
+
+        raise SolveFailure(incompatibility, self.root_name)
+
+    # decision making
+
+    def _choosePackageVersion(self):
+        ''' Decide the version of the next module, and return its name, or
+            return None if all the versions are decided. '''
+        undecided = self.solution.undecided()
+        if not undecided:
+            return None
+        def allowedCandidates(name):
+            allowed = self.solution.accumulated[name]
+            return [i for i in range(len(self._domain(name).candidates)) if i in allowed]
+        # choosing the most constrained module first finds conflicts sooner:
+        allowed_by_name = [(name, allowedCandidates(name)) for name in undecided]
+        name, allowed = min(allowed_by_name, key=lambda x: len(x[1]))
+        if not allowed:
+            self._addIncompatibility(Incompatibility(
+                [Term(name, self.solution.accumulated[name], self.domains[name])], 'no versions',
+                reason = self.unavailable.get(name, None)
+            ))
+            return name
+        index = allowed[0]
+        candidate = self.domains[name].candidates[index]
+        conflict = False
+        for dep_name, spec, spec_string in self.source.dependencies(name, candidate):
+            if dep_name == name:
+                continue
+            dependency_term = self._termForSpec(dep_name, spec, spec_string)
+            incompatibility = Incompatibility(
+                [Term(name, [index], self.domains[name]), dependency_term.inverse()],
+                'dependency',
+                dependency = (name, candidate, dep_name, spec_string),
+                    reason = self.unavailable.get(dep_name, None)
+            )
+            self._addIncompatibility(incompatibility)
+            # if this version's dependencies already conflict with the
+            # partial solution, then don't choose it:
+            conflict = conflict or all(
+                t.name == name or self.solution.satisfies(t) for t in incompatibility.terms
+            )
+        if not conflict:
+            logger.debug('choose %s@%s', name, candidate)
+            self.solution.decide(name, index, self.domains[name])
+        return name
+
+
+# explaining failures
+
+def _describeVersions(term):
+    versions = [term.domain.candidates[i] for i in sorted(term.allowed) if i != _Not_Selected]
+    if not versions:
+        return '%s (no available version)' % term.name
+    if len(versions) > 4:
+        return '%s@%s (or %d other versions)' % (
+            term.name, ', '.join(str(v) for v in versions[:3]), len(versions) - 3
+        )
+    return '%s@%s' % (term.name, ', '.join(str(v) for v in versions))
+
+def _describeTerm(term):
+    if term.description is not None:
+        if term.isPositive():
+            return '%s %s' % (term.name, term.description)
+        return 'not %s %s' % (term.name, term.description)
+    if term.isPositive():
+        return _describeVersions(term)
+    return 'not ' + _describeVersions(term.inverse())
+
+def _describeIncompatibility(incompatibility, root_name):
+    terms = incompatibility.terms
+    if incompatibility.cause == 'root':
+        return '%s is the module being installed' % root_name
+    if incompatibility.cause == 'dependency':
+        name, candidate, dep_name, spec_string = incompatibility.dependency
+        r = '%s@%s depends on %s %s' % (name, candidate, dep_name, spec_string)
+        if not [t for t in terms if t.name == dep_name]:
+            if incompatibility.reason is not None:
+                r += ', but %s is not available (%s)' % (dep_name, incompatibility.reason)
+            else:
+                r += ', which no available version matches'
+        return r
+    if incompatibility.cause == 'no versions':
+        if incompatibility.reason is not None:
+            return '%s is not available (%s)' % (terms[0].name, incompatibility.reason)
+        return 'no versions of %s are available' % _describeTerm(terms[0])
+    if not terms:
+        return 'version solving failed'
+    if len(terms) == 1:
+        if terms[0].name == root_name:
+            return 'the dependencies of %s cannot be satisfied' % root_name
+        return '%s is not possible' % _describeTerm(terms[0])
+    positive = [t for t in terms if t.isPositive()]
+    negative = [t for t in terms if not t.isPositive()]
+    if len(positive) == 1 and negative:
+        return '%s requires %s' % (
+            _describeTerm(positive[0]),
+            ' and '.join(_describeTerm(t.inverse()) for t in negative)
+        )
+    return '%s are incompatible' % ' and '.join(_describeTerm(t) for t in terms)
+
+def _explain(incompatibility, root_name):
+    ''' Return a multi-line explanation of how incompatibility was derived
+        from the dependencies of modules and the versions that are
+        available. '''
+    lines = []
+    numbers = {}
+    def reference(i):
+        if i.cause == 'derived':
+            return '%s (%d)' % (_describeIncompatibility(i, root_name), numbers[id(i)])
+        return _describeIncompatibility(i, root_name)
+    def visit(i):
+        if i.cause != 'derived' or id(i) in numbers:
+            return
+        for c in i.causes:
+            visit(c)
+        numbers[id(i)] = len(numbers) + 1
+        lines.append('(%d) because %s, and %s: %s.' % (
+            numbers[id(i)], reference(i.causes[0]), reference(i.causes[1]),
+            _describeIncompatibility(i, root_name)
+        ))
+    visit(incompatibility)
+    if not lines:
+        return _describeIncompatibility(incompatibility, root_name) + '.'
+    return 'version solving failed:\n' + '\n'.join(lines)
+
+
+# solving for the dependencies of a module
+
+class _ModuleSource(object):
+    ''' Candidate versions and dependencies of modules, for the solver.
+
+        Installed modules are the only candidates for themselves (so nothing
+        is fetched if the installed modules already meet all the
+        requirements), unless they are being updated, or they have been
+        "expanded" to also consider the versions in the registry, after
+        causing a conflict. Linked modules are never replaced, and satisfy
+        any requirement on them.
+
+        Only dependencies on registry versions are solved for: others (from
+        github, git or hg URLs) are left to be satisfied when installing.
+        Test dependencies are only included for the root module.
+    '''
+    def __init__(self, root, target, test, available_components, search_dirs, update_installed):
+        self.root = root
+        self.target = target
+        self.test = test
+        self.available = available_components
+        self.search_dirs = list(search_dirs) + [root.modulesPath()]
+        self.update_installed = update_installed
+        self.shrinkwrap = root.getShrinkwrapMapping()
+        self.expanded = set()
+        self.installed = {}
+        # name: ([RemoteVersion], exception)
+        self.listings = {}
+
+    def _installedComponent(self, name):
+        # Component, , represents an installed component, internal
+        from yotta.lib import component
+        if name not in self.installed:
+            self.installed[name] = None
+            for d in self.search_dirs:
+                path = os.path.join(d, name)
+                c = component.Component(path, installed_linked=fsutils.isLink(path))
+                if c and c.getName() == name:
+                    self.installed[name] = c
+                    break
+        return self.installed[name]
+
+    def _wantsUpdate(self, name):
+        if self.update_installed is True:
+            return True
+        return bool(self.update_installed) and name in self.update_installed
+
+    def _isFixed(self, name):
+        if self.available.get(name):
+            return True
+        installed = self._installedComponent(name)
+        return installed is not None and (
+            installed.installedLinked() or
+            (name not in self.expanded and not self._wantsUpdate(name))
+        )
+
+    def canExpand(self, name):
+        return not self.available.get(name) and name not in self.expanded and \
+               self._installedComponent(name) is not None and self._isFixed(name)
+
+    def _list(self, name):
+        try:
+            return (access.remoteComponentFor(name, '*').availableVersions(), None)
+        except Exception as e:
+            return (None, e)
+
+    def _prefetchListings(self, names):
+        # pool, , shared thread pool, internal
+        from yotta.lib.pool import pool
+        names = [n for n in names if n not in self.listings and not self._isFixed(n)]
+        if len(names) > 1:
+            for name, listing in zip(names, pool.map(self._list, names)):
+                self.listings[name] = listing
+        elif names:
+            self.listings[names[0]] = self._list(names[0])
+
+    def versions(self, name):
+        available = self.available.get(name)
+        if available:
+            return [Candidate(available.getVersion(), component=available)]
+        installed = self._installedComponent(name)
+        if self._isFixed(name):
+            return [Candidate(installed.getVersion(), component=installed)]
+        self._prefetchListings([name])
+        remote_versions, error = self.listings[name]
+        if isinstance(error, access_common.AccessException):
+            raise error
+        elif error is not None:
+            raise access_common.Unavailable('failed to list versions of %s: %s' % (name, error))
+        r = [Candidate(v, remote_version=v) for v in sorted(remote_versions, reverse=True)]
+        if installed is not None:
+            # the installed version is preferred unless updating, in which
+            # case it's preferred over the same version from the registry
+            installed_version = installed.getVersion()
+            r = [c for c in r if c.version != installed_version]
+            if self._wantsUpdate(name):
+                position = len([c for c in r if c.version > installed_version])
+            else:
+                position = 0
+            r.insert(position, Candidate(installed_version, component=installed))
+        return r
+
+    def dependencies(self, name, candidate):
+        # Component, , represents an installed component, internal
+        from yotta.lib import component
+        if candidate.component is self.root:
+            specs = self.root.getDependencySpecs(target=self.target)
+            include_test = bool(self.test)
+        else:
+            include_test = False
+            if candidate.component is not None:
+                description = candidate.component.description
+                shrinkwrap = candidate.component.getShrinkwrapMapping() or self.shrinkwrap
+            else:
+                description = candidate.remote_version.getDescription()
+                shrinkwrap = self.shrinkwrap
+            if description is None:
+                logger.debug('dependencies of %s@%s are not known until it is installed', name, candidate)
+                return []
+            specs = component.dependencySpecsFromDescription(
+                description, name, shrinkwrap, target=self.target
+            )
+        r = []
+        for spec in specs:
+            if spec.is_test_dependency and not include_test:
+                continue
+            try:
+                vs = sourceparse.parseSourceURL(spec.versionReq())
+            except ValueError:
+                continue
+            if vs.source_type == 'registry':
+                semantic_spec = vs.semanticSpec()
+                linked = self._installedComponent(spec.name) if not self.available.get(spec.name) else None
+                if linked is not None and linked.installedLinked() and \
+                   not semantic_spec.match(linked.getVersion()):
+                    # linked modules are used whatever version they are (the
+                    # mismatch is reported as a warning when installing), so
+                    # a requirement on them never conflicts:
+                    logger.debug(
+                        'linked %s@%s does not meet %s required by %s',
+                        spec.name, linked.getVersion(), spec.versionReq(), name
+                    )
+                    semantic_spec = sourceparse.parseSourceURL('*').semanticSpec()
+                r.append((spec.name, semantic_spec, spec.versionReq()))
+        self._prefetchListings([x[0] for x in r])
+        return r
+
+def _namesIn(incompatibility):
+    ''' All the module names mentioned in the derivation of incompatibility. '''
+    r = set()
+    to_visit = [incompatibility]
+    while to_visit:
+        i = to_visit.pop()
+        r.update(t.name for t in i.terms)
+        if i.dependency is not None:
+            r.add(i.dependency[2])
+        if i.causes:
+            to_visit.extend(i.causes)
+    return r
+
+def solve(root, target=None, test=False, available_components=None, search_dirs=None, update_installed=False):
+    ''' Choose a version of every module that root depends on (recursively),
+        so that all of their requirements are met, and return an OrderedDict
+        of name: Candidate (including root). Raise SolveFailure if that isn't
+        possible. See Component.satisfyDependenciesRecursive for the meaning
+        of the parameters.
+    '''
+    source = _ModuleSource(
+        root, target, test, OrderedDict(available_components or []), search_dirs or [], update_installed
+    )
+    while True:
+        try:
+            return Solver(root.getName(), Candidate(root.getVersion(), component=root), source).solve()
+        except SolveFailure as e:
+            # the registry is only consulted about modules that are already
+            # installed when they are involved in a conflict:
+            expand = sorted(n for n in _namesIn(e.incompatibility) if source.canExpand(n))
+            if not expand:
+                offline_missing = sorted(
+                    name for name, (versions, error) in source.listings.items()
+                    if isinstance(error, access_common.Offline)
+                )
+                if offline_missing:
+                    raise SolveFailure(e.incompatibility, root.getName(), offline_missing)
+                raise
+            logger.debug('consider other versions of installed modules %s', expand)
+            source.expanded.update(expand)
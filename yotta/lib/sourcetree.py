@@ -0,0 +1,184 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# In-memory index of the files in a component's directory tree, used when
+# generating build files so that each directory is only listed once (with a
+# single scandir call, which also says whether each entry is a file or a
+# directory without needing to stat it), however many times the build file
+# generation asks about the files in it.
+
+# standard library modules, , ,
+import os
+import logging
+import hashlib
+
+# fsutils, , misc filesystem utils, internal
+from yotta.lib import fsutils
+
+try:
+    from os import scandir as _scandir
+except ImportError:
+    # python < 3.5
+    _scandir = None
+
+logger = logging.getLogger('cmakegen')
+
+class DirEntry(object):
+    def __init__(self, name, is_dir, is_file, is_symlink):
+        self.name = name
+        self.is_dir = is_dir
+        self.is_file = is_file
+        self.is_symlink = is_symlink
+
+def listDirEntries(path):
+    ''' Return a list of DirEntry objects for the contents of the directory at
+        path (in directory order), or None if it isn't a readable directory.
+        is_dir and is_file follow symlinks, like os.path.isdir and isfile.
+    '''
+    r = []
+    try:
+        if _scandir is not None:
+            for e in _scandir(path):
+                try:
+                    r.append(DirEntry(e.name, e.is_dir(), e.is_file(), e.is_symlink()))
+                except OSError:
+                    # removed since the directory was listed
+                    continue
+        else:
+            for name in os.listdir(path):
+                p = os.path.join(path, name)
+                r.append(DirEntry(name, os.path.isdir(p), os.path.isfile(p), os.path.islink(p)))
+    except OSError:
+        return None
+    return r
+
+
+class SourceTreeIndex(object):
+    ''' Index of the directory tree of a component. Directories are listed
+        when first needed, and never again. Paths passed to the query methods
+        are relative to the component's root, and queries for paths outside
+        it fall back to the filesystem.
+    '''
+    def __init__(self, component):
+        self.component = component
+        self.root = component.path
+        # directory parts tuple: {name: DirEntry} (or None if the directory
+        # doesn't exist)
+        self.directories = {}
+        # directory parts tuple: list of entries in directory order
+        self.ordered_entries = {}
+
+    def _parts(self, relpath):
+        relpath = os.path.normpath(relpath)
+        if relpath == '.':
+            return ()
+        if os.path.isabs(relpath) or relpath.split(os.sep)[0] == os.pardir:
+            return None
+        return tuple(fsutils.fullySplitPath(relpath))
+
+    def _entries(self, parts):
+        if parts not in self.directories:
+            entries = listDirEntries(os.path.join(self.root, *parts))
+            self.ordered_entries[parts] = entries
+            self.directories[parts] = None if entries is None else dict((e.name, e) for e in entries)
+        return self.directories[parts]
+
+    def _entry(self, parts):
+        if not parts:
+            return None
+        entries = self._entries(parts[:-1])
+        if entries is None:
+            return None
+        return entries.get(parts[-1], None)
+
+    def listDir(self, relpath='.'):
+        ''' Return the names in the directory at relpath, in directory order. '''
+        parts = self._parts(relpath)
+        if parts is None:
+            return os.listdir(os.path.join(self.root, relpath))
+        self._entries(parts)
+        return [e.name for e in self.ordered_entries[parts] or []]
+
+    def isFile(self, relpath):
+        parts = self._parts(relpath)
+        if parts is None:
+            return os.path.isfile(os.path.join(self.root, relpath))
+        e = self._entry(parts)
+        return e is not None and e.is_file
+
+    def isDir(self, relpath):
+        parts = self._parts(relpath)
+        if parts is None:
+            return os.path.isdir(os.path.join(self.root, relpath))
+        if parts == ():
+            return True
+        e = self._entry(parts)
+        return e is not None and e.is_dir
+
+    def exists(self, relpath):
+        parts = self._parts(relpath)
+        if parts is None:
+            return os.path.exists(os.path.join(self.root, relpath))
+        return parts == () or self._entry(parts) is not None
+
+    def walk(self, relpath):
+        ''' Generate (directory path, directory path relative to the root,
+            [file names]) for the directory at relpath and everything inside
+            it, in the same order as os.walk, and with the same treatment of
+            symlinks: relpath is followed if it is a symlink, but symlinks to
+            directories inside it are not.
+
+            Directories ignored by the component are not descended into, and
+            ignored files are not listed.
+        '''
+        parts = self._parts(relpath)
+        if parts is None:
+            raise ValueError('path "%s" is not inside %s' % (relpath, self.root))
+        for r in self._walk(os.path.join(self.root, relpath), parts):
+            yield r
+
+    def _walk(self, directory, parts):
+        entries = self._entries(parts)
+        if entries is None:
+            return
+        ignores = self.component.ignores
+        files = []
+        subdirs = []
+        for e in self.ordered_entries[parts]:
+            sub_parts = parts + (e.name,)
+            if e.is_dir:
+                if not ignores(os.path.join(*sub_parts)):
+                    subdirs.append(e)
+            elif not ignores(os.path.join(*sub_parts)):
+                files.append(e.name)
+        yield (directory, os.path.join(*parts) if parts else '', files)
+        for e in subdirs:
+            if not e.is_symlink:
+                for r in self._walk(os.path.join(directory, e.name), parts + (e.name,)):
+                    yield r
+
+    def listingSignature(self, skip_top_level=None):
+        ''' Return a hash of the names and types of everything in the tree,
+            which changes if anything is added, removed or renamed (but not if
+            files are modified). Symlinks to directories are only followed
+            at the top level (which is walked even if it contains symlinks).
+            Top-level entries for which skip_top_level(name) returns True
+            are not included.
+        '''
+        h = hashlib.sha1()
+        to_list = [()]
+        while to_list:
+            parts = to_list.pop()
+            if self._entries(parts) is None:
+                continue
+            for e in sorted(self.ordered_entries[parts], key=lambda e: e.name):
+                if not parts and skip_top_level is not None and skip_top_level(e.name):
+                    continue
+                h.update(('%s %s%s%s\n' % (
+                    '/'.join(parts + (e.name,)), int(e.is_dir), int(e.is_file), int(e.is_symlink)
+                )).encode('utf-8'))
+                if e.is_dir and not (parts and e.is_symlink):
+                    to_list.append(parts + (e.name,))
+        return h.hexdigest()
@@ -13,6 +13,7 @@ import traceback
 import errno
 import itertools
 import shlex
+import time
 from collections import OrderedDict
 
 # Ordered JSON, , read & write json, internal
@@ -38,6 +39,55 @@ def _ignoreSignal(signum, frame):
 def _newPGroup():
     os.setpgrp()
 
+# outcomes of DerivedTarget.test:
+Test_Passed = 0
+Test_Failed = 1
+Test_Timed_Out = 2
+
+# seconds to wait after asking a test that has timed out to terminate, before
+# killing it:
+_Kill_Grace_Period = 5
+
+def _waitWithTimeout(processes, timeout):
+    ''' Wait for all of processes to exit. Returns False if they haven't all
+        exited after timeout seconds (or wait forever if timeout is None).
+    '''
+    if timeout is None:
+        for p in processes:
+            p.wait()
+        return True
+    # Popen.wait doesn't support a timeout on python 2, so poll:
+    deadline = time.time() + timeout
+    while any(p.poll() is None for p in processes):
+        if time.time() >= deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+def _signalGroup(process, signum):
+    try:
+        if os.name == 'posix':
+            os.killpg(process.pid, signum)
+        elif signum == signal.SIGTERM:
+            process.terminate()
+        else:
+            process.kill()
+    except OSError as e:
+        # "no such process": everything in the group has already exited
+        if e.errno != errno.ESRCH:
+            raise
+
+def _terminateGroup(process):
+    ''' Terminate process, which must have been started in a new process
+        group, and anything else in its process group: first with SIGTERM, and
+        then if it's still running after a grace period, with SIGKILL.
+    '''
+    _signalGroup(process, signal.SIGTERM)
+    if not _waitWithTimeout([process], _Kill_Grace_Period):
+        logger.warning('test process %s did not exit, and will be killed', process.pid)
+        _signalGroup(process, signal.SIGKILL)
+        process.wait()
+
 def _mergeDictionaries(*args):
     ''' merge dictionaries of dictionaries recursively, with elements from
         dictionaries earlier in the argument sequence taking precedence
@@ -753,11 +803,40 @@ class DerivedTarget(Target):
                     except OSError as e:
                         pass
 
+    def canRunTestsInParallel(self):
+        ''' Return False if this target can only run one test at a time (for
+            example because its test script drives a single physical board),
+            which is declared with "parallelTests": false in the target
+            description (possibly inherited from a base target).
+        '''
+        for t in self.hierarchy:
+            if 'parallelTests' in t.description:
+                return bool(t.description['parallelTests'])
+        return True
+
+    def getTestTimeout(self):
+        ''' Return the number of seconds that each test may run for, declared
+            with "testTimeout" in the target description (possibly inherited
+            from a base target), or None if tests may run forever.
+        '''
+        for t in self.hierarchy:
+            if 'testTimeout' in t.description:
+                return t.description['testTimeout']
+        return None
+
     @fsutils.dropRootPrivs
-    def test(self, test_dir, module_dir, test_command, filter_command, forward_args):
+    def test(self, test_dir, module_dir, test_command, filter_command, forward_args, output=None, timeout=None):
         # we assume that test commands are relative to the current directory
         # (filter commands are relative to the module dir to make it possible
         # to use filter scripts shipped with the module)
+        # If output (a file object) is specified then all the output of the
+        # test (or of its filter) is written to it.
+        # If timeout is specified, and the test (and its filter) haven't exited
+        # after that many seconds, then they are terminated (along with any
+        # processes they started).
+        # Returns (outcome, returncode), where outcome is one of Test_Passed,
+        # Test_Failed or Test_Timed_Out, and returncode is the exit status of
+        # the test (or of its filter), or None if it didn't exit by itself.
         test_command = './' + test_command
         test_script = self.getScript('test')
 
@@ -782,6 +861,12 @@ class DerivedTarget(Target):
             python_interpreter = sys.executable
             filter_command = [python_interpreter] + filter_command
 
+        # tests that may time out are run in their own process groups, so that
+        # any processes they start can be terminated along with them:
+        preexec_fn = None
+        if timeout is not None and os.name == 'posix':
+            preexec_fn = _newPGroup
+
         test_child = None
         test_filter = None
         try:
@@ -789,18 +874,28 @@ class DerivedTarget(Target):
             if filter_command:
                 logger.debug('using output filter command: %s', filter_command)
                 test_child = subprocess.Popen(
-                    cmd, cwd = test_dir, stdout = subprocess.PIPE, env = test_env
+                    cmd, cwd = test_dir, stdout = subprocess.PIPE, stderr = output, env = test_env,
+                    preexec_fn = preexec_fn
                 )
                 try:
                     test_filter = subprocess.Popen(
-                        filter_command, cwd = module_dir, stdin = test_child.stdout, env = test_env
+                        filter_command, cwd = module_dir, stdin = test_child.stdout, env = test_env,
+                        stdout = output, stderr = (subprocess.STDOUT if output is not None else None),
+                        preexec_fn = preexec_fn
                     )
                 except OSError as e:
                     logger.error('error starting test output filter "%s": %s', filter_command, e)
                     _tryTerminate(test_child)
-                    return 1
+                    return (Test_Failed, None)
                 logger.debug('waiting for filter process')
-                test_filter.communicate()
+                if not _waitWithTimeout([test_filter], timeout):
+                    logger.debug('test %s timed out after %ss', test_command, timeout)
+                    _terminateGroup(test_filter)
+                    _terminateGroup(test_child)
+                    test_child.stdout.close()
+                    test_child = None
+                    test_filter = None
+                    return (Test_Timed_Out, None)
                 if test_child.poll() is None:
                     logger.warning('test child has not exited and will be terminated')
                     _tryTerminate(test_child)
@@ -810,28 +905,34 @@ class DerivedTarget(Target):
                 test_filter = None
                 if returncode:
                     logger.debug("test filter exited with status %s (=fail)", returncode)
-                    return 1
+                    return (Test_Failed, returncode)
             else:
                 try:
                     test_child = subprocess.Popen(
-                        cmd, cwd = test_dir, env = test_env
+                        cmd, cwd = test_dir, env = test_env,
+                        stdout = output, stderr = (subprocess.STDOUT if output is not None else None),
+                        preexec_fn = preexec_fn
                     )
                     logger.debug('waiting for test child')
                 except OSError as e:
                     if e.errno == errno.ENOENT:
                         logger.error('Error: no such file or directory: "%s"', cmd[0])
-                        return 1
+                        return (Test_Failed, None)
                     raise
-                test_child.wait()
+                if not _waitWithTimeout([test_child], timeout):
+                    logger.debug('test %s timed out after %ss', test_command, timeout)
+                    _terminateGroup(test_child)
+                    test_child = None
+                    return (Test_Timed_Out, None)
                 returncode = test_child.returncode
                 test_child = None
                 if returncode:
                     logger.debug("test process exited with status %s (=fail)", returncode)
-                    return 1
+                    return (Test_Failed, returncode)
         finally:
             if test_child is not None:
                 _tryTerminate(test_child)
             if test_filter is not None:
                 _tryTerminate(test_filter)
         logger.debug("test %s passed", test_command)
-        return 0
+        return (Test_Passed, 0)
@@ -9,10 +9,17 @@ import subprocess
 import tempfile
 import logging
 import errno
+import hashlib
 
 git_logger = logging.getLogger('git')
 hg_logger = logging.getLogger('hg')
 
+# path to git dir: (fingerprint of the refs, [(ref name, commit id), ...])
+_Git_Refs_Cache = {}
+
+# paths of the mirrors that have already been updated by this process
+_Updated_Mirrors = set()
+
 class VCSError(Exception):
     def __init__(self, message, returncode=None, command=None):
         super(VCSError, self).__init__(message)
@@ -45,6 +52,10 @@ class VCS(object):
         raise NotImplementedError()
     def getDescription(self):
         raise NotImplementedError()
+    def state(self):
+        # snapshot of the commit id, clean state and description: by default
+        # these are just queried individually
+        return self
     def __nonzero__(self):
         raise NotImplementedError()
     # python 3 truthiness
@@ -53,9 +64,13 @@ class VCS(object):
 
 
 class Git(VCS):
-    def __init__(self, path):
+    def __init__(self, path, bare=False):
         self.worktree = path
-        self.gitdir = os.path.join(path, '.git')
+        self.bare = bare
+        if bare:
+            self.gitdir = path
+        else:
+            self.gitdir = os.path.join(path, '.git')
 
     @classmethod
     def cloneToTemporaryDir(cls, remote):
@@ -72,6 +87,43 @@ class Git(VCS):
             r.updateToTag(tag)
         return r
 
+    @classmethod
+    def mirror(cls, remote, update=True):
+        ''' Return a bare mirror of the remote repository, kept in the yotta
+            cache directory. The first time a remote is used it's cloned, after
+            that the existing mirror is updated with a fetch (at most once per
+            process). If the fetch fails the mirror is used as-is.
+
+            If update is False then an existing mirror is never updated, and
+            if there is no mirror VCSError is raised.
+        '''
+        path = mirrorDirectory('git', remote)
+        r = Git(path, bare=True)
+        if not update and not os.path.isdir(path):
+            raise VCSError('there is no mirror of %s' % remote)
+        if os.path.isdir(path):
+            if update and path not in _Updated_Mirrors:
+                git_logger.debug('update mirror of %s in %s', remote, path)
+                try:
+                    cls._execCommands([r._gitCmd('fetch', '--prune', '--quiet', 'origin')])
+                except VCSNotInstalled:
+                    raise
+                except VCSError as e:
+                    git_logger.warning(
+                        'failed to update %s, using the cached copy (%s)', remote, str(e).split('\n')[0]
+                    )
+                r._refsChanged()
+        else:
+            git_logger.debug('create mirror of %s in %s', remote, path)
+            _createMirror(path, lambda temp_path: cls._execCommands([
+                ['git', 'clone', '--mirror', '--quiet', remote, temp_path]
+            ]))
+        _Updated_Mirrors.add(path)
+        return r
+
+    def setRemote(self, url, name='origin'):
+        self._execCommands([self._gitCmd('remote', 'set-url', name, url)])
+
     def fetchAllBranches(self):
         remote_branches = []
         local_branches = []
@@ -104,6 +156,8 @@ class Git(VCS):
             except VCSError as e:
                 git_logger.error('failed to fetch remote branch %s %s' % (remote, branchname))
                 raise
+            finally:
+                self._refsChanged()
 
     def remove(self):
         # fsutils, , misc filesystem utils, internal
@@ -111,17 +165,92 @@ class Git(VCS):
         fsutils.rmRf(self.worktree)
 
     def getCommitId(self):
-        out, err = self._execCommands([self._gitCmd('rev-parse', 'HEAD')])
-        return out.strip()
+        return self.state().getCommitId()
 
     def getDescription(self):
-        out, err = self._execCommands([self._gitCmd('describe', '--always', '--tags')])
-        return out.strip()
+        return self.state().getDescription()
+
+    def state(self):
+        ''' Return a snapshot of the state of this repository (the current
+            commit, whether it's clean, and its refs), read using as few git
+            processes as possible.
+        '''
+        commit_id, clean = self._status()
+        return GitState(self, commit_id, clean, self._refs())
+
+    def _status(self):
+        ''' Return (commit id of HEAD, whether the working tree and index
+            are clean), from a single git status command.
+        '''
+        out, err = self._execCommands([
+            self._gitCmd('status', '--porcelain=v2', '--branch', '--untracked-files=no')
+        ])
+        commit_id = None
+        clean = True
+        for line in out.split(b'\n'):
+            if line.startswith(b'# branch.oid '):
+                commit_id = line[len(b'# branch.oid '):].strip()
+            elif line and not line.startswith(b'#'):
+                clean = False
+        if commit_id is None or commit_id == b'(initial)':
+            raise VCSError('no commits in %s' % self.worktree, returncode=128)
+        return commit_id, clean
+
+    def _refsFingerprint(self):
+        # creating, updating or deleting a ref always modifies HEAD,
+        # packed-refs, or the directory containing the ref (which may be
+        # nested, e.g. for refs/heads/feature/x), because git writes refs by
+        # renaming a lock file into place:
+        paths = ['HEAD', 'packed-refs', 'refs']
+        for top in (os.path.join('refs', 'heads'), os.path.join('refs', 'tags')):
+            for root, dirs, files in os.walk(os.path.join(self.gitdir, top)):
+                dirs.sort()
+                paths.append(os.path.relpath(root, self.gitdir))
+        fingerprint = []
+        for p in paths:
+            try:
+                st = os.stat(os.path.join(self.gitdir, p))
+                fingerprint.append((p, getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size))
+            except OSError:
+                fingerprint.append((p, None))
+        return tuple(fingerprint)
+
+    def _refs(self):
+        ''' Return a list of (ref name, commit id) for all local tags and
+            branches, from a single git for-each-ref command. The result is
+            cached until the repository's refs are modified.
+        '''
+        key = os.path.realpath(self.gitdir)
+        fingerprint = self._refsFingerprint()
+        cached = _Git_Refs_Cache.get(key, None)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+        out, err = self._execCommands([self._gitCmd(
+            'for-each-ref', '--format=%(refname)%00%(objectname)%00%(*objectname)', 'refs/tags', 'refs/heads'
+        )])
+        refs = []
+        for line in out.split(b'\n'):
+            fields = line.split(b'\0')
+            if len(fields) != 3:
+                continue
+            refname, objectname, peeled = fields
+            # I think utf-8 is the right encoding? commit messages are utf-8
+            # encoded, couldn't find any documentation on tag names.
+            # (annotated tags point to the tag object, which points to the
+            # commit)
+            refs.append((refname.decode('utf-8'), peeled or objectname))
+        _Git_Refs_Cache[key] = (fingerprint, refs)
+        return refs
+
+    def _refsChanged(self):
+        _Git_Refs_Cache.pop(os.path.realpath(self.gitdir), None)
 
     def workingDirectory(self):
         return self.worktree
 
     def _gitCmd(self, *args):
+        if self.bare:
+            return ['git', '--git-dir=%s' % self.gitdir.replace('\\', '/')] + list(args)
         return ['git','--work-tree=%s' % self.worktree,'--git-dir=%s'%self.gitdir.replace('\\', '/')] + list(args);
 
     @classmethod
@@ -147,18 +276,8 @@ class Git(VCS):
         return out, err
 
     def isClean(self):
-        commands = [
-            self._gitCmd('diff', '--quiet', '--exit-code'),
-            self._gitCmd('diff', '--cached', '--quiet', '--exit-code'),
-        ]
-        try:
-            out, err = self._execCommands(commands)
-        except VCSError as e:
-            if e.returncode:
-                return False
-            else:
-                raise
-        return True
+        commit_id, clean = self._status()
+        return clean
 
     def markForCommit(self, relative_path):
         commands = [
@@ -171,23 +290,14 @@ class Git(VCS):
             self._gitCmd('checkout', tag),
         ]
         self._execCommands(commands)
+        self._refsChanged()
 
 
     def tags(self):
-        commands = [
-            self._gitCmd('tag', '-l')
-        ]
-        out, err = self._execCommands(commands)
-        # I think utf-8 is the right encoding? commit messages are utf-8
-        # encoded, couldn't find any documentation on tag names.
-        return out.decode('utf-8').split(u'\n')
+        return [name[len('refs/tags/'):] for name, commit_id in self._refs() if name.startswith('refs/tags/')]
 
     def branches(self):
-        commands = [
-            self._gitCmd('branch', '--list')
-        ]
-        out, err = self._execCommands(commands)
-        return [x.lstrip(' *') for x in out.decode('utf-8').split('\n')]
+        return [name[len('refs/heads/'):] for name, commit_id in self._refs() if name.startswith('refs/heads/')]
 
     def commit(self, message, tag=None):
         commands = [
@@ -197,12 +307,50 @@ class Git(VCS):
             commands.append(
                 self._gitCmd('tag', tag, '-a', '-m', tag),
             )
-        self._execCommands(commands)
+        try:
+            self._execCommands(commands)
+        finally:
+            self._refsChanged()
 
     def __nonzero__(self):
         return True
 
 
+class GitState(object):
+    ''' Snapshot of the state of a git repository, as returned by
+        Git.state().
+    '''
+    def __init__(self, repo, commit_id, clean, refs):
+        self.repo = repo
+        self.commit_id = commit_id
+        self.clean = clean
+        self.refs = refs
+        self.description = None
+
+    def getCommitId(self):
+        return self.commit_id
+
+    def isClean(self):
+        return self.clean
+
+    def getDescription(self):
+        if self.description is None:
+            tags_here = [
+                name for name, commit_id in self.refs
+                if name.startswith('refs/tags/') and commit_id == self.commit_id
+            ]
+            if len(tags_here) == 1:
+                # exactly the description that git describe would find,
+                # without having to ask it
+                self.description = tags_here[0][len('refs/tags/'):].encode('utf-8')
+            else:
+                out, err = self.repo._execCommands([
+                    self.repo._gitCmd('describe', '--always', '--tags')
+                ])
+                self.description = out.strip()
+        return self.description
+
+
 # FIXME: hgapi will throw HgException when something goes wrong, it may be worth trying
 # to catch that in some methods
 class HG(VCS):
@@ -238,6 +386,34 @@ class HG(VCS):
             r.updateToTag(tag)
         return r
 
+    @classmethod
+    def mirror(cls, remote, update=True):
+        ''' Return a mirror (a clone without a working copy) of the remote
+            repository, kept in the yotta cache directory, see Git.mirror.
+        '''
+        cls._loadHGApi()
+        path = mirrorDirectory('hg', remote)
+        if not update and not os.path.isdir(path):
+            raise VCSError('there is no mirror of %s' % remote)
+        if os.path.isdir(path):
+            if update and path not in _Updated_Mirrors:
+                hg_logger.debug('update mirror of %s in %s', remote, path)
+                try:
+                    cls.hgapi.Repo(path).hg_pull()
+                except cls.hgapi.HgException as e:
+                    hg_logger.warning(
+                        'failed to update %s, using the cached copy (%s)', remote, str(e).split('\n')[0]
+                    )
+        else:
+            hg_logger.debug('create mirror of %s in %s', remote, path)
+            _createMirror(path, lambda temp_path: cls.hgapi.Repo.hg_clone(remote, temp_path, '--noupdate'))
+        _Updated_Mirrors.add(path)
+        return HG(path)
+
+    def setRemote(self, url, name='default'):
+        with open(os.path.join(self.worktree, '.hg', 'hgrc'), 'a') as f:
+            f.write('\n[paths]\n%s = %s\n' % (name, url))
+
     def remove(self):
         # fsutils, , misc filesystem utils, internal
         from yotta.lib import fsutils
@@ -277,11 +453,45 @@ class HG(VCS):
     def __nonzero__(self):
         return True
 
+def mirrorDirectory(kind, remote):
+    ''' Return the path of the cached mirror of a remote repository. '''
+    # folders, , where yotta stores things, internal
+    from yotta.lib import folders
+    return os.path.join(
+        folders.cacheDirectory(), 'mirrors', kind,
+        hashlib.sha1(remote.encode('utf-8')).hexdigest()
+    )
+
+def _createMirror(path, clone_fn):
+    # clone into a temporary directory next to the final one, and move it
+    # into place only once it's complete, so that an interrupted clone never
+    # leaves a broken mirror behind:
+    # fsutils, , misc filesystem utils, internal
+    from yotta.lib import fsutils
+    fsutils.mkDirP(os.path.dirname(path))
+    temp_dir = tempfile.mkdtemp(dir=os.path.dirname(path), suffix='.locked')
+    try:
+        temp_path = os.path.join(temp_dir, 'repo')
+        clone_fn(temp_path)
+        try:
+            os.rename(temp_path, path)
+        except OSError:
+            # another process created the mirror at the same time: use theirs
+            if not os.path.isdir(path):
+                raise
+    finally:
+        fsutils.rmRf(temp_dir)
+
 def getVCS(path):
-    # crude heuristic, does the job...
-    if os.path.exists(os.path.join(path, '.git')):
+    # crude heuristic, does the job... (a single directory listing is used to
+    # check for both kinds of repository)
+    try:
+        entries = set(os.listdir(path))
+    except OSError:
+        return None
+    if '.git' in entries:
         return Git(path)
-    if os.path.isdir(os.path.join(path, '.hg')):
+    if '.hg' in entries and os.path.isdir(os.path.join(path, '.hg')):
         return HG(path)
     return None
 
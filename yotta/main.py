@@ -100,6 +100,7 @@ def main():
     options.debug.addTo(parser)
     options.plain.addTo(parser)
     options.noninteractive.addTo(parser)
+    options.offline.addTo(parser)
     options.registry.addTo(parser)
     options.target.addTo(parser)
     options.config.addTo(parser)
@@ -195,6 +196,13 @@ def main():
     addParser('clean', 'clean', 'Remove files created by yotta and the build.')
     addParser('config', 'config', 'Display the target configuration info.')
     addParser('shrinkwrap', 'shrinkwrap', 'Create a yotta-shrinkwrap.json file to freeze dependency versions.')
+    addParser('mirror', 'mirror',
+        'Run a local mirror of the registry, which downloads each version '+
+        'listing and tarball that it is asked for once, and then serves it '+
+        'from the yotta cache. Use --offline to only serve what is already '+
+        'cached.',
+        'Run a local pull-through mirror of the registry.'
+    )
 
     # short synonyms, subparser.choices is a dictionary, so use update() to
     # merge in the keys from another dictionary
@@ -234,6 +242,7 @@ def main():
     # set global arguments that are shared everywhere and never change
     globalconf.set('interactive', args.interactive)
     globalconf.set('plain', args.plain)
+    globalconf.set('offline', args.offline)
 
     # finally, do stuff!
     if 'command' not in args:
@@ -249,4 +258,9 @@ def main():
         logging.error(e)
         status = -1
 
+    # if any connections were made to registries, log how much time was spent
+    # on them (without importing the sessions module if it wasn't used):
+    if 'yotta.lib.sessions' in sys.modules:
+        sys.modules['yotta.lib.sessions'].logStatistics()
+
     sys.exit(status or 0)
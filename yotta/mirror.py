@@ -0,0 +1,37 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+# standard library modules, , ,
+import logging
+
+# registry_mirror, , local pull-through registry mirror, internal
+from yotta.lib import registry_mirror
+
+def addOptions(parser):
+    parser.add_argument('--host', dest='host', default='localhost',
+        help='The address to listen on (default localhost, use 0.0.0.0 to '+
+             'serve other machines).'
+    )
+    parser.add_argument('--port', '-p', dest='port', type=int, default=8080,
+        help='The port to listen on (default 8080).'
+    )
+    parser.add_argument('--upstream', dest='upstream', default=None,
+        help='The registry to mirror (default: the public registry).'
+    )
+
+def execCommand(args, following_args):
+    mirror = registry_mirror.RegistryMirror(args.upstream)
+    server = registry_mirror.MirrorServer(mirror, args.host, args.port)
+    logging.info(
+        'mirroring %s at %s. To use it, add {"type":"registry", "url":"%s"} '+
+        'to the "sources" setting.', mirror.upstream, server.url(), server.url()
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
@@ -12,6 +12,7 @@ from . import registry
 from . import target
 from . import config
 from . import force
+from . import offline
 
 # this modifies argparse when it's imported:
 from . import parser
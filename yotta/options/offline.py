@@ -0,0 +1,12 @@
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+def addTo(parser):
+    parser.add_argument('--offline', dest='offline', action='store_true', default=False,
+        help="Never access the network: use only installed modules, and the "+
+             "versions and downloads that are already cached. Fail if "+
+             "anything else is needed. (Can also be enabled with the "+
+             "\"offline\" setting, or the YOTTA_OFFLINE environment variable.)"
+    )
@@ -345,6 +345,37 @@ int main(){ printf("generated return val=%d\\n", postInstallGenerated()); return
         self.assertIn('post-install generated header file included', output)
         self.assertIn('generated .cmake file included', output)
 
+    def test_installOffline(self):
+        test_dir = util.writeTestFiles({
+'module.json':'''{
+  "name": "test-offline",
+  "version": "1.0.0",
+  "license": "Apache-2.0",
+  "dependencies": {
+    "missing-a": "^1.0.0",
+    "missing-b": "*"
+  }
+}''',
+'yotta_targets/test-target/target.json':'''{
+  "name": "test-target",
+  "version": "1.0.0",
+  "license": "Apache-2.0"
+}'''})
+        settings_dir = tempfile.mkdtemp()
+        restore_settings_dir = os.environ.get('YOTTA_USER_SETTINGS_DIR', None)
+        os.environ['YOTTA_USER_SETTINGS_DIR'] = settings_dir
+        try:
+            stdout, stderr, statuscode = cli.run(['--offline', '--target', 'test-target', 'install'], cwd=test_dir)
+        finally:
+            if restore_settings_dir is None:
+                del os.environ['YOTTA_USER_SETTINGS_DIR']
+            else:
+                os.environ['YOTTA_USER_SETTINGS_DIR'] = restore_settings_dir
+            rmRf(settings_dir)
+            rmRf(test_dir)
+        self.assertNotEqual(statuscode, 0)
+        self.assertIn('the versions of these modules are not cached: missing-a, missing-b', stdout + stderr)
+
     def runCheckCommand(self, args, test_dir):
         stdout, stderr, statuscode = cli.run(args, cwd=test_dir)
         #print stdout
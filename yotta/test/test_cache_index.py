@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import tempfile
+import os
+
+# internal modules:
+from yotta.lib import cache_index
+from yotta.lib import access_common
+from yotta.lib.fsutils import rmRf
+
+class TestCacheIndex(unittest.TestCase):
+    def setUp(self):
+        self.restore_settings_dir = os.environ.get('YOTTA_USER_SETTINGS_DIR', None)
+        self.test_dir = tempfile.mkdtemp()
+        os.environ['YOTTA_USER_SETTINGS_DIR'] = self.test_dir
+        self.cache_dir = os.path.join(self.test_dir, 'cache')
+        os.makedirs(self.cache_dir)
+
+    def tearDown(self):
+        if self.restore_settings_dir is None:
+            del os.environ['YOTTA_USER_SETTINGS_DIR']
+        else:
+            os.environ['YOTTA_USER_SETTINGS_DIR'] = self.restore_settings_dir
+        rmRf(self.test_dir)
+
+    def writeCacheFile(self, key, size):
+        with open(os.path.join(self.cache_dir, key), 'wb') as f:
+            f.write(b'x' * size)
+        cache_index.add(key, size)
+
+    def test_totals(self):
+        self.writeCacheFile('a', 10)
+        self.writeCacheFile('b', 20)
+        self.writeCacheFile('a', 5)
+        self.assertEqual(cache_index.totals(), (2, 25))
+        cache_index.remove('b')
+        self.assertEqual(cache_index.totals(), (1, 5))
+
+    def test_hits(self):
+        self.writeCacheFile('a', 10)
+        cache_index.touch('a')
+        cache_index.touch('a')
+        self.assertEqual(cache_index.get('a')['hits'], 2)
+        self.assertEqual(cache_index.get('b'), None)
+
+    def test_evictLeastRecentlyUsed(self):
+        for key in ('a', 'b', 'c', 'd'):
+            self.writeCacheFile(key, 100)
+        cache_index.touch('a')
+        self.assertEqual(cache_index.evictionCandidates(max_entries=4), [])
+        self.assertEqual(cache_index.evictionCandidates(max_entries=2), ['b', 'c'])
+        self.assertEqual(cache_index.evictionCandidates(max_bytes=150), ['b', 'c', 'd'])
+        self.assertEqual(cache_index.evictionCandidates(max_entries=3, max_bytes=250), ['b', 'c'])
+
+    def test_existingFilesIndexed(self):
+        with open(os.path.join(self.cache_dir, 'existing'), 'wb') as f:
+            f.write(b'x' * 7)
+        with open(os.path.join(self.cache_dir, 'existing.json'), 'w') as f:
+            f.write('{}')
+        self.assertEqual(cache_index.totals(), (1, 7))
+
+    def test_prune(self):
+        for key in ('a', 'b', 'c'):
+            self.writeCacheFile(key, 100)
+        access_common._max_cached_modules = 2
+        try:
+            access_common.pruneCache()
+        finally:
+            access_common._max_cached_modules = None
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, 'a')))
+        self.assertTrue(os.path.exists(os.path.join(self.cache_dir, 'c')))
+        self.assertEqual(cache_index.totals(), (2, 200))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import tempfile
+import os
+
+# internal modules:
+from yotta.lib import cmakegen
+from yotta.lib import component
+from yotta.test.cli import util
+
+Test_Files = {
+    'module.json': '''{
+  "name": "test-top",
+  "version": "1.0.0",
+  "license": "Apache-2.0",
+  "dependencies": {
+    "test-dep": "*"
+  }
+}''',
+    'source/a.c': '',
+    'yotta_modules/test-dep/module.json': '''{
+  "name": "test-dep",
+  "version": "1.0.0",
+  "license": "Apache-2.0"
+}''',
+    'yotta_modules/test-dep/source/d.c': ''
+}
+
+class FakeTarget(object):
+    def getName(self):
+        return 'fake-target'
+    def getMergedConfig(self):
+        return {}
+    def getToolchainFiles(self):
+        return []
+    def getAdditionalIncludes(self):
+        return []
+    def getSimilarTo_Deprecated(self):
+        return ['fake-target']
+    def getConfigValue(self, *args):
+        return None
+
+class RecordingCMakeGen(cmakegen.CMakeGen):
+    def __init__(self, *args, **kwargs):
+        super(RecordingCMakeGen, self).__init__(*args, **kwargs)
+        self.generated = []
+
+    def generate(self, builddir, *args, **kwargs):
+        self.generated.append(os.path.relpath(builddir, self.buildroot).replace('\\', '/'))
+        return super(RecordingCMakeGen, self).generate(builddir, *args, **kwargs)
+
+class TestIncrementalGeneration(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = util.writeTestFiles(Test_Files)
+        self.build_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        util.rmRf(self.test_dir)
+        util.rmRf(self.build_dir)
+
+    def generate(self):
+        c = component.Component(self.test_dir)
+        deps = {'test-dep': component.Component(os.path.join(self.test_dir, 'yotta_modules', 'test-dep'))}
+        gen = RecordingCMakeGen(self.build_dir, FakeTarget())
+        gen.configure(c, deps)
+        self.assertEqual(list(gen.generateRecursive(c, deps, self.build_dir)), [])
+        return gen.generated
+
+    def test_unchangedSkipped(self):
+        self.assertEqual(self.generate(), ['.', 'ym/test-dep'])
+        self.assertEqual(self.generate(), ['.'])
+
+    def test_newFileRegenerates(self):
+        self.generate()
+        with open(os.path.join(self.test_dir, 'yotta_modules', 'test-dep', 'source', 'e.c'), 'w') as f:
+            f.write('')
+        self.assertEqual(self.generate(), ['.', 'ym/test-dep'])
+
+    def test_missingOutputRegenerates(self):
+        self.generate()
+        os.remove(os.path.join(self.build_dir, 'ym', 'test-dep', 'CMakeLists.txt'))
+        self.assertEqual(self.generate(), ['.', 'ym/test-dep'])
+
+    def test_interruptedRegenerates(self):
+        self.generate()
+        os.remove(os.path.join(self.build_dir, cmakegen.Generation_Manifest_Fname))
+        self.assertEqual(self.generate(), ['.', 'ym/test-dep'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -99,5 +99,37 @@ class ComponentTestCase(unittest.TestCase):
         test_deps = c.getDependencies(test=True)
         self.assertEqual(list(test_deps.keys()), test_deps_in_order)
 
+    def test_sharedState(self):
+        with open(os.path.join(self.test_dir, 'module.json'), 'w') as f:
+            f.write(test_json)
+
+        a = component.Component(self.test_dir)
+        b = component.Component(self.test_dir, test_dependency=True)
+        # the description is only read once...
+        self.assertIs(a.description, b.description)
+        # ...but each instance has its own flags and version
+        self.assertFalse(a.isTestDependency())
+        self.assertTrue(b.isTestDependency())
+        self.assertIsNot(a.getVersion(), b.getVersion())
+
+        # modifying one instance doesn't affect the other
+        b.setVersion(b.getVersion())
+        b.saveDependency(a, spec='^1.0.0')
+        self.assertNotIn('something', a.description['dependencies'])
+
+        # modifying the description file is noticed
+        b.setName('something-else')
+        b.writeDescription()
+        self.assertEqual(component.Component(self.test_dir).getName(), 'something-else')
+        self.assertEqual(a.getName(), 'something')
+
+    def test_lazyVCS(self):
+        with open(os.path.join(self.test_dir, 'module.json'), 'w') as f:
+            f.write(test_json)
+        c = component.Component(self.test_dir)
+        os.mkdir(os.path.join(self.test_dir, '.git'))
+        # the directory is only checked for version control when needed:
+        self.assertEqual(c.vcs.__class__.__name__, 'Git')
+
 if __name__ == '__main__':
     unittest.main()
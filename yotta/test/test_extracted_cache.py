@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import tempfile
+import tarfile
+import hashlib
+import io
+import os
+
+# internal modules:
+from yotta.lib import access_common
+from yotta.lib import cache_index
+from yotta.lib import fsutils
+from yotta.lib.fsutils import rmRf, mkDirP
+
+class FakeStream(object):
+    def __init__(self, path):
+        self.path = path
+
+    def iter_content(self, chunk_size):
+        with open(self.path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+class TestExtractedCache(unittest.TestCase):
+    def setUp(self):
+        self.restore_settings_dir = os.environ.get('YOTTA_USER_SETTINGS_DIR', None)
+        self.test_dir = tempfile.mkdtemp()
+        os.environ['YOTTA_USER_SETTINGS_DIR'] = os.path.join(self.test_dir, 'settings')
+        access_common._extracted_cache_links = 'reflink'
+        module_dir = os.path.join(self.test_dir, 'src', 'testmod')
+        mkDirP(os.path.join(module_dir, 'source'))
+        with open(os.path.join(module_dir, 'module.json'), 'w') as f:
+            f.write('{"name": "testmod"}')
+        with open(os.path.join(module_dir, 'source', 'a.c'), 'w') as f:
+            f.write('int a;')
+        self.tarball = os.path.join(self.test_dir, 'testmod.tar.gz')
+        with tarfile.open(self.tarball, 'w:gz') as tf:
+            tf.add(module_dir, 'testmod')
+
+    def tearDown(self):
+        if self.restore_settings_dir is None:
+            del os.environ['YOTTA_USER_SETTINGS_DIR']
+        else:
+            os.environ['YOTTA_USER_SETTINGS_DIR'] = self.restore_settings_dir
+        access_common._extracted_cache_links = None
+        rmRf(self.test_dir)
+
+    def extractedPath(self, cache_key):
+        return os.path.join(access_common.extractedCacheDirectory(), cache_key)
+
+    def test_storeAndMaterialise(self):
+        out1 = os.path.join(self.test_dir, 'out1')
+        access_common.unpackTarballStream(FakeStream(self.tarball), out1, cache_key='testkey')
+        self.assertTrue(os.path.isfile(os.path.join(self.extractedPath('testkey'), 'source', 'a.c')))
+        # the extracted tree must be used even if the tarball is unreadable:
+        out2 = os.path.join(self.test_dir, 'out2')
+        with open(os.path.join(access_common.folders.cacheDirectory(), 'testkey'), 'wb') as f:
+            f.write(b'not a tarball')
+        access_common.unpackFromCache('testkey', out2)
+        with open(os.path.join(out2, 'source', 'a.c')) as f:
+            self.assertEqual(f.read(), 'int a;')
+        self.assertTrue(os.path.isfile(os.path.join(out2, '.yotta_origin.json')))
+        # but not stored in the extracted tree:
+        self.assertFalse(os.path.exists(os.path.join(self.extractedPath('testkey'), '.yotta_origin.json')))
+
+    def test_extractedSizeIndexed(self):
+        out = os.path.join(self.test_dir, 'out')
+        access_common.unpackTarballStream(FakeStream(self.tarball), out, cache_key='testkey')
+        # the extracted tree counts towards the size limit of the cache:
+        self.assertEqual(
+            cache_index.get('testkey')['size'],
+            os.path.getsize(self.tarball) + fsutils.treeSize(self.extractedPath('testkey'))
+        )
+        self.assertEqual(
+            cache_index.evictionCandidates(max_bytes=os.path.getsize(self.tarball)),
+            ['testkey']
+        )
+
+    def test_removeFromCache(self):
+        out = os.path.join(self.test_dir, 'out')
+        access_common.unpackTarballStream(FakeStream(self.tarball), out, cache_key='testkey')
+        access_common.removeFromCache('testkey')
+        self.assertFalse(os.path.exists(self.extractedPath('testkey')))
+        self.assertRaises(access_common.NotInCache, access_common.unpackFromCache, 'testkey', out)
+
+    def test_noKeyNotStored(self):
+        out = os.path.join(self.test_dir, 'out')
+        access_common.unpackTarballStream(FakeStream(self.tarball), out)
+        self.assertTrue(os.path.isfile(os.path.join(out, 'source', 'a.c')))
+        extracted_dir = access_common.extractedCacheDirectory()
+        self.assertFalse(os.path.isdir(extracted_dir) and os.listdir(extracted_dir))
+
+    def test_off(self):
+        access_common._extracted_cache_links = 'off'
+        out = os.path.join(self.test_dir, 'out')
+        access_common.unpackTarballStream(FakeStream(self.tarball), out, cache_key='testkey')
+        self.assertTrue(os.path.isfile(os.path.join(out, 'module.json')))
+        self.assertFalse(os.path.exists(self.extractedPath('testkey')))
+
+    def test_hashVerifiedBeforeCommit(self):
+        out = os.path.join(self.test_dir, 'out')
+        mkDirP(out)
+        with open(os.path.join(out, 'existing'), 'w') as f:
+            f.write('existing')
+        self.assertRaises(
+            Exception, access_common.unpackTarballStream,
+            FakeStream(self.tarball), out, hash={'sha256':'0'*64}, cache_key='testkey'
+        )
+        self.assertEqual(os.listdir(out), ['existing'])
+        self.assertFalse(access_common.isInCache('testkey'))
+        self.assertFalse(os.path.exists(self.extractedPath('testkey')))
+        self.assertEqual(sorted(os.listdir(self.test_dir)), ['out', 'settings', 'src', 'testmod.tar.gz'])
+        cache_dir = access_common.folders.cacheDirectory()
+        self.assertEqual([f for f in os.listdir(cache_dir) if f.endswith('.locked')], [])
+
+    def test_linksOutsideModuleRejected(self):
+        outside = os.path.join(self.test_dir, 'outside')
+        mkDirP(outside)
+        evil_tarball = os.path.join(self.test_dir, 'evil.tar.gz')
+        with tarfile.open(evil_tarball, 'w:gz') as tf:
+            top = tarfile.TarInfo('evil')
+            top.type = tarfile.DIRTYPE
+            tf.addfile(top)
+            link = tarfile.TarInfo('evil/link')
+            link.type = tarfile.SYMTYPE
+            link.linkname = outside
+            tf.addfile(link)
+            content = b'pwned'
+            f = tarfile.TarInfo('evil/link/pwned')
+            f.size = len(content)
+            tf.addfile(f, io.BytesIO(content))
+        out = os.path.join(self.test_dir, 'out')
+        self.assertRaises(
+            Exception, access_common.unpackTarballStream,
+            FakeStream(evil_tarball), out, hash={'sha256':'0'*64}, cache_key='testkey'
+        )
+        self.assertEqual(os.listdir(outside), [])
+        self.assertFalse(os.path.exists(out))
+
+    def test_streamCached(self):
+        with open(self.tarball, 'rb') as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        out = os.path.join(self.test_dir, 'out')
+        access_common.unpackTarballStream(
+            FakeStream(self.tarball), out, hash={'sha256':sha256}, cache_key=sha256
+        )
+        self.assertTrue(os.path.isfile(os.path.join(out, '.yotta_origin.json')))
+        cached_path = os.path.join(access_common.folders.cacheDirectory(), sha256)
+        with open(cached_path, 'rb') as f:
+            self.assertEqual(hashlib.sha256(f.read()).hexdigest(), sha256)
+
+if __name__ == '__main__':
+    unittest.main()
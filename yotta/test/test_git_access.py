@@ -8,6 +8,8 @@
 # standard library modules, , ,
 import unittest
 import subprocess
+import tempfile
+import os
 from collections import namedtuple
 
 # git_access, , access to components available from git repositories, internal
@@ -20,6 +22,9 @@ from yotta.lib import version
 from yotta.lib import sourceparse
 # install, , install components, internal
 from yotta import install
+# vcs, , represent version controlled directories, internal
+from yotta.lib import vcs
+from yotta.test.cli import util
 
 
 Test_Name = 'testing-dummy'
@@ -72,6 +77,53 @@ class TestGitAccess(unittest.TestCase):
         Args = namedtuple('Args', ['component', 'target', 'act_globally', 'install_linked', 'install_test_deps', 'config'])
         install.installComponent(Args(Test_Deps_Name, Test_Deps_Target, False, False, 'own', {}))
 
+class TestGitMirror(unittest.TestCase):
+    def setUp(self):
+        util.setupGitUser()
+        self.restore_settings_dir = os.environ.get('YOTTA_USER_SETTINGS_DIR', None)
+        self.settings_dir = tempfile.mkdtemp()
+        os.environ['YOTTA_USER_SETTINGS_DIR'] = self.settings_dir
+        self.remote = util.writeTestFiles({'module.json': '{}'})
+        self.git('init', '-q')
+        self.git('add', 'module.json')
+        self.git('commit', '-q', '-m', 'initial')
+        self.git('tag', 'v0.0.1')
+        self.unpacked = tempfile.mkdtemp()
+
+    def tearDown(self):
+        if self.restore_settings_dir is None:
+            del os.environ['YOTTA_USER_SETTINGS_DIR']
+        else:
+            os.environ['YOTTA_USER_SETTINGS_DIR'] = self.restore_settings_dir
+        for d in (self.settings_dir, self.remote, self.unpacked):
+            fsutils.rmRf(d)
+
+    def git(self, *args):
+        vcs.Git._execCommands([['git', '-C', self.remote] + list(args)])
+
+    def test_mirror(self):
+        remote_component = git_access.GitComponent(self.remote)
+        working_copy = remote_component.clone()
+        self.assertEqual(working_copy.directory, vcs.mirrorDirectory('git', self.remote))
+        versions = working_copy.availableVersions()
+        self.assertEqual(versions, [version.Version('0.0.1')])
+
+        versions[0].unpackInto(self.unpacked)
+        self.assertTrue(os.path.isfile(os.path.join(self.unpacked, 'module.json')))
+        # the unpacked copy refers to the original remote, not the mirror
+        out, err = vcs.Git._execCommands([['git', '-C', self.unpacked, 'remote', 'get-url', 'origin']])
+        self.assertEqual(out.decode('utf-8').strip(), self.remote)
+        # and the mirror is kept:
+        self.assertTrue(os.path.isdir(working_copy.vcs.workingDirectory()))
+
+        # next time the mirror is updated, rather than cloned again
+        self.git('tag', 'v0.0.2')
+        vcs._Updated_Mirrors.clear()
+        self.assertEqual(
+            sorted(remote_component.clone().availableVersions()),
+            [version.Version('0.0.1'), version.Version('0.0.2')]
+        )
+
 
 if __name__ == '__main__':
     unittest.main()
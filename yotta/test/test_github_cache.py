@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import tempfile
+import time
+import os
+
+# internal modules:
+from yotta.lib import github_access
+from yotta.lib import metadata_cache
+from yotta.lib import sessions
+from yotta.lib import globalconf
+from yotta.lib.fsutils import rmRf
+from yotta.test import test_metadata_cache
+from yotta.test.test_metadata_cache import FakeSession
+
+globalconf.set('interactive', False)
+
+Tags_JSON = '''[{
+    "name": "v0.0.1",
+    "tarball_url": "https://api.github.com/repos/yottatest/testing-dummy/tarball/v0.0.1"
+}]'''
+
+class FakeResponse(test_metadata_cache.FakeResponse):
+    def raise_for_status(self):
+        assert(self.status_code < 400)
+
+def rateLimitHeaders(remaining, etag=None):
+    r = {'X-RateLimit-Remaining': str(remaining), 'X-RateLimit-Reset': str(time.time() + 3600)}
+    if etag:
+        r['ETag'] = etag
+    return r
+
+class TestGithubCache(unittest.TestCase):
+    def setUp(self):
+        self.restore_settings_dir = os.environ.get('YOTTA_USER_SETTINGS_DIR', None)
+        self.test_dir = tempfile.mkdtemp()
+        os.environ['YOTTA_USER_SETTINGS_DIR'] = self.test_dir
+        metadata_cache._max_age = 0
+        self.restore_session = sessions._sessions.get(github_access._github_url, None)
+
+    def tearDown(self):
+        if self.restore_settings_dir is None:
+            del os.environ['YOTTA_USER_SETTINGS_DIR']
+        else:
+            os.environ['YOTTA_USER_SETTINGS_DIR'] = self.restore_settings_dir
+        metadata_cache._max_age = None
+        github_access._revalidated.clear()
+        github_access._rate_limit.update({'remaining': None, 'reset': None})
+        if self.restore_session is None:
+            sessions._sessions.pop(github_access._github_url, None)
+        else:
+            sessions._sessions[github_access._github_url] = self.restore_session
+        rmRf(self.test_dir)
+
+    def useResponses(self, responses):
+        session = FakeSession(responses)
+        sessions._sessions[github_access._github_url] = session
+        return session
+
+    def test_revalidatedOncePerProcess(self):
+        session = self.useResponses([
+            FakeResponse(200, Tags_JSON, rateLimitHeaders(59, '"abc"')),
+            FakeResponse(304)
+        ])
+        tags = github_access._getTags('yottatest/testing-dummy')
+        self.assertEqual(list(tags.keys()), ['v0.0.1'])
+        self.assertEqual(github_access._rate_limit['remaining'], 59)
+        # no more requests are made by this process:
+        self.assertEqual(github_access._getTags('yottatest/testing-dummy'), tags)
+        self.assertEqual(len(session.requests), 1)
+
+        # the next process revalidates with the ETag:
+        github_access._revalidated.clear()
+        self.assertEqual(github_access._getTags('yottatest/testing-dummy'), tags)
+        self.assertEqual(session.requests[1][1]['If-None-Match'], '"abc"')
+
+    def test_rateLimitExhausted(self):
+        session = self.useResponses([
+            FakeResponse(200, Tags_JSON, rateLimitHeaders(0, '"abc"')),
+        ])
+        tags = github_access._getTags('yottatest/testing-dummy')
+        github_access._revalidated.clear()
+        # the cached response is used without making a request at all
+        self.assertEqual(github_access._getTags('yottatest/testing-dummy'), tags)
+        self.assertEqual(len(session.requests), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,6 +12,7 @@ import os
 # internal modules:
 from yotta.lib.detect import systemDefaultTarget
 from yotta.lib import component
+from yotta.lib import ignores
 from yotta.test.cli import cli
 from yotta.test.cli import util
 
@@ -193,6 +194,32 @@ class TestPackIgnores(unittest.TestCase):
         self.assertEqual(statuscode, 0)
         return stdout or stderr
 
+class TestIgnoreMatcher(unittest.TestCase):
+    def test_patterns(self):
+        m = ignores.IgnoreMatcher(['/moo', 'b/*.c', '[!x]y', '*.sw[ponml]'])
+        self.assertTrue(m.ignores('moo'))
+        self.assertTrue(m.ignores('moo/a.c'))
+        self.assertFalse(m.ignores('a/moo'))
+        self.assertTrue(m.ignores('a/b/test.c'))
+        self.assertFalse(m.ignores('a/b/c/test.c'))
+        self.assertFalse(m.ignores('b/c.h'))
+        self.assertTrue(m.ignores('a/zy/c.h'))
+        self.assertFalse(m.ignores('a/xy/c.h'))
+        self.assertTrue(m.ignores('path/to/.test.c.swp'))
+
+    def test_wildcards_within_parts(self):
+        m = ignores.IgnoreMatcher(['a*c', 'a?c', 'a[!b]c'])
+        self.assertFalse(m.ignores('ab/c'))
+        self.assertFalse(m.ignores('a/c'))
+        self.assertTrue(m.ignores('abbc'))
+
+    def test_directories_remembered(self):
+        m = ignores.IgnoreMatcher(['/a/b'])
+        self.assertTrue(m.ignores('a/b/c/d.c'))
+        self.assertTrue(m.ignored_dirs[('a', 'b', 'c')])
+        self.assertFalse(m.ignores('a/c/d.c'))
+        self.assertFalse(m.ignored_dirs[('a', 'c')])
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import tempfile
+import os
+
+# internal modules:
+from yotta.lib import metadata_cache
+from yotta.lib import access_common
+from yotta.lib import globalconf
+from yotta.lib.fsutils import rmRf
+
+class FakeResponse(object):
+    def __init__(self, status_code, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+class FakeSession(object):
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append((url, headers))
+        return self.responses.pop(0)
+
+class TestMetadataCache(unittest.TestCase):
+    def setUp(self):
+        self.restore_settings_dir = os.environ.get('YOTTA_USER_SETTINGS_DIR', None)
+        self.test_dir = tempfile.mkdtemp()
+        os.environ['YOTTA_USER_SETTINGS_DIR'] = self.test_dir
+        metadata_cache._max_age = 0
+
+    def tearDown(self):
+        if self.restore_settings_dir is None:
+            del os.environ['YOTTA_USER_SETTINGS_DIR']
+        else:
+            os.environ['YOTTA_USER_SETTINGS_DIR'] = self.restore_settings_dir
+        metadata_cache._max_age = None
+        rmRf(self.test_dir)
+
+    def test_revalidate(self):
+        session = FakeSession([
+            FakeResponse(200, '["v1"]', {'ETag': '"abc"'}),
+            FakeResponse(304)
+        ])
+        r = metadata_cache.cachedGet(session, 'http://example.com/versions')
+        self.assertEqual(r.text, '["v1"]')
+        self.assertFalse(session.requests[0][1])
+        r = metadata_cache.cachedGet(session, 'http://example.com/versions')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.text, '["v1"]')
+        self.assertEqual(session.requests[1][1]['If-None-Match'], '"abc"')
+
+    def test_modified(self):
+        session = FakeSession([
+            FakeResponse(200, '["v1"]', {'Last-Modified': 'Sat, 01 Oct 2016 00:00:00 GMT'}),
+            FakeResponse(200, '["v1", "v2"]')
+        ])
+        metadata_cache.cachedGet(session, 'http://example.com/versions')
+        r = metadata_cache.cachedGet(session, 'http://example.com/versions')
+        self.assertEqual(session.requests[1][1]['If-Modified-Since'], 'Sat, 01 Oct 2016 00:00:00 GMT')
+        self.assertEqual(r.text, '["v1", "v2"]')
+        self.assertEqual(metadata_cache.get('http://example.com/versions')['content'], '["v1", "v2"]')
+
+    def test_maxAge(self):
+        metadata_cache._max_age = 3600
+        session = FakeSession([FakeResponse(200, '[]')])
+        metadata_cache.cachedGet(session, 'http://example.com/versions')
+        r = metadata_cache.cachedGet(session, 'http://example.com/versions')
+        self.assertEqual(r.text, '[]')
+        self.assertEqual(len(session.requests), 1)
+
+    def test_notCached(self):
+        session = FakeSession([FakeResponse(404), FakeResponse(404)])
+        r = metadata_cache.cachedGet(session, 'http://example.com/versions')
+        self.assertEqual(r.status_code, 404)
+        self.assertEqual(metadata_cache.get('http://example.com/versions'), None)
+
+    def test_offline(self):
+        session = FakeSession([FakeResponse(200, '[]', {'ETag': '"abc"'})])
+        metadata_cache.cachedGet(session, 'http://example.com/versions')
+        globalconf.set('offline', True)
+        try:
+            # cached entries are used without revalidating them...
+            r = metadata_cache.cachedGet(session, 'http://example.com/versions')
+            self.assertEqual(r.text, '[]')
+            self.assertEqual(len(session.requests), 1)
+            # ...and anything else is unavailable
+            with self.assertRaises(access_common.Offline):
+                metadata_cache.cachedGet(session, 'http://example.com/other')
+        finally:
+            globalconf.set('offline', False)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import logging
+import tempfile
+import os
+
+# requests, apache2
+import requests
+
+# internal modules:
+from yotta.lib import registry_access
+from yotta.lib import metadata_cache
+from yotta.lib import sessions
+from yotta.lib import globalconf
+from yotta.lib.fsutils import rmRf
+from yotta.test import test_metadata_cache
+from yotta.test.test_metadata_cache import FakeSession
+
+globalconf.set('interactive', False)
+
+Private_Registry_URL = 'https://registry.example.com'
+
+class FakeResponse(test_metadata_cache.FakeResponse):
+    def raise_for_status(self):
+        assert(self.status_code < 400)
+
+class FailingSession(object):
+    def __init__(self, error):
+        self.error = error
+
+    def get(self, url, headers=None, **kwargs):
+        raise self.error
+
+class RecordWarnings(logging.Handler):
+    def __init__(self):
+        super(RecordWarnings, self).__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+def versionsJSON(*versions):
+    return '[%s]' % ', '.join('{"version": "%s"}' % v for v in versions)
+
+class TestRegistryListing(unittest.TestCase):
+    def setUp(self):
+        self.restore_settings_dir = os.environ.get('YOTTA_USER_SETTINGS_DIR', None)
+        self.test_dir = tempfile.mkdtemp()
+        os.environ['YOTTA_USER_SETTINGS_DIR'] = self.test_dir
+        metadata_cache._max_age = 0
+        globalconf.set('offline', False)
+        self.restore_getSources = registry_access._getSources
+        self.restore_headersForRegistry = registry_access._headersForRegistry
+        registry_access._getSources = lambda: [{'type': 'registry', 'url': Private_Registry_URL}]
+        registry_access._headersForRegistry = lambda registry: {}
+        self.registries = (Private_Registry_URL, registry_access.Registry_Base_URL)
+        self.restore_sessions = dict(
+            (r, sessions._sessions[r]) for r in self.registries if r in sessions._sessions
+        )
+        self.warnings = RecordWarnings()
+        registry_access.logger.addHandler(self.warnings)
+
+    def tearDown(self):
+        registry_access.logger.removeHandler(self.warnings)
+        for r in self.registries:
+            if r in self.restore_sessions:
+                sessions._sessions[r] = self.restore_sessions[r]
+            else:
+                sessions._sessions.pop(r, None)
+        registry_access._getSources = self.restore_getSources
+        registry_access._headersForRegistry = self.restore_headersForRegistry
+        metadata_cache._max_age = None
+        if self.restore_settings_dir is None:
+            del os.environ['YOTTA_USER_SETTINGS_DIR']
+        else:
+            os.environ['YOTTA_USER_SETTINGS_DIR'] = self.restore_settings_dir
+        rmRf(self.test_dir)
+
+    def test_firstRegistryWins(self):
+        sessions._sessions[Private_Registry_URL] = FakeSession([FakeResponse(200, versionsJSON('1.0.0'))])
+        sessions._sessions[registry_access.Registry_Base_URL] = FakeSession(
+            [FakeResponse(200, versionsJSON('1.0.0', '1.1.0'))]
+        )
+        versions = registry_access._listVersions('module', 'dummy')
+        self.assertEqual(sorted(str(v.version) for v in versions), ['1.0.0', '1.1.0'])
+        by_version = dict((str(v.version), v) for v in versions)
+        self.assertTrue(by_version['1.0.0'].url.startswith(Private_Registry_URL))
+        self.assertTrue(by_version['1.1.0'].url.startswith(registry_access.Registry_Base_URL))
+        self.assertEqual(self.warnings.messages, [])
+
+    def test_partialFailureWarns(self):
+        sessions._sessions[Private_Registry_URL] = FailingSession(requests.exceptions.TooManyRedirects('redirect loop'))
+        sessions._sessions[registry_access.Registry_Base_URL] = FakeSession(
+            [FakeResponse(200, versionsJSON('1.0.0'))]
+        )
+        versions = registry_access._listVersions('module', 'dummy')
+        self.assertEqual([str(v.version) for v in versions], ['1.0.0'])
+        self.assertEqual(len(self.warnings.messages), 1)
+        self.assertIn('redirect loop', self.warnings.messages[0])
+
+    def test_allRegistriesFailing(self):
+        first_error = requests.exceptions.TooManyRedirects('first')
+        sessions._sessions[Private_Registry_URL] = FailingSession(first_error)
+        sessions._sessions[registry_access.Registry_Base_URL] = FailingSession(
+            requests.exceptions.TooManyRedirects('second')
+        )
+        with self.assertRaises(requests.exceptions.TooManyRedirects) as context:
+            registry_access._listVersions('module', 'dummy')
+        self.assertIs(context.exception, first_error)
+
+
+if __name__ == '__main__':
+    unittest.main()
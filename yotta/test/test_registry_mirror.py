@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import tempfile
+import threading
+import hashlib
+import tarfile
+import io
+import os
+
+# requests, apache2
+import requests
+
+# internal modules:
+from yotta.lib import registry_mirror
+from yotta.lib import metadata_cache
+from yotta.lib import access_common
+from yotta.lib import cache_index
+from yotta.lib import globalconf
+from yotta.lib.fsutils import rmRf
+
+def makeTarball():
+    f = io.BytesIO()
+    with tarfile.open(fileobj=f, mode='w:gz') as tf:
+        content = b'{"name": "test-mirrored", "version": "1.0.0", "license": "Apache-2.0"}'
+        info = tarfile.TarInfo('test-mirrored/module.json')
+        info.size = len(content)
+        tf.addfile(info, io.BytesIO(content))
+    return f.getvalue()
+
+Tarball = makeTarball()
+Versions = (
+    '[{"version": "1.0.0", "hash": {"sha256": "%s"}}]' % hashlib.sha256(Tarball).hexdigest()
+).encode('utf-8')
+
+class FakeUpstream(registry_mirror.MirrorServer):
+    ''' An upstream registry that serves a single module, and counts the
+        requests made to it. '''
+    def __init__(self):
+        registry_mirror.MirrorServer.__init__(self, self)
+        self.requests = []
+
+    def handle(self, path, query_string):
+        self.requests.append(path)
+        if path == '/modules/test-mirrored/versions':
+            return ('application/json', Versions.decode('utf-8'))
+        if path == '/modules/test-mirrored/versions/1.0.0/tarball':
+            f = tempfile.TemporaryFile()
+            f.write(Tarball)
+            f.seek(0)
+            return ('application/x-gzip', f)
+        raise registry_mirror.MirrorError(404, 'not found')
+
+def serve(server):
+    t = threading.Thread(target=server.serve_forever)
+    t.daemon = True
+    t.start()
+    return server
+
+class TestRegistryMirror(unittest.TestCase):
+    def setUp(self):
+        self.restore_settings_dir = os.environ.get('YOTTA_USER_SETTINGS_DIR', None)
+        self.test_dir = tempfile.mkdtemp()
+        os.environ['YOTTA_USER_SETTINGS_DIR'] = self.test_dir
+        metadata_cache._max_age = 0
+        self.upstream = serve(FakeUpstream())
+        self.mirror = serve(registry_mirror.MirrorServer(registry_mirror.RegistryMirror(self.upstream.url())))
+
+    def tearDown(self):
+        for server in (self.mirror, self.upstream):
+            server.shutdown()
+            server.server_close()
+        if self.restore_settings_dir is None:
+            del os.environ['YOTTA_USER_SETTINGS_DIR']
+        else:
+            os.environ['YOTTA_USER_SETTINGS_DIR'] = self.restore_settings_dir
+        metadata_cache._max_age = None
+        globalconf.set('offline', False)
+        rmRf(self.test_dir)
+
+    def test_pullThrough(self):
+        r = requests.get(self.mirror.url() + '/modules/test-mirrored/versions')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.content, Versions)
+        for i in range(2):
+            r = requests.get(self.mirror.url() + '/modules/test-mirrored/versions/1.0.0/tarball')
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual(r.content, Tarball)
+        # the tarball was only downloaded once, and is in the download cache:
+        self.assertEqual(self.upstream.requests.count('/modules/test-mirrored/versions/1.0.0/tarball'), 1)
+        self.assertTrue(access_common.isInCache(hashlib.sha256(Tarball).hexdigest()))
+
+        r = requests.get(self.mirror.url() + '/modules/test-missing/versions')
+        self.assertEqual(r.status_code, 404)
+
+    def test_servedTarballsUsed(self):
+        sha256 = hashlib.sha256(Tarball).hexdigest()
+        url = self.mirror.url() + '/modules/test-mirrored/versions/1.0.0/tarball'
+        requests.get(url)
+        hits = cache_index.get(sha256)['hits']
+        requests.get(url)
+        # each time a tarball is served it counts as a use:
+        self.assertEqual(cache_index.get(sha256)['hits'], hits + 1)
+
+    def test_evictedWhileServing(self):
+        sha256 = hashlib.sha256(Tarball).hexdigest()
+        url = self.mirror.url() + '/modules/test-mirrored/versions/1.0.0/tarball'
+        requests.get(url)
+        # the tarball is evicted (by another process) after it has been found
+        # in the cache, but before it is opened:
+        def evictingOpen(path, mode):
+            del registry_mirror.open
+            access_common.removeFromCache(sha256)
+            return open(path, mode)
+        registry_mirror.open = evictingOpen
+        try:
+            r = requests.get(url)
+        finally:
+            if 'open' in vars(registry_mirror):
+                del registry_mirror.open
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.content, Tarball)
+        self.assertEqual(self.upstream.requests.count('/modules/test-mirrored/versions/1.0.0/tarball'), 2)
+
+    def test_offline(self):
+        requests.get(self.mirror.url() + '/modules/test-mirrored/versions/1.0.0/tarball')
+        upstream_requests = len(self.upstream.requests)
+        globalconf.set('offline', True)
+        # cached things are still served...
+        r = requests.get(self.mirror.url() + '/modules/test-mirrored/versions/1.0.0/tarball')
+        self.assertEqual(r.content, Tarball)
+        # ...and everything else is not found
+        r = requests.get(self.mirror.url() + '/targets/test-mirrored/versions')
+        self.assertEqual(r.status_code, 404)
+        self.assertEqual(len(self.upstream.requests), upstream_requests)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import os
+
+# internal modules:
+from yotta.lib import component
+from yotta.lib import resolved_graph
+from yotta.test.cli import util
+
+Test_Files = {
+    'module.json': '''{
+  "name": "test-top",
+  "version": "1.0.0",
+  "license": "Apache-2.0",
+  "dependencies": {
+    "test-dep": "^1.0.0"
+  },
+  "testDependencies": {
+    "test-missing": "*"
+  }
+}''',
+    'yotta_modules/test-dep/module.json': '''{
+  "name": "test-dep",
+  "version": "1.0.0",
+  "license": "Apache-2.0"
+}'''
+}
+
+class FakeTarget(object):
+    def getName(self):
+        return 'fake-target'
+    def getMergedConfig(self):
+        return {}
+    def getSimilarTo_Deprecated(self):
+        return ['fake-target']
+    def getConfigValue(self, *args):
+        return None
+
+class TestResolvedGraph(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = util.writeTestFiles(Test_Files)
+        self.target = FakeTarget()
+
+    def tearDown(self):
+        util.rmRf(self.test_dir)
+
+    def getDependencies(self):
+        c = component.Component(self.test_dir)
+        return c, c.getDependenciesRecursive(
+                          target = self.target,
+            available_components = [(c.getName(), c)],
+                            test = True
+        )
+
+    def summary(self, deps):
+        return [(k, bool(v), v.isTestDependency(), v.path) for k, v in deps.items()]
+
+    def test_savedAndLoaded(self):
+        c, resolved = self.getDependencies()
+        self.assertTrue(os.path.isfile(os.path.join(
+            self.test_dir, 'build', 'fake-target', resolved_graph.Resolved_Graph_Fname
+        )))
+        loaded = resolved_graph.load(c, self.target, True)
+        self.assertEqual(self.summary(loaded), self.summary(resolved))
+        self.assertEqual(list(loaded.keys()), ['test-dep', 'test-missing'])
+        self.assertFalse(loaded['test-missing'])
+
+    def test_invalidatedByInstall(self):
+        c, resolved = self.getDependencies()
+        util.writeTestFiles({
+            'yotta_modules/test-missing/module.json': '''{
+  "name": "test-missing",
+  "version": "1.0.0",
+  "license": "Apache-2.0"
+}'''}, test_dir=self.test_dir)
+        self.assertEqual(resolved_graph.load(c, self.target, True), None)
+        c, resolved = self.getDependencies()
+        self.assertTrue(resolved['test-missing'])
+
+    def test_differentTestMode(self):
+        c, resolved = self.getDependencies()
+        self.assertEqual(resolved_graph.load(c, self.target, False), None)
+
+if __name__ == '__main__':
+    unittest.main()
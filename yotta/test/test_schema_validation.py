@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import tempfile
+import os
+
+# internal modules:
+from yotta.lib import schema_validation
+from yotta.lib import component
+from yotta.lib import ordered_json
+from yotta.lib.fsutils import rmRf
+
+Invalid_Description = '''{
+  "name": "test-module",
+  "version": "1.0.0",
+  "license": "Apache-2.0",
+  "keywords": "not a list"
+}'''
+
+class TestSchemaValidation(unittest.TestCase):
+    def setUp(self):
+        self.restore_settings_dir = os.environ.get('YOTTA_USER_SETTINGS_DIR', None)
+        self.test_dir = tempfile.mkdtemp()
+        os.environ['YOTTA_USER_SETTINGS_DIR'] = self.test_dir
+
+    def tearDown(self):
+        if self.restore_settings_dir is None:
+            del os.environ['YOTTA_USER_SETTINGS_DIR']
+        else:
+            os.environ['YOTTA_USER_SETTINGS_DIR'] = self.restore_settings_dir
+        rmRf(self.test_dir)
+
+    def test_validatorCompiledOnce(self):
+        self.assertIs(
+            schema_validation.validator(component.Schema_File),
+            schema_validation.validator(component.Schema_File)
+        )
+
+    def test_errors(self):
+        errors = schema_validation.validationErrors(
+            ordered_json.loads(Invalid_Description), component.Schema_File
+        )
+        self.assertEqual([e[0] for e in errors], ['keywords'])
+
+    def test_resultsCached(self):
+        errors = schema_validation.validationErrors(
+            ordered_json.loads(Invalid_Description), component.Schema_File, Invalid_Description
+        )
+        self.assertEqual(len(os.listdir(schema_validation.cacheDirectory())), 1)
+        # the result for the same text is read from the cache, without
+        # validating the document at all:
+        self.assertEqual(
+            schema_validation.validationErrors(None, component.Schema_File, Invalid_Description),
+            errors
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import os
+
+# internal modules:
+from yotta.lib import solver
+from yotta.lib import version
+from yotta.lib import access_common
+from yotta.lib import component
+from yotta.lib import fsutils
+from yotta.test.cli import util
+
+class FakeSource(object):
+    ''' {name: {version: {dependency name: spec}}} '''
+    def __init__(self, modules):
+        self.modules = modules
+        self.listed = []
+
+    def versions(self, name):
+        self.listed.append(name)
+        if name not in self.modules:
+            raise access_common.Unavailable('%s does not exist' % name)
+        return [
+            solver.Candidate(version.Version(v)) for v in
+            sorted(self.modules[name], key=version.Version, reverse=True)
+        ]
+
+    def dependencies(self, name, candidate):
+        return [
+            (n, version.Spec(s), s) for n, s in self.modules[name][str(candidate.version)].items()
+        ]
+
+def solve(modules):
+    source = FakeSource(modules)
+    s = solver.Solver('root', solver.Candidate(version.Version('1.0.0')), source)
+    return dict((k, str(v)) for k, v in s.solve().items()), source
+
+Installed_Files = {
+    'module.json': '''{
+  "name": "test-top",
+  "version": "1.0.0",
+  "license": "Apache-2.0",
+  "dependencies": {
+    "test-a": "^1.0.0",
+    "test-b": "^1.0.0",
+    "test-git": "git://example.com/test-git.git"
+  }
+}''',
+    'yotta_modules/test-a/module.json': '''{
+  "name": "test-a",
+  "version": "1.2.0",
+  "license": "Apache-2.0",
+  "dependencies": {
+    "test-b": "~1.1.0"
+  }
+}''',
+    'yotta_modules/test-b/module.json': '''{
+  "name": "test-b",
+  "version": "1.1.3",
+  "license": "Apache-2.0"
+}'''
+}
+
+class TestSolver(unittest.TestCase):
+    def test_newestVersions(self):
+        solution, source = solve({
+            'root': {'1.0.0': {'a': '^1.0.0'}},
+            'a': {'1.0.0': {}, '1.1.0': {'b': '*'}, '2.0.0': {}},
+            'b': {'0.1.0': {}, '0.2.0': {}}
+        })
+        self.assertEqual(solution, {'root': '1.0.0', 'a': '1.1.0', 'b': '0.2.0'})
+
+    def test_sharedDependency(self):
+        # neither the newest version allowed by a, nor by b can be used
+        solution, source = solve({
+            'root': {'1.0.0': {'a': '^1.0.0', 'b': '^1.0.0'}},
+            'a': {'1.0.0': {'shared': '>=2.0.0,<4.0.0'}},
+            'b': {'1.0.0': {'shared': '>=3.0.0,<5.0.0'}},
+            'shared': {'2.0.0': {}, '3.0.0': {}, '3.6.9': {}, '4.0.0': {}, '5.0.0': {}}
+        })
+        self.assertEqual(solution['shared'], '3.6.9')
+
+    def test_backtracking(self):
+        # the newest foo requires an older version of target than root does,
+        # so foo must be downgraded
+        solution, source = solve({
+            'root': {'1.0.0': {'foo': '^1.0.0', 'target': '^2.0.0'}},
+            'foo': {'1.0.0': {}, '1.1.0': {'left': '^1.0.0', 'right': '^1.0.0'}},
+            'left': {'1.0.0': {'shared': '>=1.0.0'}},
+            'right': {'1.0.0': {'shared': '<2.0.0'}},
+            'shared': {'2.0.0': {}, '1.0.0': {'target': '^1.0.0'}},
+            'target': {'2.0.0': {}, '1.0.0': {}}
+        })
+        self.assertEqual(solution, {'root': '1.0.0', 'foo': '1.0.0', 'target': '2.0.0'})
+
+    def test_conflictExplanation(self):
+        with self.assertRaises(solver.SolveFailure) as cm:
+            solve({
+                'root': {'1.0.0': {'foo': '^1.0.0', 'bar': '^1.0.0'}},
+                'foo': {'1.0.0': {'baz': '^1.0.0'}},
+                'bar': {'1.0.0': {'baz': '^2.0.0'}},
+                'baz': {'1.0.0': {}, '2.0.0': {}, '3.0.0': {}}
+            })
+        explanation = str(cm.exception)
+        self.assertIn('foo@1.0.0 depends on baz ^1.0.0', explanation)
+        self.assertIn('bar@1.0.0 depends on baz ^2.0.0', explanation)
+        self.assertIn('the dependencies of root cannot be satisfied', explanation)
+        # baz@3.0.0 has nothing to do with the conflict
+        self.assertNotIn('3.0.0', explanation)
+
+    def test_unavailableExplanation(self):
+        with self.assertRaises(solver.SolveFailure) as cm:
+            solve({
+                'root': {'1.0.0': {'foo': '^1.0.0'}},
+                'foo': {'1.0.0': {'missing': '*'}}
+            })
+        self.assertIn('missing is not available (missing does not exist)', str(cm.exception))
+
+    def test_onlyListsRequiredModules(self):
+        solution, source = solve({
+            'root': {'1.0.0': {'foo': '^1.0.0'}},
+            'foo': {'1.0.0': {}, '2.0.0': {'unused': '*'}},
+            'unused': {'1.0.0': {}}
+        })
+        self.assertEqual(source.listed, ['foo'])
+
+    def test_installedModulesOnly(self):
+        # when the installed modules meet all the requirements the solution
+        # is found without listing any versions from the registry (the
+        # dependency on a git URL is left for installation to satisfy)
+        test_dir = util.writeTestFiles(Installed_Files)
+        try:
+            c = component.Component(test_dir)
+            solution = solver.solve(c, available_components=[(c.getName(), c)])
+            self.assertEqual(
+                [(k, str(v), v.component is not None) for k, v in solution.items()],
+                [('test-top', '1.0.0', True), ('test-b', '1.1.3', True), ('test-a', '1.2.0', True)]
+            )
+        finally:
+            util.rmRf(test_dir)
+
+    def test_linkedModuleMismatch(self):
+        # a linked module is used even if its version doesn't match the
+        # requirements on it
+        test_dir = util.writeTestFiles(Installed_Files)
+        linked_dir = util.writeTestFiles({
+            'module.json': '''{
+  "name": "test-a",
+  "version": "2.0.0",
+  "license": "Apache-2.0"
+}'''
+        })
+        try:
+            fsutils.rmRf(os.path.join(test_dir, 'yotta_modules', 'test-a'))
+            fsutils.symlink(linked_dir, os.path.join(test_dir, 'yotta_modules', 'test-a'))
+            c = component.Component(test_dir)
+            solution = solver.solve(c, available_components=[(c.getName(), c)])
+            self.assertEqual(str(solution['test-a']), '2.0.0')
+            self.assertTrue(solution['test-a'].component.installedLinked())
+        finally:
+            util.rmRf(test_dir)
+            util.rmRf(linked_dir)
+
+if __name__ == '__main__':
+    unittest.main()
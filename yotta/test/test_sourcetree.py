@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# Copyright 2016 ARM Limited
+#
+# Licensed under the Apache License, Version 2.0
+# See LICENSE file for details.
+
+
+# standard library modules, , ,
+import unittest
+import os
+
+# internal modules:
+from yotta.lib import component
+from yotta.lib import sourcetree
+from yotta.test.cli import util
+
+Test_Files = {
+    '.yotta_ignore': '''
+source/ignored
+*.bak
+''',
+    'module.json': '''
+{
+  "name": "test-sourcetree",
+  "version": "0.0.0",
+  "license": "Apache-2.0"
+}
+''',
+    'source/a.c': '',
+    'source/b.c.bak': '',
+    'source/sub/c.c': '',
+    'source/sub/d.cmake': '',
+    'source/ignored/e.c': '',
+    'test/f.c': ''
+}
+
+class TestSourceTreeIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.test_dir = util.writeTestFiles(Test_Files)
+
+    @classmethod
+    def tearDownClass(cls):
+        util.rmRf(cls.test_dir)
+
+    def setUp(self):
+        self.index = sourcetree.SourceTreeIndex(component.Component(self.test_dir))
+
+    def test_queries(self):
+        self.assertTrue(self.index.isFile('module.json'))
+        self.assertFalse(self.index.isFile('source'))
+        self.assertTrue(self.index.isDir('source/sub'))
+        self.assertTrue(self.index.exists('./source/sub/'))
+        self.assertFalse(self.index.exists('source/nonexistent/x'))
+        self.assertEqual(sorted(self.index.listDir('source')), ['a.c', 'b.c.bak', 'ignored', 'sub'])
+
+    def test_walk(self):
+        walked = [(relroot, sorted(files)) for root, relroot, files in self.index.walk('source')]
+        expected = []
+        for root, dirs, files in os.walk(os.path.join(self.test_dir, 'source')):
+            relroot = os.path.relpath(root, self.test_dir)
+            if relroot == os.path.join('source', 'ignored'):
+                continue
+            expected.append((relroot, sorted(f for f in files if not f.endswith('.bak'))))
+        self.assertEqual(walked, expected)
+
+    def test_listedOnce(self):
+        listed = []
+        original = sourcetree.listDirEntries
+        def countingListDirEntries(path):
+            listed.append(path)
+            return original(path)
+        sourcetree.listDirEntries = countingListDirEntries
+        try:
+            for i in range(3):
+                list(self.index.walk('source'))
+                self.index.isFile('source/sub/c.c')
+        finally:
+            sourcetree.listDirEntries = original
+        self.assertEqual(len(listed), len(set(listed)))
+
+if __name__ == '__main__':
+    unittest.main()
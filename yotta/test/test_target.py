@@ -6,6 +6,10 @@
 
 import unittest
 import logging
+import subprocess
+import signal
+import sys
+import os
 from collections import OrderedDict
 
 from yotta.lib import target
@@ -47,3 +51,33 @@ class ComponentTestCase(unittest.TestCase):
             ])
         )
 
+    @unittest.skipIf(os.name != 'posix', 'process groups are only used on posix')
+    def test_terminateGroupEscalates(self):
+        restore_grace_period = target._Kill_Grace_Period
+        target._Kill_Grace_Period = 0.2
+        try:
+            # a process that ignores SIGTERM:
+            child = subprocess.Popen([
+                    sys.executable, '-c',
+                    'import signal, sys, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); '+
+                    'print("ready"); sys.stdout.flush(); time.sleep(30)'
+                ], stdout=subprocess.PIPE, preexec_fn=target._newPGroup
+            )
+            child.stdout.readline()
+            self.assertFalse(target._waitWithTimeout([child], 0.1))
+            target._terminateGroup(child)
+            self.assertEqual(child.returncode, -signal.SIGKILL)
+            child.stdout.close()
+        finally:
+            target._Kill_Grace_Period = restore_grace_period
+
+    @unittest.skipIf(os.name != 'posix', 'privileges are only dropped on posix')
+    def test_testDropsRootPrivs(self):
+        # tests (and their filters) must never be run as root, so the test
+        # method runs in a separate process, which drops root privileges:
+        class RecordPid(object):
+            def getScript(self, scriptname):
+                raise Exception(os.getpid())
+        with self.assertRaises(Exception) as context:
+            target.DerivedTarget.__dict__['test'](RecordPid(), '.', '.', 'test', None, [])
+        self.assertNotEqual(str(context.exception), str(os.getpid()))
@@ -7,10 +7,19 @@
 
 # standard library modules, , ,
 import unittest
+import threading
+import time
+import sys
+import io
+import os
+import tempfile
+from xml.etree import ElementTree
 
 
 # module to test:
 from yotta import test_subcommand
+from yotta.lib.fsutils import rmRf
+from yotta.lib import ordered_json
 
 class TestTestSubcommandModule(unittest.TestCase):
     def test_moduleFromDirname(self):
@@ -20,6 +29,176 @@ class TestTestSubcommandModule(unittest.TestCase):
         self.assertTrue(test_subcommand.moduleFromDirname('ym/e/d', {'b':'b', 'c':'c'}, 'a') == 'a')
         self.assertTrue(test_subcommand.moduleFromDirname('ym/e/d', {'b':'b', 'c':'c', 'e':'e'}, 'a') == 'e')
 
+    def test_runTestsInParallel(self):
+        target = FakeTarget()
+        module = FakeModule()
+        tests = [(module, '.', 'test-%d' % i, 'test-%d' % i, None, None) for i in range(8)]
+        stdout = FakeStdout()
+        restore_stdout = sys.stdout
+        sys.stdout = stdout
+        try:
+            results = test_subcommand.runTests(target, tests, [], jobs=4)
+        finally:
+            sys.stdout = restore_stdout
+        outcomes = [result.outcome for result in results]
+        self.assertEqual(outcomes.count(test_subcommand.Test_Passed), 6)
+        self.assertEqual(outcomes.count(test_subcommand.Test_Failed), 2)
+        self.assertTrue(target.max_running > 1)
+        # the output of each test is replayed all at once:
+        lines = stdout.buffer.getvalue().decode('utf-8').split('\n')
+        for i in range(8):
+            start = lines.index('test-%d start' % i)
+            self.assertEqual(lines[start+1], 'test-%d end' % i)
+
+    def test_globalTimeout(self):
+        target = FakeTarget()
+        module = FakeModule()
+        tests = [
+            (module, '.', 'test-sleep', 'test-sleep', None, 30),
+            (module, '.', 'test-0', 'test-0', None, None)
+        ]
+        results = test_subcommand.runTests(target, tests, [], global_timeout=0.2)
+        self.assertEqual(
+            [(result.test[2], result.outcome) for result in results],
+            [('test-sleep', test_subcommand.Test_Timed_Out), ('test-0', test_subcommand.Test_Timed_Out)]
+        )
+        # the first test's own timeout is limited to what remains of the
+        # global timeout, and the second test is never started:
+        self.assertTrue(target.timeouts[0] <= 0.2)
+        self.assertEqual(len(target.timeouts), 1)
+
+    def test_resultCache(self):
+        builddir = tempfile.mkdtemp()
+        try:
+            for i in range(2):
+                with open(os.path.join(builddir, 'test-%d' % i), 'w') as f:
+                    f.write('test executable %d' % i)
+            target = FakeTarget()
+            module = FakeModule()
+            tests = [(module, builddir, 'test-%d' % i, 'test-%d' % i, None, None) for i in range(2)]
+            def run(rerun_all=False):
+                target.run = []
+                cache = test_subcommand.TestResultCache(builddir, target, [], rerun_all)
+                results = test_subcommand.runTests(target, tests, [], result_cache=cache)
+                cache.save()
+                return dict((result.test[2], result.outcome) for result in results)
+
+            self.assertEqual(run(), {'test-0': test_subcommand.Test_Passed, 'test-1': test_subcommand.Test_Passed})
+            self.assertEqual(run(), {'test-0': test_subcommand.Test_Cached, 'test-1': test_subcommand.Test_Cached})
+            self.assertEqual(target.run, [])
+            # changing a test executable invalidates its cached result:
+            with open(os.path.join(builddir, 'test-1'), 'w') as f:
+                f.write('modified test executable')
+            self.assertEqual(run(), {'test-0': test_subcommand.Test_Cached, 'test-1': test_subcommand.Test_Passed})
+            self.assertEqual(target.run, ['test-1'])
+            # and everything can be forced to run again:
+            run(rerun_all=True)
+            self.assertEqual(sorted(target.run), ['test-0', 'test-1'])
+        finally:
+            rmRf(builddir)
+
+    def test_reports(self):
+        target = FakeTarget()
+        module = FakeModule()
+        tests = [(module, '.', 'test-%d' % i, 'test-%d' % i, None, None) for i in (2, 3)]
+        stdout = FakeStdout()
+        restore_stdout = sys.stdout
+        sys.stdout = stdout
+        try:
+            results = test_subcommand.runTests(target, tests, [], capture_output=True)
+        finally:
+            sys.stdout = restore_stdout
+        # output is both shown and captured:
+        self.assertIn(b'test-3 end', stdout.buffer.getvalue())
+        self.assertEqual(results[1].output, u'test-3 start\ntest-3 end\n')
+        self.assertTrue(results[1].duration > 0)
+
+        report_dir = tempfile.mkdtemp()
+        try:
+            json_path = os.path.join(report_dir, 'report.json')
+            test_subcommand.writeJSONReport(json_path, results)
+            report = ordered_json.load(json_path)
+            self.assertEqual([r['outcome'] for r in report], ['passed', 'failed'])
+            self.assertEqual(report[1]['returncode'], 1)
+            self.assertEqual(report[1]['module'], 'fake-module')
+
+            xml_path = os.path.join(report_dir, 'report.xml')
+            test_subcommand.writeJUnitXML(xml_path, results, 'fake-target')
+            suite = ElementTree.parse(xml_path).getroot().find('testsuite')
+            self.assertEqual((suite.get('tests'), suite.get('failures')), ('2', '1'))
+            cases = suite.findall('testcase')
+            self.assertEqual([c.get('name') for c in cases], ['test-2', 'test-3'])
+            self.assertIsNotNone(cases[1].find('failure'))
+            self.assertEqual(cases[1].find('system-out').text, 'test-3 start\ntest-3 end\n')
+        finally:
+            rmRf(report_dir)
+
+    def test_shardTests(self):
+        module = FakeModule()
+        tests = [(module, '.', 'test-%d' % i, 'test-%d' % i, None, None) for i in range(7)]
+        shards = [test_subcommand.shardTests(tests, i, 3) for i in range(3)]
+        # every test is in exactly one shard, and the shards are even:
+        self.assertEqual(sorted(sum(shards, [])), sorted(tests))
+        self.assertEqual(sorted(len(shard) for shard in shards), [2, 2, 3])
+        # and the order of tests within each shard is preserved:
+        for shard in shards:
+            self.assertEqual(shard, sorted(shard, key=tests.index))
+
+        # with timings, the shards are balanced by duration:
+        timings = dict((('fake-module', 'test-%d' % i), 1.0) for i in range(7))
+        timings[('fake-module', 'test-0')] = 10.0
+        shards = [test_subcommand.shardTests(tests, i, 2, timings) for i in range(2)]
+        self.assertEqual([test[2] for test in shards[0]], ['test-0'])
+        self.assertEqual(len(shards[1]), 6)
+
     # see also yotta/test/cli/test.py for cli-driven testing
 
+class FakeModule(object):
+    path = '.'
+    def getName(self):
+        return 'fake-module'
+
+class FakeStdout(object):
+    def __init__(self):
+        self.buffer = io.BytesIO()
+    def flush(self):
+        pass
+
+class FakeTarget(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.timeouts = []
+        self.run = []
+
+    def getName(self):
+        return 'fake-target'
+
+    def getVersion(self):
+        return '1.0.0'
+
+    def getScript(self, scriptname):
+        return None
+
+    def test(self, test_dir, module_dir, test_command, filter_command, forward_args, output=None, timeout=None):
+        if test_command == 'test-sleep':
+            self.timeouts.append(timeout)
+            time.sleep(timeout)
+            return (test_subcommand.Test_Timed_Out, None)
+        with self.lock:
+            self.run.append(test_command)
+            self.running += 1
+            self.max_running = max(self.running, self.max_running)
+        if output is not None:
+            output.write(('%s start\n' % test_command).encode('utf-8'))
+        time.sleep(0.02)
+        if output is not None:
+            output.write(('%s end\n' % test_command).encode('utf-8'))
+        with self.lock:
+            self.running -= 1
+        # two of the tests fail:
+        returncode = int(test_command in ('test-3', 'test-6'))
+        return (returncode, returncode)
+
 
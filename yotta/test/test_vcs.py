@@ -55,6 +55,58 @@ class TestGit(unittest.TestCase):
         self.working_copy.commit('test commit: DO NOT PUSH')
         self.assertTrue(self.working_copy.isClean())
 
+class TestGitLocal(unittest.TestCase):
+    def setUp(self):
+        util.setupGitUser()
+        self.test_dir = util.writeTestFiles({'module.json': '{}'})
+        for cmd in (['init', '-q'], ['add', 'module.json'], ['commit', '-q', '-m', 'initial'], ['tag', 'v0.0.1']):
+            vcs.Git._execCommands([['git', '-C', self.test_dir] + cmd])
+        self.working_copy = vcs.Git(self.test_dir)
+
+    def tearDown(self):
+        fsutils.rmRf(self.test_dir)
+
+    def test_state(self):
+        state = self.working_copy.state()
+        self.assertEqual(state.getCommitId(), self.working_copy._execCommands([
+            self.working_copy._gitCmd('rev-parse', 'HEAD')
+        ])[0].strip())
+        self.assertTrue(state.isClean())
+        self.assertEqual(state.getDescription(), b'v0.0.1')
+
+        with open(os.path.join(self.test_dir, 'module.json'), 'a') as f:
+            f.write('\n')
+        self.assertFalse(self.working_copy.isClean())
+        self.working_copy.markForCommit('module.json')
+        self.working_copy.commit('test commit')
+        self.assertTrue(self.working_copy.isClean())
+        self.assertTrue(self.working_copy.getDescription().startswith(b'v0.0.1-1-g'))
+
+    def test_refs(self):
+        self.assertEqual(self.working_copy.tags(), ['v0.0.1'])
+        self.assertEqual(len(self.working_copy.branches()), 1)
+        # refs are cached until they are modified:
+        vcs.Git._execCommands([['git', '-C', self.test_dir, 'tag', '-a', '-m', 'msg', 'v0.0.2']])
+        self.assertEqual(self.working_copy.tags(), ['v0.0.1', 'v0.0.2'])
+        self.assertIs(self.working_copy._refs(), self.working_copy._refs())
+
+    def test_nestedRefs(self):
+        with open(os.path.join(self.test_dir, 'module.json'), 'a') as f:
+            f.write('\n')
+        vcs.Git._execCommands([
+            ['git', '-C', self.test_dir, 'commit', '-q', '-a', '-m', 'second'],
+            ['git', '-C', self.test_dir, 'branch', 'feature/x', 'HEAD~1']
+        ])
+        initial = dict(self.working_copy._refs())['refs/heads/feature/x']
+        # updating a nested ref (outside yotta) invalidates the cached refs,
+        # even though it only modifies the nested directory:
+        vcs.Git._execCommands([['git', '-C', self.test_dir, 'branch', '-f', 'feature/x', 'HEAD']])
+        updated = dict(self.working_copy._refs())['refs/heads/feature/x']
+        self.assertNotEqual(initial, updated)
+        self.assertEqual(updated, self.working_copy._execCommands([
+            self.working_copy._gitCmd('rev-parse', 'HEAD')
+        ])[0].strip())
+
 class TestHg(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -5,15 +5,25 @@
 
 # standard library modules, , ,
 import os
+import sys
 import logging
 import re
+import shutil
+import tempfile
+import time
+import hashlib
+import shlex
+from collections import OrderedDict, namedtuple
 
 # validate, , validate things, internal
 from yotta.lib import validate
 # Target, , represents an installed target, internal
 from yotta.lib import target
+from yotta.lib.target import Test_Passed, Test_Failed, Test_Timed_Out
 # fsutils, , misc filesystem utils, internal
 from yotta.lib import fsutils
+# Ordered JSON, , read & write json, internal
+from yotta.lib import ordered_json
 # build, , build subcommand, internal
 from yotta import build
 # --config option, , , internal
@@ -30,6 +40,60 @@ def addOptions(parser):
         "--no-build", '-n', dest='build', default=True, action='store_false',
         help='Don\'t build first.'
     )
+    parser.add_argument(
+        "--jobs", '-j', dest='jobs', default=1, type=int, metavar='N',
+        help='Run up to N tests at once. The output of each test is shown '+
+             'when it completes. (Ignored if the target can only run one '+
+             'test at a time.)'
+    )
+    parser.add_argument(
+        "--timeout", dest='timeout', default=None, type=float, metavar='SECONDS',
+        help='Terminate any test that runs for longer than this, and report '+
+             'it as timed out (overrides any testTimeout in the module or '+
+             'target description).'
+    )
+    parser.add_argument(
+        "--global-timeout", dest='global_timeout', default=None, type=float, metavar='SECONDS',
+        help='Stop running tests after this long: tests still running are '+
+             'terminated, and tests not yet started are not run, and all are '+
+             'reported as timed out.'
+    )
+    parser.add_argument(
+        "--cache-results", dest='cache_results', default=False, action='store_true',
+        help='Remember which tests passed, and skip them (reporting them as '+
+             'cached) until the test executable, test command, or target '+
+             'changes.'
+    )
+    parser.add_argument(
+        "--rerun-all", dest='rerun_all', default=False, action='store_true',
+        help='With --cache-results, forget the results of previous runs and '+
+             'run all the tests again.'
+    )
+    parser.add_argument(
+        "--junit-xml", dest='junit_xml', default=None, metavar='PATH',
+        help='Write a JUnit-style XML report of the test results, including '+
+             'the time taken and the output of each test, to PATH.'
+    )
+    parser.add_argument(
+        "--json-report", dest='json_report', default=None, metavar='PATH',
+        help='Write a JSON report of the test results, including the time '+
+             'taken and the output of each test, to PATH.'
+    )
+    parser.add_argument(
+        "--shard-count", dest='shard_count', default=None, type=int, metavar='N',
+        help='Split the tests into N shards (for example to run them on N '+
+             'machines), and only run the tests in the one selected by '+
+             '--shard-index.'
+    )
+    parser.add_argument(
+        "--shard-index", dest='shard_index', default=None, type=int, metavar='I',
+        help='The shard of tests to run, from 0 to N-1.'
+    )
+    parser.add_argument(
+        "--shard-timings", dest='shard_timings', default=None, metavar='PATH',
+        help='A report written by --json-report, used to balance the shards '+
+             'by how long each test took to run.'
+    )
     parser.add_argument(
         "tests", metavar='TEST_TO_RUN', nargs='*', type=str, default=[],
         help='List tests to run (omit to run the default set, or use "all" to run all).'
@@ -89,7 +153,302 @@ def moduleFromDirname(build_subdir, all_modules, toplevel_module):
                 modtop = False
     return module
 
+# outcome of a test that wasn't run because a previous run with the same test
+# executable and test command passed (not an outcome of Target.test):
+Test_Cached = 3
+
+class TestResultCache(object):
+    ''' The tests that have passed in a build directory, keyed by a hash of
+        everything that could change the result of running them: the test
+        executable, the test and filter commands and arguments, and the
+        target (and how the target runs tests).
+    '''
+    Filename = '.yotta_test_results.json'
+
+    def __init__(self, builddir, target, forward_args, rerun_all=False):
+        self.path = os.path.join(builddir, self.Filename)
+        self.target = target
+        self.forward_args = forward_args
+        # test dir, test name: key
+        self.keys = {}
+        self.passed = OrderedDict()
+        if not rerun_all:
+            try:
+                self.passed = ordered_json.load(self.path)
+            except (IOError, ValueError):
+                pass
+
+    def _key(self, test):
+        module, dirname, test_name, test_command, filter_command, timeout = test
+        if (dirname, test_name) not in self.keys:
+            key = None
+            executable = os.path.join(dirname, shlex.split(test_command)[0])
+            if os.path.isfile(executable):
+                h = hashlib.sha256()
+                with open(executable, 'rb') as f:
+                    for chunk in iter(lambda: f.read(0x10000), b''):
+                        h.update(chunk)
+                h.update(ordered_json.dumps([
+                    test_command, filter_command, self.forward_args,
+                    self.target.getName(), str(self.target.getVersion()),
+                    self.target.getScript('test')
+                ]).encode('utf-8'))
+                key = h.hexdigest()
+            self.keys[(dirname, test_name)] = key
+        return self.keys[(dirname, test_name)]
+
+    def hasPassed(self, test):
+        key = self._key(test)
+        return key is not None and key in self.passed
+
+    def record(self, test, outcome):
+        key = self._key(test)
+        if key is None:
+            return
+        if outcome == Test_Passed:
+            self.passed[key] = test[2]
+        elif key in self.passed:
+            del self.passed[key]
+
+    def save(self):
+        try:
+            fsutils.writeFileAtomically(self.path, lambda path: ordered_json.dump(path, self.passed))
+        except (OSError, IOError) as e:
+            logging.warning('failed to save test results: %s', e)
+
+def _replayOutput(f):
+    f.seek(0)
+    sys.stdout.flush()
+    shutil.copyfileobj(f, getattr(sys.stdout, 'buffer', sys.stdout))
+    sys.stdout.flush()
+
+# the result of running (or not running) a test: duration is in seconds,
+# returncode is the exit status of the test (or of its filter), or None if it
+# didn't exit by itself, and output is the text that the test (or its filter)
+# output, or None if its output wasn't captured
+TestResult = namedtuple('TestResult', ('test', 'outcome', 'duration', 'returncode', 'output'))
+
+def runTests(target, tests, forward_args, jobs=1, global_timeout=None, result_cache=None, capture_output=False):
+    ''' Run each of tests, a list of (module, test directory, test name,
+        test command, filter command, timeout), and return a list of
+        TestResult in the order that the tests completed, where each outcome
+        is one of Test_Passed, Test_Failed, Test_Timed_Out or Test_Cached.
+
+        If jobs is more than one then up to that many tests are run at once,
+        and the output of each test is captured and then displayed all at
+        once when it completes. If capture_output is True, then the output
+        of each test is always captured like this, and is also included in
+        its result.
+
+        If global_timeout is specified then no test is allowed to run beyond
+        that many seconds from now, and tests that would start later are not
+        run at all (and are reported as timed out).
+
+        If result_cache (a TestResultCache) is specified then tests that it
+        records as having passed are not run, and are reported with outcome
+        Test_Cached, and the results of the tests that are run are recorded
+        in it.
+    '''
+    results = []
+    if result_cache is not None:
+        uncached = []
+        for test in tests:
+            if result_cache.hasPassed(test):
+                logging.info('test %s passed (cached)', test[2])
+                results.append(TestResult(test, Test_Cached, 0, None, None))
+            else:
+                uncached.append(test)
+        tests = uncached
+    deadline = None
+    if global_timeout is not None:
+        deadline = time.time() + global_timeout
+    def runTest(test, output=None):
+        ''' returns (outcome, duration, returncode) '''
+        module, dirname, test_name, test_command, filter_command, timeout = test
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                logging.warning('test %s not run: global timeout expired', test_name)
+                return (Test_Timed_Out, 0, None)
+            if timeout is None or remaining < timeout:
+                timeout = remaining
+        started = time.time()
+        outcome, returncode = target.test(
+                   test_dir = dirname,
+                 module_dir = module.path,
+               test_command = test_command,
+             filter_command = filter_command,
+               forward_args = forward_args,
+                     output = output,
+                    timeout = timeout
+        )
+        return (outcome, time.time() - started, returncode)
+    def runCaptured(test):
+        output = tempfile.TemporaryFile()
+        try:
+            return (test,) + runTest(test, output) + (output,)
+        except Exception as e:
+            output.close()
+            logging.error('error running test %s: %s', test[2], e)
+            return (test, Test_Failed, 0, None, None)
+    def reportResult(test, outcome, duration, returncode, output):
+        module, dirname, test_name, test_command, filter_command, timeout = test
+        output_text = None
+        if output is not None:
+            with output:
+                _replayOutput(output)
+                if capture_output:
+                    output.seek(0)
+                    output_text = output.read().decode('utf-8', 'replace')
+        if outcome == Test_Timed_Out:
+            logging.error('test %s timed out (command: %s)', test_name, test_command)
+        elif outcome:
+            logging.error('test %s failed (command: %s)', test_name, test_command)
+            outcome = Test_Failed
+        else:
+            logging.info('test %s passed', test_name)
+        if result_cache is not None:
+            result_cache.record(test, outcome)
+        results.append(TestResult(test, outcome, duration, returncode, output_text))
+
+    if jobs > 1 and len(tests) > 1:
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(min(jobs, len(tests)))
+        try:
+            for result in pool.imap_unordered(runCaptured, tests):
+                logging.info('test %s: %s', result[0][0].getName(), result[0][2])
+                reportResult(*result)
+        finally:
+            pool.close()
+    else:
+        for test in tests:
+            logging.info('test %s: %s', test[0].getName(), test[2])
+            if capture_output:
+                reportResult(*runCaptured(test))
+            else:
+                reportResult(test, *(runTest(test) + (None,)))
+    return results
+
+_Outcome_Names = {
+    Test_Passed: 'passed',
+    Test_Failed: 'failed',
+    Test_Timed_Out: 'timed out',
+    Test_Cached: 'cached'
+}
+
+def writeJSONReport(path, results):
+    ''' Write a JSON report of results (a list of TestResult) to path. '''
+    report = []
+    for result in results:
+        module, dirname, test_name, test_command, filter_command, timeout = result.test
+        report.append(OrderedDict([
+            ('module', module.getName()),
+            ('name', test_name),
+            ('command', test_command),
+            ('filter', filter_command),
+            ('outcome', _Outcome_Names[result.outcome]),
+            ('time', round(result.duration, 3)),
+            ('returncode', result.returncode),
+            ('output', result.output)
+        ]))
+    with open(path, 'w') as f:
+        f.write(ordered_json.dumps(report))
+        f.write('\n')
+
+# control characters aren't allowed in XML 1.0 documents, even escaped:
+_XML_Invalid_Chars = re.compile(u'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def writeJUnitXML(path, results, target_name):
+    ''' Write a JUnit-style XML report of results (a list of TestResult) to
+        path, with one testsuite for each module.
+    '''
+    from xml.etree import ElementTree
+    by_module = OrderedDict()
+    for result in results:
+        by_module.setdefault(result.test[0].getName(), []).append(result)
+    root = ElementTree.Element('testsuites', name=target_name)
+    for module_name, module_results in by_module.items():
+        outcomes = [result.outcome for result in module_results]
+        suite = ElementTree.SubElement(root, 'testsuite',
+                 name = module_name,
+                tests = str(len(module_results)),
+             failures = str(outcomes.count(Test_Failed)),
+               errors = str(outcomes.count(Test_Timed_Out)),
+              skipped = str(outcomes.count(Test_Cached)),
+                 time = '%.3f' % sum(result.duration for result in module_results)
+        )
+        for result in module_results:
+            test_name, test_command = result.test[2:4]
+            case = ElementTree.SubElement(suite, 'testcase',
+                classname = module_name,
+                     name = test_name,
+                     time = '%.3f' % result.duration
+            )
+            if result.outcome == Test_Failed:
+                ElementTree.SubElement(case, 'failure',
+                    message = 'exit status %s (command: %s)' % (result.returncode, test_command)
+                )
+            elif result.outcome == Test_Timed_Out:
+                ElementTree.SubElement(case, 'error',
+                    message = 'timed out after %.3fs (command: %s)' % (result.duration, test_command)
+                )
+            elif result.outcome == Test_Cached:
+                ElementTree.SubElement(case, 'skipped', message = 'cached: passed in a previous run')
+            if result.output:
+                ElementTree.SubElement(case, 'system-out').text = _XML_Invalid_Chars.sub(u'', result.output)
+    ElementTree.ElementTree(root).write(path, encoding='utf-8', xml_declaration=True)
+
+def loadTimings(path):
+    ''' Return a dictionary of (module name, test name): duration from a JSON
+        report written by writeJSONReport.
+    '''
+    timings = {}
+    try:
+        report = ordered_json.load(path)
+        for entry in report:
+            # cached tests weren't run, so their duration means nothing:
+            if entry['outcome'] != 'cached':
+                timings[(entry['module'], entry['name'])] = float(entry['time'])
+    except (IOError, ValueError, KeyError, TypeError) as e:
+        logging.warning('failed to read test timings from %s: %s', path, e)
+    return timings
+
+def shardTests(tests, shard_index, shard_count, timings=None):
+    ''' Return the tests (as passed to runTests) in shard shard_index of
+        shard_count. The shards are chosen deterministically, so that every
+        test is in exactly one shard for the same list of tests and timings.
+
+        Tests are assigned, longest first, to the shard with the least work
+        so far, where the length of each test is taken from timings (see
+        loadTimings), or is the average of the known timings if it isn't
+        listed (so with no timings the tests are simply dealt out evenly).
+    '''
+    timings = timings or {}
+    def key(test):
+        return (test[0].getName(), test[2])
+    known = [timings[key(test)] for test in tests if key(test) in timings]
+    default_duration = (sum(known) / len(known)) if known else 1.0
+    longest_first = sorted(
+        (-timings.get(key(test), default_duration), key(test), i) for i, test in enumerate(tests)
+    )
+    totals = [0.0] * shard_count
+    selected = []
+    for negative_duration, test_key, i in longest_first:
+        shard = totals.index(min(totals))
+        totals[shard] -= negative_duration
+        if shard == shard_index:
+            selected.append(i)
+    # preserve the original order of the tests within the shard:
+    return [tests[i] for i in sorted(selected)]
+
 def execCommand(args, following_args):
+    if (args.shard_count is None) != (args.shard_index is None):
+        logging.error('--shard-count and --shard-index must be used together')
+        return 1
+    if args.shard_count is not None and not (0 <= args.shard_index < args.shard_count):
+        logging.error('--shard-index must be from 0 to %d', args.shard_count - 1)
+        return 1
+
     # remove the pseudo-name 'all': it wouldn't be recognised by build/cmake
     all_tests = 'all' in args.tests
     if all_tests:
@@ -145,8 +504,7 @@ def execCommand(args, following_args):
     if errcode:
         return errcode
 
-    passed = 0
-    failed = 0
+    tests_to_run = []
     for dirname, test_definitions in tests:
         module = moduleFromDirname(os.path.relpath(dirname, builddir), all_modules, c)
         logging.debug('inferred module %s from path %s', module.getName(), os.path.relpath(dirname, builddir))
@@ -154,6 +512,11 @@ def execCommand(args, following_args):
             continue
         info_filter = True
         filter_command = module.getScript('testReporter')
+        timeout = args.timeout
+        if timeout is None:
+            timeout = module.description.get('testTimeout', None)
+        if timeout is None:
+            timeout = target.getTestTimeout()
         for test_name, test_command in test_definitions:
             if len(args.tests) and not test_name in args.tests:
                 logging.debug('skipping not-listed test %s: %s', test_name, test_command)
@@ -161,26 +524,51 @@ def execCommand(args, following_args):
             if info_filter and filter_command:
                 info_filter = False
                 logging.info('using filter "%s" for tests in %s', ' '.join(filter_command), dirname)
-            logging.info('test %s: %s', module.getName(), test_name)
-            if args.list_only:
-                continue
-            test_returncode = target.test(
-                       test_dir = dirname,
-                     module_dir = module.path,
-                   test_command = test_command,
-                 filter_command = filter_command,
-                   forward_args = following_args
+            tests_to_run.append((module, dirname, test_name, test_command, filter_command, timeout))
+
+    if args.shard_count is not None:
+        timings = None
+        if args.shard_timings:
+            timings = loadTimings(args.shard_timings)
+        tests_to_run = shardTests(tests_to_run, args.shard_index, args.shard_count, timings)
+        logging.info('running shard %d of %d (%d tests)', args.shard_index, args.shard_count, len(tests_to_run))
+
+    if args.list_only:
+        for test in tests_to_run:
+            logging.info('test %s: %s', test[0].getName(), test[2])
+    else:
+        jobs = args.jobs
+        if jobs > 1 and not target.canRunTestsInParallel():
+            logging.info('target %s can only run one test at a time', target.getName())
+            jobs = 1
+        result_cache = None
+        if args.cache_results:
+            result_cache = TestResultCache(builddir, target, following_args, args.rerun_all)
+        try:
+            results = runTests(
+                target, tests_to_run, following_args, jobs, args.global_timeout, result_cache,
+                capture_output = bool(args.junit_xml or args.json_report)
             )
-            if test_returncode:
-                logging.error('test %s failed (command: %s)', test_name, test_command)
-                failed += 1
-                if not returncode:
-                    returncode = 1
-            else:
-                logging.info('test %s passed', test_name)
-                passed += 1
-    if not args.list_only:
-        logging.info("tests complete: %d passed, %d failed", passed, failed)
+        finally:
+            if result_cache is not None:
+                result_cache.save()
+        if args.junit_xml:
+            writeJUnitXML(args.junit_xml, results, target.getName())
+        if args.json_report:
+            writeJSONReport(args.json_report, results)
+        outcomes = [result.outcome for result in results]
+        passed = outcomes.count(Test_Passed)
+        failed = outcomes.count(Test_Failed)
+        timed_out = outcomes.count(Test_Timed_Out)
+        cached = outcomes.count(Test_Cached)
+        if (failed or timed_out) and not returncode:
+            returncode = 1
+        summary = "tests complete: %d passed, %d failed" % (passed, failed)
+        if timed_out:
+            summary += ", %d timed out" % timed_out
+        if cached:
+            summary += ", %d cached" % cached
+        logging.info(summary)
 
     return returncode
 